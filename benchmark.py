@@ -0,0 +1,274 @@
+""" benchmark.py
+
+Simple timing harness for the heavier FootballDB operations. Runs against the tenancy of a real user in the configured
+MongoDB, so point it at a copy of the data and not production. Uses the same environment variables as CFFA:
+
+  BACKEND_DBUSR, BACKEND_DBPWD, BACKEND_DBHOST, BACKEND_DBPORT, BACKEND_DBNAME and CFFA_USERID
+
+Run with: python -m cffadb.benchmark [benchmark name ...], default is all read only benchmarks.
+
+Some benchmarks (bench_add_game) add games and players, so only use a scratch tenancy for those. Benchmarks that do not
+need a tenancy (bench_google_import, which uses the fake gspread client in tests/fakeGspread.py) do not connect to
+MongoDB. Run from a source checkout, as tests/ is not installed with the package.
+
+"""
+
+import os
+import sys
+import time
+import datetime
+import itertools
+import logging
+from pymongo import monitoring
+from cffadb import dbinterface
+from cffadb import footballClasses
+from cffadb import constants
+from cffadb.tests.fakeGspread import FakeGspreadClient, fake_sheet
+
+logger = logging.getLogger("cffa_benchmark")
+logger.setLevel(logging.INFO)
+ch = logging.StreamHandler()
+ch.setLevel(logging.INFO)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+
+def time_call(label, runs, fn, *args, **kwargs):
+    """ Times fn(*args, **kwargs) over a number of runs and logs the best and mean run.
+
+    Parameters
+    ----------
+
+    label : str
+        Name to show in the log output.
+
+    runs : int
+        Number of times to call fn.
+
+    fn : callable
+        Function to time.
+
+    Returns
+    -------
+
+    timings : `float` : `list`
+        Seconds taken for each run.
+
+    """
+    timings = []
+    for run in range(runs):
+        start = time.perf_counter()
+        fn(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    logger.info("%-40s best %8.3fs  mean %8.3fs  (%d runs)", label, min(timings), sum(timings) / len(timings), runs)
+    return timings
+
+
+class CommandCounter(monitoring.CommandListener):
+    """ Counts the commands (round trips) sent to MongoDB. Must be registered before the MongoClient is created.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+command_counter = CommandCounter()
+
+
+def bench_add_game(football_db, player_counts=(2, 8, 14, 22)):
+    """ Adds one game per player count, with one booker and one guest, and logs the time taken and the number of
+    commands sent to MongoDB. The round trips should stay the same as the player count grows. Writes to the tenancy, so
+    use a scratch tenancy.
+
+    Parameters
+    ----------
+
+    football_db : dbinterface.FootballDB
+        FootballDB with tenancy collections loaded.
+
+    player_counts : `int` : `list`
+        Number of players in each game.
+
+    """
+    for count in player_counts:
+        players = []
+        for index in range(count):
+            players.append(footballClasses.Player("empty", "Benchmark Player " + str(index), True, index == 0,
+                                                  1 if index == 1 else 0))
+        game = footballClasses.Game(30.00, datetime.date.today(), players, players[0].playername)
+
+        commands = command_counter.count
+        timings = time_call("add_game with " + str(count) + " players", 1, football_db.add_game, game)
+        logger.info("add_game with %d players sent %d commands in %.3fs", count, command_counter.count - commands,
+                    timings[0])
+
+
+def bench_team_summary(football_db, runs=3):
+    """ Compares the server side team_summary rebuild with the original per player loop. Both rebuilds are run over
+    the current team_summary player list.
+
+    Parameters
+    ----------
+
+    football_db : dbinterface.FootballDB
+        FootballDB with tenancy collections loaded.
+
+    runs : int
+        Number of times to run each rebuild.
+
+    """
+    players = football_db.get_player_labels()
+    logger.info("team_summary rebuild for %d players", len(players))
+    time_call("calc_populate_team_summary_loop", runs, football_db.calc_populate_team_summary_loop, players)
+    time_call("calc_populate_team_summary", runs, football_db.calc_populate_team_summary, players)
+
+
+def bench_google_import(football_db=None, game_counts=(1000, 10000, 50000), runs=3):
+    """ Times googleImport.Googlesheet loading large sheets from a fake gspread client, so no google access is needed.
+    Logs the number of spreadsheet opens and values requests, which should be one each.
+
+    Parameters
+    ----------
+
+    football_db : dbinterface.FootballDB
+        Not used.
+
+    game_counts : `int` : `list`
+        Number of game rows in each sheet.
+
+    runs : int
+        Number of times to load each sheet.
+
+    """
+    from cffadb import googleImport
+
+    for count in game_counts:
+        client = FakeGspreadClient(fake_sheet(count))
+        time_call("Googlesheet with " + str(count) + " games", runs, googleImport.Googlesheet, None, "Sheet",
+                  "Transactions", "Games", "Summary", client=client)
+        logger.info("Googlesheet opened the sheet %d times and sent %d values requests in %d runs", client.opens,
+                    client.spreadsheet.requests, runs)
+
+
+def bench_sheet_normalise(football_db=None, game_counts=(1000, 10000, 50000)):
+    """ Compares the column at a time googleImport post processing (process_transactions, process_games) with the
+    original row at a time loops, and checks both give identical records (values and key order).
+
+    Parameters
+    ----------
+
+    football_db : dbinterface.FootballDB
+        Not used.
+
+    game_counts : `int` : `list`
+        Number of game rows in each sheet.
+
+    """
+    from cffadb import googleImport
+
+    for count in game_counts:
+        worksheets = fake_sheet(count)
+        results = {}
+        for label, process_transactions, process_games in [
+                ("loop", googleImport.process_transactions_loop, googleImport.process_games_loop),
+                ("columnar", googleImport.process_transactions, googleImport.process_games)]:
+            googleImport.sheet_date.cache_clear()
+            googleImport.sheet_amount.cache_clear()
+            transactions = list(itertools.chain.from_iterable(googleImport.iter_records(worksheets["Transactions"])))
+            games = list(itertools.chain.from_iterable(googleImport.iter_records(worksheets["Games"])))
+            start = time.perf_counter()
+            process_transactions(transactions)
+            process_games(games)
+            elapsed = time.perf_counter() - start
+            results[label] = [list(record.items()) for record in transactions + games]
+            logger.info("%-40s %8.3fs  %.0f rows per second", label + " normalise of " + str(count) + " games",
+                        elapsed, len(results[label]) / elapsed)
+
+        if results["loop"] != results["columnar"]:
+            logger.error("Columnar normalise of %d games differs from the row at a time loop", count)
+
+
+def bench_file_import(football_db=None, game_counts=(1000, 10000, 50000)):
+    """ Times fileImport.FileSheet reading and post processing generated CSV exports, and logs rows per second. Nothing
+    is written to MongoDB, FileSheet.import_to_db() logs the rows per second including the inserts.
+
+    Parameters
+    ----------
+
+    football_db : dbinterface.FootballDB
+        Not used.
+
+    game_counts : `int` : `list`
+        Number of game rows in each export.
+
+    """
+    import csv
+    import tempfile
+    from cffadb import fileImport
+
+    with tempfile.TemporaryDirectory() as directory:
+        for count in game_counts:
+            paths = {}
+            for name, rows in fake_sheet(count).items():
+                paths[name] = os.path.join(directory, name + ".csv")
+                with open(paths[name], "w", newline="", encoding="utf-8") as csv_file:
+                    csv.writer(csv_file).writerows(rows)
+
+            start = time.perf_counter()
+            sheet = fileImport.FileSheet(paths["Transactions"], paths["Games"], paths["Summary"])
+            sheet.derive_players(0, len(sheet.summary_worksheet))
+            rows = 0
+            for chunk in itertools.chain(sheet.iter_transactions(), sheet.iter_games()):
+                rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            logger.info("FileSheet read %d rows in %.3fs, %.0f rows per second", rows, elapsed, rows / elapsed)
+
+
+def connect_from_env():
+    """ Builds a FootballDB from the CFFA environment variables and loads the tenancy of CFFA_USERID.
+
+    Returns
+    -------
+
+    football_db : dbinterface.FootballDB
+        FootballDB with tenancy collections loaded.
+
+    """
+    connect_string = "mongodb://" + os.getenv(constants.BACKEND_DBUSR) + ":" + os.getenv(constants.BACKEND_DBPWD) + \
+                     "@" + os.getenv(constants.BACKEND_DBHOST) + ":" + os.getenv(constants.BACKEND_DBPORT) + "/"
+    football_db = dbinterface.FootballDB(connect_string, os.getenv(constants.BACKEND_DBNAME))
+    if not football_db.load_team_tables_for_user_id(os.getenv(constants.CFFA_USERID)):
+        raise SystemExit("Unable to load tenancy for CFFA_USERID")
+
+    return football_db
+
+
+# name: (function, read only, needs a tenancy)
+benchmarks = {
+    "team_summary": (bench_team_summary, True, True),
+    "add_game": (bench_add_game, False, True),
+    "google_import": (bench_google_import, True, False),
+    "file_import": (bench_file_import, True, False),
+    "sheet_normalise": (bench_sheet_normalise, True, False),
+}
+
+
+if __name__ == "__main__":
+    monitoring.register(command_counter)
+    names = sys.argv[1:] or [name for name, (fn, read_only, needs_db) in benchmarks.items() if read_only]
+    db = None
+    if any(benchmarks[name][2] for name in names):
+        db = connect_from_env()
+    for name in names:
+        benchmarks[name][0](db)
@@ -0,0 +1,239 @@
+""" bulkLoader.py
+
+Concurrent loader for the import stage. The FootballDB.populate_* methods for team players, adjustments, payments and
+games run at the same time, one thread each, and every batch they insert is split into chunks written with
+insert_many(ordered=False) by a bounded pool of writer threads. A large import is then limited by how fast the server
+accepts writes, rather than by one serial insert_many after another.
+
+Chunks that fail are retried. A chunk may have been partly written before the failure (ie a dropped connection), so on
+a retry duplicate key errors (11000) for documents that are already stored are ignored: the documents keep the _id
+given to them by the first attempt. Write errors that a retry cannot fix, such as a duplicate key on the first attempt
+or a failed validation, fail the chunk at once.
+
+  loader = BulkLoader(football_db, progress=lambda name, written, elapsed, rate: print(name, written, rate))
+  player_ids = loader.load(team_players=..., adjustments=..., payments=..., games=...)
+  football_db.calc_populate_team_summary(players, player_ids)
+
+"""
+
+import time
+import threading
+import logging
+import pymongo
+from concurrent.futures import ThreadPoolExecutor
+
+# logging config
+logger = logging.getLogger("cffa_db_bulk_loader")
+logger.setLevel(logging.DEBUG)
+# console handler
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+# config variables
+maxWorkers = 4  # concurrent insert_many calls
+chunkSize = 250  # documents per insert_many
+maxRetries = 3  # further attempts for a failed chunk
+retryDelay = 0.5  # seconds before the first retry, doubled for each further retry
+duplicateKeyError = 11000
+# write error codes worth retrying a chunk for: primary step downs and shutdowns
+transientWriteErrors = {91, 189, 10107, 11600, 11602, 13435, 13436}
+
+# errors worth retrying a chunk for. A BulkWriteError is only retried if its write errors are all transient, see
+# _insert_chunk().
+retryErrors = (pymongo.errors.AutoReconnect, pymongo.errors.NetworkTimeout, pymongo.errors.BulkWriteError,
+               pymongo.errors.WriteConcernError)
+
+
+class BulkLoader:
+    """ BulkLoader class - writes the import collections of a tenancy concurrently in chunks.
+
+    Attributes
+    ----------
+
+    football_db : dbinterface.FootballDB
+        FootballDB with the tenancy collections loaded.
+
+    max_workers : int
+        Maximum concurrent insert_many calls.
+
+    chunk_size : int
+        Documents per insert_many.
+
+    retries : int
+        Further attempts for a failed chunk.
+
+    progress : callable
+        Called as progress(collection name, documents written, seconds elapsed, documents per second) after each
+        chunk, from the writer threads. None for no callback.
+
+    written : dict
+        Documents written so far, keyed on collection name.
+
+    """
+
+    def __init__(self, football_db, max_workers=maxWorkers, chunk_size=chunkSize, retries=maxRetries, progress=None):
+        """ BulkLoader constructor.
+
+        Parameters
+        ----------
+
+        football_db : dbinterface.FootballDB
+            FootballDB with the tenancy collections loaded.
+
+        max_workers : int
+            Maximum concurrent insert_many calls.
+
+        chunk_size : int
+            Documents per insert_many.
+
+        retries : int
+            Further attempts for a failed chunk.
+
+        progress : callable
+            Progress and throughput callback, see the class attributes.
+
+        """
+        self.football_db = football_db
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.progress = progress
+        self.written = {}
+        self._lock = threading.Lock()
+        self._writers = None
+        self._start = None
+
+    def load(self, team_players=None, adjustments=None, payments=None, games=None, delta=False):
+        """ Writes the given collections concurrently, through the populate_* methods of football_db. Collections left
+        as None are not touched. team_summary is not recalculated, pass the returned player IDs to
+        calc_populate_team_summary().
+
+        Parameters
+        ----------
+
+        team_players : iterable
+            Team player documents for populate_team_players().
+
+        adjustments : iterable
+            Adjustment documents for populate_adjustments().
+
+        payments : iterable
+            Payment documents for populate_payments(), ie a generator.
+
+        games : iterable
+            Game documents for populate_games(), ie a generator.
+
+        delta : boolean
+            Only write the difference from the last import, see populate_payments().
+
+        Returns
+        -------
+
+        player_ids : set
+            IDs of the players on the documents inserted or deleted.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If a collection could not be written, ie a chunk failed. The other collections are still waited for.
+
+        """
+        populates = [(self.football_db.populate_team_players, team_players),
+                     (self.football_db.populate_adjustments, adjustments),
+                     (self.football_db.populate_payments, payments),
+                     (self.football_db.populate_games, games)]
+        populates = [(populate, documents) for populate, documents in populates if documents is not None]
+
+        self.written = {}
+        self._start = time.perf_counter()
+        player_ids = set()
+        # collection threads only prepare and hand over batches, the writer pool bounds the concurrent writes. Two
+        # pools are used so a collection thread waiting on its chunks never holds a writer.
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="cffa-writer") as writers, \
+                ThreadPoolExecutor(max_workers=max(len(populates), 1), thread_name_prefix="cffa-load") as loaders:
+            self._writers = writers
+            futures = [loaders.submit(populate, documents, delta, self.insert) for populate, documents in populates]
+            for future in futures:
+                player_ids |= future.result()
+        self._writers = None
+
+        elapsed = time.perf_counter() - self._start
+        total = sum(self.written.values())
+        logger.info("Loaded %d documents in %.2fs, %.0f per second", total, elapsed, total / elapsed if elapsed else 0)
+        return player_ids
+
+    def insert(self, collection, documents):
+        """ Inserts a batch of documents as chunks of chunk_size, concurrently on the writer pool, and waits for them.
+        Used as the writer of FootballDB._sync_documents(). Outside load() the chunks are written one after another.
+
+        Parameters
+        ----------
+
+        collection : pymongo.collection.Collection
+            Collection to insert into.
+
+        documents : `dict` : `list`
+            Documents to insert.
+
+        Raises
+        ------
+
+        pymongo.errors.PyMongoError
+            If a chunk still fails after the retries.
+
+        """
+        chunks = [documents[start:start + self.chunk_size] for start in range(0, len(documents), self.chunk_size)]
+        if self._writers is None:
+            for chunk in chunks:
+                self._insert_chunk(collection, chunk)
+            return
+
+        futures = [self._writers.submit(self._insert_chunk, collection, chunk) for chunk in chunks]
+        for future in futures:
+            future.result()
+
+    def _insert_chunk(self, collection, chunk):
+        """ Inserts one chunk with insert_many(ordered=False), retrying on failure. On a retry duplicate key errors
+        are ignored, as they are documents written by an earlier attempt. On the first attempt they are real conflicts
+        and fail the chunk, as does any other write error that is not transient (ie a validation failure).
+
+        Only the documents the server reports inserting are counted in written, so documents skipped as duplicates on
+        a retry are not counted twice. Documents written by an attempt that failed without a reply (ie a dropped
+        connection) are not counted.
+        """
+        inserted = 0
+        for attempt in range(self.retries + 1):
+            try:
+                collection.insert_many(chunk, ordered=False)
+                inserted += len(chunk)
+                break
+            except retryErrors as e:
+                if isinstance(e, pymongo.errors.BulkWriteError):
+                    details = e.details or {}
+                    inserted += details.get("nInserted", 0)
+                    codes = set(error.get("code") for error in details.get("writeErrors", []))
+                    if attempt > 0 and codes == {duplicateKeyError} and \
+                            len(details.get("writeConcernErrors", [])) == 0:
+                        break
+                    if not codes <= (transientWriteErrors | ({duplicateKeyError} if attempt > 0 else set())):
+                        logger.critical("Chunk of " + str(len(chunk)) + " documents for " + collection.name +
+                                        " failed with write errors " + str(sorted(codes)))
+                        raise
+
+                if attempt == self.retries:
+                    logger.critical("Chunk of " + str(len(chunk)) + " documents for " + collection.name +
+                                    " failed after " + str(attempt + 1) + " attempts")
+                    raise
+                logger.warning("Retrying chunk for " + collection.name + " after: " + str(e))
+                time.sleep(retryDelay * (2 ** attempt))
+
+        with self._lock:
+            written = self.written.get(collection.name, 0) + inserted
+            self.written[collection.name] = written
+            elapsed = time.perf_counter() - (self._start or time.perf_counter())
+            if self.progress is not None:
+                self.progress(collection.name, written, elapsed, written / elapsed if elapsed > 0 else 0.0)
@@ -0,0 +1,109 @@
+""" clientRegistry.py
+
+Process wide registry of pymongo.MongoClient objects, keyed on connection string, so that every FootballDB in a
+process shares one client (and its connection pool) instead of building a new client per instance.
+
+Clients are created with connect=False so nothing connects until the first operation, which keeps the registry safe
+to use before a pre-fork web server (ie gunicorn) forks its workers. MongoClient is not fork safe, so a forked child
+never reuses its parent's clients: the registry is emptied in the child (os.register_at_fork), and as a fallback also
+whenever the registry sees a different process ID. FootballDB.theDB checks the process ID too, so a FootballDB created
+before the fork resolves its database handle again through the registry in the child.
+
+"""
+
+import os
+import threading
+import logging
+import pymongo
+
+# logging config
+logger = logging.getLogger("cffa_db_clients")
+logger.setLevel(logging.DEBUG)
+# console handler
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+# config variables, used when get_client() is not given pool sizes
+maxPoolSize = 100  # pymongo default. Size for the number of threads serving requests per process
+minPoolSize = 0  # connections kept open when idle
+
+_clients = {}
+_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def _forget_parent_clients():
+    """ Forgets the parent's clients in a forked child. They are not closed, as their sockets belong to the parent.
+    Call with _lock held.
+    """
+    global _pid
+    _clients.clear()
+    _pid = os.getpid()
+
+
+def _reset_after_fork():
+    """ Fork hook for the child. The lock is replaced first, as another thread of the parent may have held it when the
+    process forked, and that thread does not exist in the child to release it.
+    """
+    global _lock
+    _lock = threading.Lock()
+    with _lock:
+        _forget_parent_clients()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_client(connect_string, max_pool_size=None, min_pool_size=None, **client_options):
+    """ Returns the shared MongoClient for a connection string, creating it on first use.
+
+    Parameters
+    ----------
+
+    connect_string : str
+        URI for the MongoDB connection.
+
+    max_pool_size : int
+        maxPoolSize for a new client, defaults to the module maxPoolSize.
+
+    min_pool_size : int
+        minPoolSize for a new client, defaults to the module minPoolSize.
+
+    client_options : dict
+        Any other MongoClient keyword options for a new client.
+
+    Returns
+    -------
+
+    client : pymongo.MongoClient
+        Shared client. Pool and client options only apply when the client is first created.
+
+    """
+    with _lock:
+        if os.getpid() != _pid:
+            # fallback for forks the hook did not see
+            _forget_parent_clients()
+        client = _clients.get(connect_string)
+        if client is None:
+            client = pymongo.MongoClient(connect_string,
+                                         maxPoolSize=max_pool_size if max_pool_size is not None else maxPoolSize,
+                                         minPoolSize=min_pool_size if min_pool_size is not None else minPoolSize,
+                                         connect=False,
+                                         **client_options)
+            _clients[connect_string] = client
+            logger.info("Created MongoClient for process " + str(_pid))
+
+    return client
+
+
+def close_all():
+    """ Closes and forgets every client created by this process, ie on worker shutdown.
+    """
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -8,3 +8,5 @@ GOOGLE_SHEET = 'GOOGLE_SHEET'
 TRANSACTION_SRC_WKSHEET = 'TRANSACTION_SRC_WKSHEET'
 GAME_SRC_WKSHEET = 'GAME_SRC_WKSHEET'
 SUMMARY_SRC_WKSHEET = 'SUMMARY_SRC_WKSHEET'
+CFFA_USERID = 'CFFA_USERID'
+EXPORTDIRECTORY = 'EXPORTDIRECTORY'
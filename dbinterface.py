@@ -14,13 +14,30 @@ Provides all functionality to manage data with mongoDB
   where
     ID is a hash (based on time of creation) stored in the MultiTenancy collection for the user
 
+# Players are identified by an integer player ID (see playerNames.py). Names stored in games and payments are labels
+  from when the document was written, and are replaced with current names when read.
+
 """
 
+import os
 import pymongo
 import datetime
+import base64
 from bson import Decimal128
+from bson import ObjectId
+from bson import json_util
 from cffadb import footballClasses
+from cffadb import indexManager
+from cffadb import money
+from cffadb import clientRegistry
+from cffadb import tenancyCache
+from cffadb import playerNames
+from cffadb import gameLoader
+from cffadb import tenantExport
 import re
+import hashlib
+import itertools
+import threading
 import logging
 import pprint
 
@@ -39,9 +56,27 @@ logger.addHandler(ch)
 # config variable
 activeDays = 730  # players that haven't played for these days are excluded from default list of players
 daysForRecentPayment = 180  # cut off for recent payments/transactions when viewed.
+pageSize = 100  # default page size for the keyset paginated game and transaction listings
+insertBatchSize = 1000  # documents inserted per insert_many by the populate_* methods
+stagingSuffix = "_staging"  # full imports and summary rebuilds are written to collection name + stagingSuffix
+# game fields returned by the game listings by default, leaving out the legacy per player keys
+gameListFields = ["Date of Game dd-MON-YYYY", "Timestamp", "Cost of Game", "Cost Each", "Players", "Booker",
+                  "PlayerList", "players", "bookerId", "Winning Team Score", "Losing Team Score", "schemaVersion"]
+
+playedStatus = ["Win", "Lose", "Draw", "No Show"]  # game values that count as a player attending (with aggCollation)
+gameSchemaVersion = 2  # v2 games hold a players array of {name, status, guests} alongside the legacy player keys
+playerIdVersion = 1  # tenancies at this version have player IDs on every game, payment, adjustment and player row
+tenantMetadataId = "tenantMetadata"  # _id of the per tenancy metadata document in the teamSettings collection
+settingsFilter = {"_id": {"$ne": tenantMetadataId}}  # team settings documents, without the tenancy metadata
+tenantCounters = ["gameCount", "playerCount", "transactionCount"]  # counters held on the tenancy metadata document
 
 # DB needs to know about each of the above objects to store it but not import
-aggCollation = pymongo.collation.Collation(locale='en', strength=1, alternate='shifted')
+# case insensitive collation for player names. Declared in indexManager so the name indexes use the same collation.
+aggCollation = indexManager.aggCollation
+
+_schemaChecked = set()  # (db name, tenancy ID) whose game schema version this process has already checked
+_playerIdsLock = threading.Lock()  # serialises player ID allocation between threads, ie bulkLoader workers
+playerIdRetries = 20  # attempts to allocate player IDs when other processes allocate at the same time
 
 
 class FootballDB:
@@ -56,6 +91,9 @@ class FootballDB:
     tenancy : collection
         Global MultiTenancy Collection handle
 
+    tenancy_id : str
+        Tenancy prefix of the loaded tenancy collections.
+
     payments : collection
         Payments collection handle for this tenancy.
 
@@ -71,10 +109,17 @@ class FootballDB:
     team_players : collection
         TeamPlayers collection handle for this tenancy.
 
+    team_settings : collection
+        TeamSettings collection handle for this tenancy.
+
+    A FootballDB loaded with load_team_tables_for_user_id() serves one tenancy at a time. To serve many tenancies from
+    many threads, share one FootballDB and call session_for_user() per request for a TenantSession.
+
     """
 
-    def __init__(self, connect_string, db_name):
-        """ Constructor for the database connection
+    def __init__(self, connect_string, db_name, max_pool_size=None, min_pool_size=None):
+        """ Constructor for the database connection. Construction is cheap: the MongoClient is shared across the
+        process (see clientRegistry) and nothing is sent to the DB until the first operation.
 
         Parameters
         ----------
@@ -85,32 +130,110 @@ class FootballDB:
         db_name : str
             Database name in the db server continuing the football data.
 
+        max_pool_size : int
+            Connection pool size if this is the first FootballDB for connect_string. Defaults to
+            clientRegistry.maxPoolSize.
+
+        min_pool_size : int
+            Idle connections kept if this is the first FootballDB for connect_string. Defaults to
+            clientRegistry.minPoolSize.
+
         """
-        try:
-            db_client = pymongo.MongoClient(connect_string)
-        except (pymongo.errors.ConnectionFailure, pymongo.errors.InvalidURI):
-            logger.critical("Unable to connect to " + connect_string + db_name)
-        except Exception as e:
-            logger.critical(
-                "Issue connecting to DB: " + connect_string + " " + db_name + " " + getattr(e, 'message', repr(e)))
+        self.connect_string = connect_string
+        self.db_name = db_name
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.tenancy_id = None
+        self._the_db = None
+        self._db_pid = None  # process ID _the_db was resolved in
+        self._tenancy = None
+        self._sessions = {}  # tenancy ID: TenantSession
+        self._sessions_lock = threading.Lock()
+
+    @property
+    def theDB(self):
+        """ Database handle, from the shared client for the connection string on first use. In a forked child the
+        handle is resolved again through clientRegistry, so the parent's MongoClient is never used, and the tenancy
+        collection handles and cached sessions built on it are replaced.
+        """
+        if self._the_db is not None and self._db_pid != os.getpid():
+            logger.info("Process " + str(os.getpid()) + " forked from " + str(self._db_pid) + ", reconnecting to " +
+                        self.db_name)
+            self._the_db = None
+            self._tenancy = None
+            self._sessions.clear()
+            if self.tenancy_id is not None:
+                self._bind_collections(self.tenancy_id)
+
+        if self._the_db is None:
+            try:
+                db_client = clientRegistry.get_client(self.connect_string, self.max_pool_size, self.min_pool_size)
+            except (pymongo.errors.ConnectionFailure, pymongo.errors.InvalidURI):
+                logger.critical("Unable to connect to " + self.db_name)
+                raise
+            except Exception as e:
+                logger.critical("Issue connecting to DB: " + self.db_name + " " + getattr(e, 'message', repr(e)))
+                raise
 
-        try:
-            self.theDB = db_client[db_name]
-        except pymongo.errors.ConnectionFailure:
-            logger.critical("Invalid database name provided:" + db_name + " ")
-        except Exception as e:
-            logger.critical("Issue with DB on startup:" + db_name + " " + getattr(e, 'message', repr(e)))
+            try:
+                self._the_db = db_client[self.db_name]
+                self._db_pid = os.getpid()
+            except Exception as e:
+                logger.critical("Issue with DB on startup:" + self.db_name + " " + getattr(e, 'message', repr(e)))
+                raise
 
-        try:
-            self.tenancy = self.theDB["MultiTenancy"]
+        return self._the_db
 
-        except pymongo.errors.CollectionInvalid:
-            logger.critical("Missing footballDB collections encountered - check.")
-        except Exception as e:
-            logger.critical("Issue getting collections in footballDB. " + getattr(e, 'message', repr(e)))
+    @property
+    def tenancy(self):
+        """ MultiTenancy collection handle.
+        """
+        db = self.theDB
+        if self._tenancy is None:
+            self._tenancy = db["MultiTenancy"]
+
+        return self._tenancy
+
+    def resolve_tenancy(self, user_id):
+        """ Resolves a user ID to its default tenancy, from tenancyCache if possible. Only found users are cached, so
+        a new user is picked up as soon as their tenancy document is added.
+
+        Parameters
+        ----------
+
+        user_id : str
+            Auth0 user ID - must start with auth0|
 
-        if list(self.tenancy.find()) is None:
-            logger.warning("Tenancy collection is empty. Fault or new deployment of service")
+        Returns
+        -------
+
+        tenancy : dict
+            Keys tenancyID, userType, teamName, revoked and userName, or None if the user has no default tenancy.
+
+        Raises
+        ------
+
+        pymongo.errors.PyMongoError
+            If the MultiTenancy collection cannot be queried.
+
+        """
+        tenancy = tenancyCache.tenancyCache.get(self.db_name, user_id)
+        if tenancy is not None:
+            return tenancy
+
+        document = self.tenancy.find_one({"$and": [{"userID": user_id, "default": True}]},
+                                         {"_id": 0, "tenancyID": 1, "userType": 1, "teamName": 1, "revoked": 1,
+                                          "userName": 1})
+        if document is None:
+            return None
+
+        tenancy = dict(tenancyID=document.get("tenancyID"),
+                       userType=document.get("userType"),
+                       teamName=document.get("teamName"),
+                       revoked=document.get("revoked"),
+                       userName=document.get("userName"))
+        tenancyCache.tenancyCache.put(self.db_name, user_id, tenancy)
+        return tenancy
 
     def load_team_tables_for_user_id(self, user_id):
         """ Called during login to set up which tenant collections to use
@@ -135,26 +258,130 @@ class FootballDB:
             return False  # no metadata for this user so new session needed. redirect to onboarding
 
         try:
-            team = self.tenancy.find_one({"$and": [{"userID": user_id, "default": True}]}, {"tenancyID": 1})
+            team = self.resolve_tenancy(user_id)
             if team is None:
                 logger.warning("User ID " + str(user_id) + "has no tenancies. May be new user")
                 return False
 
-            payments_collection = team.get("tenancyID") + "_payments"
-
-            self.payments = self.theDB[payments_collection]
-            self.games = self.theDB[team.get("tenancyID") + "_games"]
-            self.adjustments = self.theDB[
-                team.get("tenancyID") + "_adjustments"]  # unused for non-google imported accounts if ever supported
-            self.team_summary = self.theDB[team.get("tenancyID") + "_teamSummary"]
-            self.team_players = self.theDB[team.get("tenancyID") + "_teamPlayers"]
-            self.team_settings = self.theDB[team.get("tenancyID") + "_teamSettings"]
+            self._bind_tenancy(team.get("tenancyID"))
         except pymongo.errors.PyMongoError as e:
             logger.critical("Unable to load and initialise tenancy data")
             return False
 
         return True
 
+    def _bind_tenancy(self, tenancy_id):
+        """ Sets the tenancy collection handles, ensures the tenancy indexes, and migrates games to the current
+        schema if this process has not yet checked the tenancy.
+
+        Parameters
+        ----------
+
+        tenancy_id : str
+            Tenancy prefix for collections.
+
+        """
+        self._bind_collections(tenancy_id)
+        indexManager.ensure_tenant_indexes(self.theDB, tenancy_id)
+
+        # the schema version only needs checking once per process, later logins use the cached tenancy alone. A
+        # migration that fails is tried again on the next login
+        if (self.db_name, tenancy_id) not in _schemaChecked:
+            try:
+                metadata = self.team_settings.find_one({"_id": tenantMetadataId},
+                                                       {"gameSchemaVersion": 1, "playerIdVersion": 1}) or {}
+                if metadata.get("gameSchemaVersion", 1) < gameSchemaVersion:
+                    self.migrate_games_to_v2()
+                if metadata.get("playerIdVersion", 0) < playerIdVersion:
+                    self.migrate_player_ids()
+                _schemaChecked.add((self.db_name, tenancy_id))
+            except pymongo.errors.OperationFailure:
+                logger.critical("Schema of tenancy " + tenancy_id + " is not up to date, will retry on next login")
+
+    def _bind_collections(self, tenancy_id):
+        """ Sets the tenancy collection handles from the database handle.
+
+        Parameters
+        ----------
+
+        tenancy_id : str
+            Tenancy prefix for collections.
+
+        """
+        db = self.theDB
+        self.tenancy_id = tenancy_id
+        self.payments = db[tenancy_id + "_payments"]
+        self.games = db[tenancy_id + "_games"]
+        self.adjustments = db[tenancy_id + "_adjustments"]  # unused for non-google imported accounts if ever supported
+        self.team_summary = db[tenancy_id + "_teamSummary"]
+        self.team_players = db[tenancy_id + "_teamPlayers"]
+        self.team_settings = db[tenancy_id + "_teamSettings"]
+
+    def session_for_tenancy(self, tenancy_id):
+        """ Returns the TenantSession for a tenancy, creating it on first use. Sessions are cached on this FootballDB,
+        so the same session is returned to every thread serving the tenancy.
+
+        Parameters
+        ----------
+
+        tenancy_id : str
+            Tenancy prefix for collections.
+
+        Returns
+        -------
+
+        session : TenantSession
+            FootballDB bound to the tenancy.
+
+        Raises
+        ------
+
+        pymongo.errors.PyMongoError
+            If the tenancy metadata cannot be read on first use.
+
+        """
+        with self._sessions_lock:
+            session = self._sessions.get(tenancy_id)
+
+        if session is None:
+            # created outside the lock as binding may migrate games. A racing thread's session is simply discarded.
+            new_session = TenantSession(self, tenancy_id)
+            with self._sessions_lock:
+                session = self._sessions.setdefault(tenancy_id, new_session)
+
+        return session
+
+    def session_for_user(self, user_id):
+        """ Returns the TenantSession for the default tenancy of a user. The thread safe equivalent of
+        load_team_tables_for_user_id(), for use per request on a FootballDB shared between threads.
+
+        Parameters
+        ----------
+
+        user_id : str
+            Auth0 user ID - must start with auth0|
+
+        Returns
+        -------
+
+        session : TenantSession
+            FootballDB bound to the user's tenancy, or None if the user has no tenancy or there is a fault.
+
+        """
+        if user_id is None:
+            return None
+
+        try:
+            team = self.resolve_tenancy(user_id)
+            if team is None:
+                logger.warning("User ID " + str(user_id) + "has no tenancies. May be new user")
+                return None
+
+            return self.session_for_tenancy(team.get("tenancyID"))
+        except pymongo.errors.PyMongoError:
+            logger.critical("Unable to load and initialise tenancy data")
+            return None
+
     def add_team(self, team_name, user_id, user_name):
         """ Logic to add the team name into the tenancy collection from the web form
 
@@ -184,132 +411,1280 @@ class FootballDB:
                 message = "Team name " + team_name + " already exists. Re-enter tem name from Settings"
                 logger.warning(message)
             else:
-                self.tenancy.insert(dict(
+                tenancy_id = hex(int(datetime.datetime.now().timestamp() * 1000))[2:]
+                self.tenancy.insert_one(dict(
                     userName=user_name,
                     userID=user_id,
-                    tenancyID=hex(int(datetime.datetime.now().timestamp() * 1000))[2:],
+                    tenancyID=tenancy_id,
                     teamName=team_name,
                     userType="Manager",
                     revoked=False,
                     default=True))
+                tenancyCache.tenancyCache.invalidate(self.db_name, user_id)
+                indexManager.ensure_tenancy_indexes(self.theDB)
 
-                # load user collections so we can append team_settings
-                self.load_team_tables_for_user_id(user_id)
+                # load user collections (and ensure their indexes) so we can append team_settings
                 first_setting = dict(teamName=team_name)
                 settings = []
                 settings.append(first_setting)
-                self.populate_team_settings(settings)
+                self._new_team_db(user_id, tenancy_id).populate_team_settings(settings)
                 message = "Team " + team_name + " configured. Please add new players"
                 logger.info("Team " + team_name + " configured on tenancy collection for user" + user_id)
         else:
             logger.warning("add_team did not add team when user_id is not set")
             message = "Internal error. Could not add team"
 
-        return message
+        return message
+
+    def _new_team_db(self, user_id, tenancy_id):
+        """ Returns the FootballDB to write a team added by add_team() through. A FootballDB loads the new tenancy
+        itself, as the web tier expects after onboarding.
+
+        Parameters
+        ----------
+
+        user_id : str
+            Auth0 user ID of the team's manager.
+
+        tenancy_id : str
+            Tenancy prefix of the new team.
+
+        Returns
+        -------
+
+        football_db : FootballDB
+            FootballDB bound to the new tenancy.
+
+        """
+        self.load_team_tables_for_user_id(user_id)
+        return self
+
+    def get_index_report(self):
+        """ Reports declared indexes that are missing, and indexes that are unused, for the loaded tenancy.
+
+        returns
+        -------
+
+        report : dict
+            Keyed on collection name, values are dicts with missing and unused lists of index names. See
+            indexManager.report_indexes().
+
+        """
+        return indexManager.report_indexes(self.theDB, self.tenancy_id)
+
+    def get_tenant_metadata(self):
+        """ Returns the tenancy metadata document, rebuilding it first if it has no counters yet (ie a tenancy created
+        before the counters were kept).
+
+        The document is maintained by every method that adds or removes games, players or transactions, so readers
+        such as get_last_game_details() and new_manager() only need this single point lookup.
+
+        Returns
+        -------
+
+        metadata : dict
+            Keys gameSchemaVersion, gameCount, playerCount, transactionCount and lastGame, where lastGame is None or a
+            dict with keys _id, date, cost and costEach of the latest game. Empty dict if there is a fault. The player
+            name table is left out, see get_player_names().
+
+        """
+        try:
+            metadata = self.team_settings.find_one({"_id": tenantMetadataId}, {"playerNames": 0})
+            if metadata is None or any(counter not in metadata for counter in tenantCounters):
+                metadata = self.rebuild_tenant_metadata()
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to read tenancy metadata in get_tenant_metadata()")
+            logger.critical(str(e.code) + " " + str(e.details))
+            metadata = {}
+
+        return metadata
+
+    def rebuild_tenant_metadata(self):
+        """ Recalculates the counters and last game on the tenancy metadata document from the tenancy collections.
+
+        Returns
+        -------
+
+        metadata : dict
+            The rebuilt metadata document.
+
+        """
+        fields = {"gameCount": self.games.count_documents({}),
+                  "playerCount": self.team_players.count_documents({}),
+                  "transactionCount": self.payments.count_documents({}),
+                  "lastGame": self._last_game_summary(self._newest_game())}
+        self._set_tenant_metadata(fields)
+        logger.info("Rebuilt tenancy metadata for tenancy " + self.tenancy_id)
+
+        return self.team_settings.find_one({"_id": tenantMetadataId}, {"playerNames": 0})
+
+    def _newest_game(self):
+        """ Returns the latest game (by game date) with only the fields needed by _last_game_summary(), or None.
+        """
+        return self.games.find_one({}, {"_id": 1, "Date of Game dd-MON-YYYY": 1, "Cost of Game": 1, "Cost Each": 1},
+                                   sort=[("Date of Game dd-MON-YYYY", pymongo.DESCENDING), ("_id", pymongo.DESCENDING)])
+
+    @staticmethod
+    def _last_game_summary(game):
+        """ Builds the lastGame value of the tenancy metadata document from a game document, or None for no game.
+        """
+        if game is None:
+            return None
+
+        return {"_id": game.get("_id"),
+                "date": game.get("Date of Game dd-MON-YYYY"),
+                "cost": game.get("Cost of Game"),
+                "costEach": game.get("Cost Each")}
+
+    def _set_tenant_metadata(self, fields):
+        """ Sets fields on the tenancy metadata document, creating the document if needed.
+
+        Parameters
+        ----------
+
+        fields : dict
+            Field names and values to set.
+
+        """
+        self.team_settings.update_one({"_id": tenantMetadataId}, {"$set": fields}, upsert=True)
+
+    def _update_tenant_metadata(self, increments=None, last_game=None, replaced_game_id=None):
+        """ Applies a change to the tenancy metadata counters and last game in one atomic update.
+
+        The last game is replaced by last_game only if last_game is at least as recent, so concurrent writers cannot
+        move it backwards, or if the current last game is replaced_game_id (a game that has been edited or deleted).
+        If the document has no counters yet it is rebuilt instead, which includes the change.
+
+        Parameters
+        ----------
+
+        increments : dict
+            Counter names and the amount to add to each.
+
+        last_game : dict
+            Game document that may now be the latest game.
+
+        replaced_game_id : ObjectId
+            ID of an edited or deleted game. last_game must then be the latest game remaining, or None if none remain.
+
+        """
+        values = {}
+        for counter, amount in (increments or {}).items():
+            values[counter] = {"$add": ["$" + counter, amount]}
+
+        summary = self._last_game_summary(last_game)
+        if summary is not None or replaced_game_id is not None:
+            conditions = []
+            if summary is not None:
+                conditions.append({"$gte": [{"$literal": summary.get("date")},
+                                            {"$ifNull": ["$lastGame.date", datetime.datetime(1970, 1, 1, 0, 0)]}]})
+            if replaced_game_id is not None:
+                conditions.append({"$eq": ["$lastGame._id", {"$literal": replaced_game_id}]})
+            values["lastGame"] = {"$cond": [{"$or": conditions}, {"$literal": summary}, "$lastGame"]}
+
+        if len(values) == 0:
+            return
+
+        try:
+            query = {"_id": tenantMetadataId}
+            for counter in tenantCounters:
+                query[counter] = {"$exists": True}
+            result = self.team_settings.update_one(query, [{"$set": values}])
+            if result.matched_count == 0:
+                self.rebuild_tenant_metadata()
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to update tenancy metadata")
+            logger.critical(str(e.code) + " " + str(e.details))
+
+    def get_list_of_all_tenant_names(self):
+        """ Logic to get all the tenants in the DB
+
+        returns
+        -------
+
+        teams : `dict` : `list`
+            List of dictionaries of the tenancy collection.
+
+        """
+
+        teams = []
+        try:
+            teams = list(self.tenancy.find({}, {"_id": 0, "teamName": 1}))
+            if len(teams) == 0:
+                logger.info("get_list_of_all_tenant_names(): Teams list is empty")
+            else:
+                logger.info("Teams list is ", teams.join(','))
+        except Exception as e:
+            logger.critical("Could not execute find on tenancy collection" + getattr(e, 'message', repr(e)))
+
+        return teams
+
+    def get_player_names(self, refresh=False):
+        """ Returns the player ID to name table for the tenancy, from playerNames.playerNameCache if possible.
+
+        Parameters
+        ----------
+
+        refresh : boolean
+            Read the table from the DB even if it is cached.
+
+        Returns
+        -------
+
+        table : playerNames.PlayerNameTable
+
+        """
+        table = None if refresh else playerNames.playerNameCache.get(self.db_name, self.tenancy_id)
+        if table is None:
+            metadata = self.team_settings.find_one({"_id": tenantMetadataId}, {"playerNames": 1}) or {}
+            table = playerNames.PlayerNameTable(metadata.get("playerNames"))
+            playerNames.playerNameCache.put(self.db_name, self.tenancy_id, table)
+
+        return table
+
+    def resolve_player_id(self, player_name):
+        """ Returns the player ID for a name (see playerNames.name_key()). The cached name table is read again from the
+        DB on a miss, so a player added or renamed by another process is found straight away rather than after
+        ttlSeconds.
+
+        Parameters
+        ----------
+
+        player_name : str
+            Player name.
+
+        Returns
+        -------
+
+        player_id : int
+            Player ID, or None if no player has this name.
+
+        """
+        player_id = self.get_player_names().id_for(player_name)
+        if player_id is None and player_name:
+            player_id = self.get_player_names(refresh=True).id_for(player_name)
+
+        return player_id
+
+    def ensure_player_ids(self, names):
+        """ Returns the player name table, allocating player IDs for any names that do not have one. Names are matched
+        as aggCollation matches them, see playerNames.name_key(). New IDs and their names are written with one
+        conditional update of the tenancy metadata document, so two processes can never give the same new name
+        different IDs.
+
+        Parameters
+        ----------
+
+        names : `str` : `list`
+            Player names.
+
+        Returns
+        -------
+
+        table : playerNames.PlayerNameTable
+            Table including every name in names.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the IDs could not be allocated in playerIdRetries attempts.
+
+        """
+        table = self.get_player_names()
+        if len(table.missing(names)) == 0:
+            return table
+
+        with _playerIdsLock:
+            return self._allocate_player_ids(names)
+
+    def _allocate_player_ids(self, names):
+        """ Allocates player IDs for the names in names without one, see ensure_player_ids(). Called holding
+        _playerIdsLock, which only serialises the threads of this process. Between processes the names and
+        nextPlayerId (the highest ID allocated) are set in one update conditional on nextPlayerId being unchanged since
+        the table was read. If another process allocated first nothing matches, and the table is read again and the
+        names still missing retried.
+        """
+        for attempt in range(playerIdRetries):
+            # the cached table may be out of date, ie a rename or new player in another process or thread
+            metadata = self.team_settings.find_one({"_id": tenantMetadataId}, {"playerNames": 1, "nextPlayerId": 1})
+            table = playerNames.PlayerNameTable((metadata or {}).get("playerNames"))
+            playerNames.playerNameCache.put(self.db_name, self.tenancy_id, table)
+            missing = table.missing(names)
+            if len(missing) == 0:
+                return table
+
+            last_id = (metadata or {}).get("nextPlayerId")
+            fields = {"nextPlayerId": (last_id or 0) + len(missing)}
+            for offset, name in enumerate(missing):
+                fields["playerNames." + str((last_id or 0) + 1 + offset)] = name
+            query = {"_id": tenantMetadataId,
+                     "nextPlayerId": last_id if last_id is not None else {"$exists": False}}
+            try:
+                # only a missing metadata document is created, a changed one fails the match instead
+                result = self.team_settings.update_one(query, {"$set": fields}, upsert=metadata is None)
+            except pymongo.errors.DuplicateKeyError:
+                # another process created the metadata document first
+                continue
+            if result.matched_count > 0 or result.upserted_id is not None:
+                logger.info("Allocated player IDs for " + ", ".join(missing))
+                return self.get_player_names(refresh=True)
+
+        logger.critical("Unable to allocate player IDs for " + ", ".join(missing))
+        raise pymongo.errors.OperationFailure("Player ID allocation did not complete in " + str(playerIdRetries) +
+                                             " attempts")
+
+    def _relabel_payments(self, payments):
+        """ Replaces the Player label of payment documents with the player's current name, in place.
+
+        Parameters
+        ----------
+
+        payments : `dict` : `list`
+            Payment documents.
+
+        Returns
+        -------
+
+        payments : `dict` : `list`
+            The same documents.
+
+        """
+        table = self.get_player_names()
+        for payment in payments:
+            if payment.get("playerId") is not None and "Player" in payment:
+                payment["Player"] = table.name_for(payment.get("playerId"), payment.get("Player"))
+
+        return payments
+
+    def _relabel_games(self, games):
+        """ Replaces the player name labels of game documents with each player's current name, in place. The players
+        array, Booker, PlayerList and any legacy player keys (if present in the documents) are relabelled.
+
+        Parameters
+        ----------
+
+        games : `dict` : `list`
+            Game documents.
+
+        Returns
+        -------
+
+        games : `dict` : `list`
+            The same documents.
+
+        """
+        table = self.get_player_names()
+        for game in games:
+            if game.get("bookerId") is not None and "Booker" in game:
+                game["Booker"] = table.name_for(game.get("bookerId"), game.get("Booker"))
+
+            renames = {}
+            for entry in game.get("players", []):
+                name = table.name_for(entry.get("pid"), entry.get("name"))
+                if name != entry.get("name"):
+                    renames[entry.get("name")] = name
+                    entry["name"] = name
+
+            for old_name, new_name in renames.items():
+                if old_name in game:
+                    game[new_name] = game.pop(old_name)
+                if old_name + "_guests" in game:
+                    game[new_name + "_guests"] = game.pop(old_name + "_guests")
+
+            if len(renames) > 0 and isinstance(game.get("PlayerList"), str):
+                entries = []
+                for entry in game.get("PlayerList").split(","):
+                    name, has, guests = entry.partition("_has_")
+                    entries.append(renames.get(name, name) + has + guests)
+                game["PlayerList"] = ",".join(entries)
+
+        return games
+
+    def migrate_player_ids(self):
+        """ Migrator for tenancies without player IDs. Allocates an ID for every player name in the tenancy, then sets
+        the IDs with one bulk_write of update_many (matching names with aggCollation) per collection, and records
+        playerIdVersion in the tenancy metadata document. Safe to run again.
+
+        Returns
+        -------
+
+        linked : int
+            Number of documents updated.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the migration did not complete, after logging it. playerIdVersion is only recorded on success.
+
+        """
+        linked = 0
+        try:
+            names = list(self.team_players.distinct("playerName"))
+            names += self.team_summary.distinct("playerName")
+            names += self.games.distinct("players.name")
+            names += self.games.distinct("Booker")
+            names += self.payments.distinct("Player")
+            names += self.adjustments.distinct("name")
+            table = self.ensure_player_ids([name for name in names if isinstance(name, str)])
+
+            # names equal under aggCollation match each other's updates, so only the ID each name resolves to is
+            # written, never a second ID with the same name_key()
+            players = [(pid, name) for pid, name in table.names.items() if table.id_for(name) == pid]
+            for collection, field in [(self.team_players, "playerName"), (self.team_summary, "playerName"),
+                                      (self.payments, "Player"), (self.adjustments, "name")]:
+                updates = [pymongo.UpdateMany({field: name}, {"$set": {"playerId": pid}}, collation=aggCollation)
+                           for pid, name in players]
+                if len(updates) > 0:
+                    linked += collection.bulk_write(updates, ordered=False).modified_count
+
+            updates = []
+            for pid, name in players:
+                updates.append(pymongo.UpdateMany({"players.name": name}, {"$set": {"players.$[entry].pid": pid}},
+                                                  array_filters=[{"entry.name": name}], collation=aggCollation))
+                updates.append(pymongo.UpdateMany({"Booker": name}, {"$set": {"bookerId": pid}},
+                                                  collation=aggCollation))
+            if len(updates) > 0:
+                linked += self.games.bulk_write(updates, ordered=False).modified_count
+
+            for kind in ["teamSummary", "games", "payments", "adjustments", "teamPlayers"]:
+                indexManager.ensure_collection_indexes(self.theDB[self.tenancy_id + "_" + kind], kind)
+            self._set_tenant_metadata({"playerIdVersion": playerIdVersion})
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to migrate player IDs for tenancy " + self.tenancy_id)
+            logger.critical(str(e.code) + " " + str(e.details))
+            raise
+
+        logger.info("Linked player IDs on " + str(linked) + " documents")
+        return linked
+
+    @staticmethod
+    def _content_hash(document, occurrences):
+        """ Returns a stable fingerprint of a normalised import row: the sha1 of its fields (other than _id and
+        contentHash) in canonical extended JSON with sorted keys. Identical rows are told apart by a ":<n>" suffix for
+        the n-th repeat, counted in occurrences.
+
+        Parameters
+        ----------
+
+        document : dict
+            Row to fingerprint, before any player IDs are added.
+
+        occurrences : dict
+            Times each fingerprint has been seen in this import, updated in place.
+
+        Returns
+        -------
+
+        content_hash : str
+
+        """
+        content = dict((key, value) for key, value in document.items() if key not in ("_id", "contentHash"))
+        digest = hashlib.sha1(json_util.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()
+        repeat = occurrences.get(digest, 0)
+        occurrences[digest] = repeat + 1
+        return digest if repeat == 0 else digest + ":" + str(repeat)
+
+    @staticmethod
+    def _document_player_ids(document):
+        """ Returns the player IDs a payment, adjustment, team player or game document refers to.
+        """
+        player_ids = set(entry.get("pid") for entry in document.get("players", []))
+        player_ids.update([document.get("playerId"), document.get("bookerId")])
+        player_ids.discard(None)
+        return player_ids
+
+    def _sync_documents(self, collection, documents, prepare=None, scope=None, writer=None):
+        """ Makes a collection hold exactly the given documents, writing only the difference. Each document is
+        fingerprinted (see _content_hash) into contentHash. Documents whose fingerprint is not in the collection are
+        inserted, insertBatchSize at a time so a generator of documents is never held in memory at once. Stored
+        documents whose fingerprint is no longer in the import, or that have no fingerprint, are deleted. App writes
+        remove contentHash from the documents they add to or change, so a delta import replaces app changes just as a
+        full import does.
+
+        Parameters
+        ----------
+
+        collection : pymongo.collection.Collection
+            Collection to write.
+
+        documents : iterable
+            Normalised import rows.
+
+        prepare : callable
+            Called with each batch of new documents (a list) before it is inserted, to change them in place, ie to
+            set player IDs. Not called for documents that are already stored.
+
+        scope : dict
+            Filter for the stored documents the import replaces, default all.
+
+        writer : callable
+            Called as writer(collection, documents) to insert each batch of new documents, ie
+            bulkLoader.BulkLoader.insert. Defaults to collection.insert_many.
+
+        Returns
+        -------
+
+        inserted : int
+            Number of documents inserted.
+
+        deleted : int
+            Number of documents deleted.
+
+        player_ids : set
+            IDs of the players on the inserted and deleted documents.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If a read or write fails.
+
+        """
+        scope = scope or {}
+        stored = set(document.get("contentHash")
+                     for document in collection.find(scope, {"_id": 0, "contentHash": 1}))
+
+        occurrences = {}
+        imported = set()
+        inserted = 0
+        player_ids = set()
+        documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(documents, insertBatchSize))
+            if len(batch) == 0:
+                break
+
+            new_documents = []
+            for document in batch:
+                document["contentHash"] = self._content_hash(document, occurrences)
+                imported.add(document.get("contentHash"))
+                if document.get("contentHash") not in stored:
+                    new_documents.append(document)
+
+            if len(new_documents) > 0:
+                if prepare is not None:
+                    prepare(new_documents)
+                if writer is not None:
+                    writer(collection, new_documents)
+                else:
+                    collection.insert_many(new_documents)
+                inserted += len(new_documents)
+                for document in new_documents:
+                    player_ids.update(self._document_player_ids(document))
+
+        deleted = 0
+        vanished = list(stored - imported)
+        for start in range(0, len(vanished), insertBatchSize):
+            hashes = vanished[start:start + insertBatchSize]
+            query = dict(scope)
+            if None in hashes:
+                query["$or"] = [{"contentHash": {"$in": [value for value in hashes if value is not None]}},
+                                {"contentHash": None}]
+            else:
+                query["contentHash"] = {"$in": hashes}
+            for document in collection.find(query, {"playerId": 1, "bookerId": 1, "players.pid": 1}):
+                player_ids.update(self._document_player_ids(document))
+            deleted += collection.delete_many(query).deleted_count
+
+        logger.info("Synced " + collection.name + ": " + str(inserted) + " inserted, " + str(deleted) + " deleted")
+        return inserted, deleted, player_ids
+
+    def _staging_collection(self, collection):
+        """ Returns an empty staging collection to build a full replacement for collection in, see _swap_in(). A
+        staging collection left by an earlier build that failed is dropped first.
+
+        Parameters
+        ----------
+
+        collection : pymongo.collection.Collection
+            Tenancy collection to be replaced.
+
+        Returns
+        -------
+
+        staging : pymongo.collection.Collection
+            Empty collection named collection name + stagingSuffix, in the same database.
+
+        """
+        staging = self.theDB[collection.name + stagingSuffix]
+        staging.drop()
+        # created explicitly so an import with no documents still has a collection to swap in
+        self.theDB.create_collection(staging.name)
+        return staging
+
+    def _swap_in(self, staging, collection):
+        """ Replaces collection with a staging collection built by _staging_collection(). The indexes of collection
+        are created on staging first, then one renameCollection with dropTarget swaps it in atomically, so readers
+        see the old documents until the new ones are complete and never an empty or partly written collection.
+
+        renameCollection needs both collections in the same database and is not supported on sharded collections.
+
+        Parameters
+        ----------
+
+        staging : pymongo.collection.Collection
+            Fully written staging collection.
+
+        collection : pymongo.collection.Collection
+            Tenancy collection to replace.
+
+        """
+        indexManager.ensure_collection_indexes(staging, indexManager.collection_kind(collection.name))
+        staging.rename(collection.name, dropTarget=True)
+        logger.info("Swapped " + staging.name + " in as " + collection.name)
+
+    def _replace_collection(self, collection, build):
+        """ Builds a full replacement for collection in a staging collection and swaps it in, see _staging_collection()
+        and _swap_in(). If the build or the swap fails the staging collection is dropped, so no partly written copy is
+        left beside collection, which is unchanged.
+
+        Parameters
+        ----------
+
+        collection : pymongo.collection.Collection
+            Tenancy collection to replace.
+
+        build : callable
+            Called with the empty staging collection to write the replacement into.
+
+        Returns
+        -------
+
+        result : object
+            What build returned.
+
+        """
+        staging = self._staging_collection(collection)
+        try:
+            result = build(staging)
+            self._swap_in(staging, collection)
+        except Exception:
+            logger.error("Could not replace " + collection.name + ", dropping " + staging.name)
+            try:
+                staging.drop()
+            except pymongo.errors.PyMongoError as e:
+                logger.error("Could not drop " + staging.name + ": " + str(e))
+            raise
+        return result
+
+    def populate_payments(self, payment_history, delta=False, writer=None):
+        """ Logic to add all transactions into the payments collections. This function replaces all existing payments,
+        unless delta is set. The replacement is built in a staging collection and swapped in when complete, see
+        _swap_in().
+
+        Parameters
+        ----------
+
+        payment_history : `dict` : `list`
+            List of dictionaries containing payment data. Any iterable of dicts is accepted, ie a generator, and is
+            inserted insertBatchSize documents at a time.
+
+        delta : boolean
+            Only insert new or changed payments and delete those no longer in payment_history, see _sync_documents().
+            Payments added since the last import are deleted, as they would be by a full import.
+
+        writer : callable
+            Inserts each batch of payments, see _sync_documents().
+
+        Returns
+        -------
+
+        player_ids : set
+            IDs of the players whose payments were inserted or deleted, for calc_populate_team_summary().
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the import could not be written, after logging it, so an import is never reported as complete when
+            it is not.
+
+        """
+        # payments should be a list of dicts for each record
+
+        def set_player_ids(batch):
+            table = self.ensure_player_ids([payment.get("Player") for payment in batch])
+            for payment in batch:
+                payment["playerId"] = table.id_for(payment.get("Player"))
+
+        player_ids = set()
+        try:
+            if delta:
+                inserted, deleted, player_ids = self._sync_documents(self.payments, payment_history, set_player_ids,
+                                                                     writer=writer)
+                indexManager.ensure_collection_indexes(self.payments)
+            else:
+                logger.info("Building payments collection in staging in populate_payments()")
+                inserted, deleted, player_ids = self._replace_collection(
+                    self.payments, lambda staging: self._sync_documents(staging, payment_history, set_player_ids,
+                                                                        writer=writer))
+            self._set_tenant_metadata({"transactionCount": self.payments.count_documents({})})
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to insert data into Payments table in populate_payments()")
+            logger.critical(str(e.code) + " " + str(e.details))
+            raise
+
+        return player_ids
+
+    def populate_games(self, played_games, delta=False, writer=None):
+        """ Logic to add all games into the games collection. This function replaces all existing games, unless delta
+        is set. The replacement is built in a staging collection and swapped in when complete, see _swap_in().
+
+        Parameters
+        ----------
+
+        played_games : `dict` : `list`
+            List of dictionaries containing game data. Any iterable of dicts is accepted, ie a generator, and is
+            inserted insertBatchSize documents at a time. A players roster already on a game (ie from
+            googleImport.calc_player_list) is stored as given, otherwise it is derived from the player keys.
+
+        delta : boolean
+            Only insert new or changed games and delete those no longer in played_games, see _sync_documents(). Games
+            added since the last import are deleted, as they would be by a full import.
+
+        writer : callable
+            Inserts each batch of games, see _sync_documents().
+
+        Returns
+        -------
+
+        player_ids : set
+            IDs of the players (and bookers) of the games inserted or deleted, for calc_populate_team_summary().
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the import could not be written, after logging it, so an import is never reported as complete when
+            it is not.
+
+        """
+        # games should be a list of dicts for each record. This call replaces existing data.
+
+        def set_roster(batch):
+            for game in batch:
+                game["players"] = self._game_roster(game)
+                game["schemaVersion"] = gameSchemaVersion
+            table = self.ensure_player_ids([entry.get("name") for game in batch for entry in game.get("players")] +
+                                           [game.get("Booker") for game in batch])
+            for game in batch:
+                for entry in game.get("players"):
+                    entry["pid"] = table.id_for(entry.get("name"))
+                game["bookerId"] = table.id_for(game.get("Booker"))
+
+        player_ids = set()
+        try:
+            if delta:
+                inserted, deleted, player_ids = self._sync_documents(self.games, played_games, set_roster,
+                                                                     writer=writer)
+                indexManager.ensure_collection_indexes(self.games)
+            else:
+                logger.info("Building games collection in staging in populate_games()")
+                inserted, deleted, player_ids = self._replace_collection(
+                    self.games, lambda staging: self._sync_documents(staging, played_games, set_roster, writer=writer))
+            fields = {"gameCount": self.games.count_documents({}),
+                      "lastGame": self._last_game_summary(self._newest_game())}
+            if not delta:
+                fields["gameSchemaVersion"] = gameSchemaVersion
+            self._set_tenant_metadata(fields)
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to insert data into Games collection")
+            logger.critical(str(e.code) + " " + str(e.details))
+            raise
+
+        return player_ids
+
+    def populate_adjustments(self, new_adjustments, delta=False, writer=None):
+        """ Logic to add all adjustments into the adjustment collection. This function replaces all existing
+        adjustments, unless delta is set. The replacement is built in a staging collection and swapped in when
+        complete, see _swap_in().
+
+        Parameters
+        ----------
+
+        new_adjustments : `dict` : `list`
+            List of dictionaries containing adjustment data. Any iterable of dicts is accepted.
+
+        delta : boolean
+            Only insert new or changed adjustments and delete those no longer in new_adjustments.
+
+        writer : callable
+            Inserts each batch of adjustments, see _sync_documents().
+
+        Returns
+        -------
+
+        player_ids : set
+            IDs of the players whose adjustments were inserted or deleted, for calc_populate_team_summary().
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the import could not be written, after logging it, so an import is never reported as complete when
+            it is not.
+
+        """
+
+        def set_player_ids(batch):
+            table = self.ensure_player_ids([adjustment.get("name") for adjustment in batch])
+            for adjustment in batch:
+                adjustment["playerId"] = table.id_for(adjustment.get("name"))
+
+        player_ids = set()
+        try:
+            if delta:
+                inserted, deleted, player_ids = self._sync_documents(self.adjustments, new_adjustments, set_player_ids,
+                                                                     writer=writer)
+                indexManager.ensure_collection_indexes(self.adjustments)
+            else:
+                logger.info("Building adjustments collection in staging in populate_adjustments()")
+                inserted, deleted, player_ids = self._replace_collection(
+                    self.adjustments, lambda staging: self._sync_documents(staging, new_adjustments, set_player_ids,
+                                                                           writer=writer))
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to insert data into Adjustments")
+            logger.critical(str(e.code) + " " + str(e.details))
+            raise
+
+        return player_ids
+
+    def get_all_adjustments(self):
+        """ Logic to get all adjustments. AS adjustments collection obj is not restricted this fn may not have value.
+
+        Returns
+        -------
+
+        adjustments : `dict` : `list`
+            List of dictionaries containing adjustment data.
+
+        """
+        try:
+            adjustments = list(self.adjustments.find({}))
+            return adjustments
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to insert data into Adjustments")
+            logger.critical(e.code, e.details)
+
+        return None
+
+    def calc_populate_team_summary(self, players, player_ids=None):
+        """ Logic to calculate key stats in the summary including cost of all games, balance and aggregated transaction
+        values. The whole rebuild runs server side as a single aggregation pipeline over team_summary, games, payments
+        and adjustments, and the results are written back with $merge so no game or payment data passes through
+        python. Players not in the players list are removed from team_summary. $merge updates team_summary in place, so
+        readers see each player's old or new summary and never an empty collection.
+
+        Requires MongoDB 4.4+ ($unionWith and $merge into the aggregated collection). If the pipeline cannot run, the
+        per player calc_populate_team_summary_loop() is used instead.
+
+        Parameters
+        ----------
+
+        players : `str` : `list`
+            List of strings for each player name.
+
+        player_ids : set
+            If set, only these players (of players) are recalculated, ie the IDs returned by the populate_* methods
+            after a delta import. Players without a summary are still added and players not in players removed.
+
+        """
+        if player_ids is not None:
+            table = self.ensure_player_ids(players)
+            recalculate = [player for player in players if table.id_for(player) in player_ids]
+        else:
+            recalculate = players
+
+        try:
+            # $merge on playerName needs the unique playerName index with the same collation as the pipeline.
+            indexManager.ensure_collection_indexes(self.team_summary)
+            if len(recalculate) > 0:
+                self.team_summary.aggregate(self._team_summary_pipeline(recalculate) +
+                                            [{"$merge": {"into": self.team_summary.name,
+                                                         "on": "playerName",
+                                                         "whenMatched": "replace",
+                                                         "whenNotMatched": "insert"}}],
+                                            collation=aggCollation)
+        except pymongo.errors.OperationFailure as e:
+            logger.error("Server side team_summary rebuild failed, falling back to per player rebuild")
+            logger.error(str(e.code) + " " + str(e.details))
+            self.calc_populate_team_summary_loop(players)
+            return
+
+        try:
+            # players without any games, payments or adjustments produce no pipeline output, so add them with zeros.
+            # Then remove any summary rows for players that are no longer in the list.
+            summarised = set(playerNames.name_key(name) for name in self.team_summary.distinct("playerName"))
+            missing = [player for player in players if playerNames.name_key(player) not in summarised]
+            if len(missing) > 0:
+                table = self.get_player_names()
+                self.team_summary.insert_many([dict(playerName=player,
+                                                    playerId=table.id_for(player),
+                                                    gamesAttended=0,
+                                                    lastPlayed=datetime.datetime(1970, 1, 1, 0, 0),
+                                                    gamesCost=Decimal128("0.00"),
+                                                    moniespaid=Decimal128("0.00"),
+                                                    balance=Decimal128("0.00")) for player in missing])
+            self.team_summary.delete_many({"playerName": {"$nin": players}}, collation=aggCollation)
+        except pymongo.errors.OperationFailure as e:
+            logger.error("Problem with tidying team_summary after rebuild")
+            logger.error(str(e.code) + " " + str(e.details))
+
+    def _team_summary_pipeline(self, players):
+        """ Builds the aggregation pipeline that calculates team_summary documents for the requested players. The
+        pipeline starts on team_summary and unions one row per player per game, one row per payment and one row per
+        adjustment, before grouping the rows by player ID. Player IDs are allocated for any new players.
 
-    def get_list_of_all_tenant_names(self):
-        """ Logic to get all the tenants in the DB
+        Parameters
+        ----------
 
-        returns
+        players : `str` : `list`
+            List of strings for each player name.
+
+        Returns
         -------
 
-        teams : `dict` : `list`
-            List of dictionaries of the tenancy collection.
+        pipeline : `dict` : `list`
+            Aggregation stages, without any output stage. Run with aggCollation.
 
         """
+        table = self.ensure_player_ids(players)
+        player_ids = []
+        player_names = []
+        for player in players:
+            if table.id_for(player) not in player_ids:
+                player_ids.append(table.id_for(player))
+                player_names.append(player)
+
+        played = {"$in": ["$players.status", playedStatus]}  # roster statuses are stored in playedStatus case
+        # cost each is rounded half to even to money.PLACES, the same as money.share() in the add/edit game paths
+        cost_each = {"$cond": [{"$gt": ["$Players", 0]},
+                               {"$round": [{"$divide": [{"$toDecimal": "$Cost of Game"}, "$Players"]}, money.PLACES]},
+                               0]}
+
+        # the unions only read the requested players' documents, on the playerId and players.pid indexes
+        game_rows = [
+            {"$match": {"players.pid": {"$in": player_ids}}},
+            {"$project": {"_id": 0, "gameDate": "$Date of Game dd-MON-YYYY", "costEach": cost_each, "players": 1}},
+            {"$unwind": "$players"},
+            {"$project": {"playerId": "$players.pid",
+                          "gamesAttended": {"$cond": [played, 1, 0]},
+                          "gamesCost": {"$multiply": ["$costEach",
+                                                      {"$add": [{"$cond": [played, 1, 0]},
+                                                                {"$ifNull": ["$players.guests", 0]}]}]},
+                          "lastPlayed": {"$cond": [played, "$gameDate", None]}}}]
+
+        return [
+            {"$match": {"playerId": {"$in": player_ids}}},
+            {"$project": {"_id": 0, "playerId": 1}},
+            {"$unionWith": {"coll": self.games.name, "pipeline": game_rows}},
+            {"$unionWith": {"coll": self.payments.name,
+                            "pipeline": [{"$match": {"playerId": {"$in": player_ids}}},
+                                         {"$project": {"_id": 0, "playerId": 1, "moniespaid": "$Amount"}}]}},
+            {"$unionWith": {"coll": self.adjustments.name,
+                            "pipeline": [{"$match": {"playerId": {"$in": player_ids}}},
+                                         {"$project": {"_id": 0, "playerId": 1, "adjust": "$adjust"}}]}},
+            {"$group": {"_id": "$playerId",
+                        "gamesAttended": {"$sum": "$gamesAttended"},
+                        "lastPlayed": {"$max": "$lastPlayed"},
+                        "gamesCost": {"$sum": "$gamesCost"},
+                        "moniespaid": {"$sum": "$moniespaid"},
+                        "adjust": {"$sum": "$adjust"}}},
+            {"$match": {"_id": {"$in": player_ids}}},
+            {"$project": {"_id": 0,
+                          "playerId": "$_id",
+                          "playerName": {"$arrayElemAt": [{"$literal": player_names},
+                                                          {"$indexOfArray": [{"$literal": player_ids}, "$_id"]}]},
+                          "gamesAttended": 1,
+                          "lastPlayed": {"$ifNull": ["$lastPlayed", datetime.datetime(1970, 1, 1, 0, 0)]},
+                          "gamesCost": {"$toDecimal": "$gamesCost"},
+                          "moniespaid": {"$toDecimal": "$moniespaid"},
+                          "balance": {"$toDecimal": {"$add": [{"$subtract": ["$moniespaid", "$gamesCost"]},
+                                                              "$adjust"]}}}}]
+
+    def verify_team_summary(self):
+        """ Verification tool for the incremental team_summary maintenance in edit_game() and delete_game(). Runs the
+        full rebuild pipeline without writing anything and compares the result with the stored team_summary.
 
-        teams = []
+        Returns
+        -------
+
+        differences : `dict` : `list`
+            One dict per player whose stored summary differs from a full rebuild, with keys playerName, stored and
+            expected. Money values are compared rounded to pence. Empty list if team_summary is consistent.
+
+        """
+        differences = []
         try:
-            teams = list(self.tenancy.find({}, {"_id": 0, "teamName": 1}))
-            if len(teams) == 0:
-                logger.info("get_list_of_all_tenant_names(): Teams list is empty")
-            else:
-                logger.info("Teams list is ", teams.join(','))
-        except Exception as e:
-            logger.critical("Could not execute find on tenancy collection" + getattr(e, 'message', repr(e)))
+            stored = {}
+            for player in self.team_summary.find({}, {"_id": 0}):
+                stored[playerNames.name_key(player.get("playerName"))] = player
+            players = [player.get("playerName") for player in stored.values()]
+            expected = list(self.team_summary.aggregate(self._team_summary_pipeline(players), collation=aggCollation))
+        except pymongo.errors.OperationFailure as e:
+            logger.error("Unable to verify team_summary")
+            logger.error(str(e.code) + " " + str(e.details))
+            return differences
 
-        return teams
+        def comparable(summary):
+            values = {"gamesAttended": summary.get("gamesAttended", 0), "lastPlayed": summary.get("lastPlayed")}
+            for key in ["gamesCost", "moniespaid", "balance"]:
+                values[key] = money.round_pence(money.from_decimal128(summary.get(key, Decimal128("0.00"))))
+            return values
+
+        for player in expected:
+            current = stored.get(playerNames.name_key(player.get("playerName")), {})
+            if comparable(current) != comparable(player):
+                differences.append(dict(playerName=player.get("playerName"), stored=current, expected=player))
+                logger.warning("team_summary for " + player.get("playerName") + " differs from a full rebuild")
+
+        return differences
 
-    def populate_payments(self, payment_history):
-        """ Logic to add all transactions into the payments collections. This function drops all existing payments.
+    @staticmethod
+    def _game_summary_shares(game):
+        """ Works out what a single game document contributes to each player's team_summary.
 
         Parameters
         ----------
 
-        payment_history : `dict` : `list`
-            List of dictionaries containing payment data.
+        game : dict
+            Game document, or None.
+
+        Returns
+        -------
+
+        shares : dict
+            Keyed on player ID (lower case player name for roster entries without one), values are dicts with
+            playerName, gamesCost and gamesAttended (int). gamesCost is in money minor units. Guest costs are included
+            in the gamesCost of the player that brought them.
 
         """
-        # payments should be a list of dicts for each record
+        shares = {}
+        if game is None:
+            return shares
 
-        self.payments.drop()
-        logger.info("Dropping payments collection in populate_payments()")
-        try:
-            self.payments.insert_many(payment_history)
-        except pymongo.errors.OperationFailure as e:
-            logger.critical("Unable to insert data into Payments table in populate_payments()")
-            logger.critical(e.code + e.details)
+        players = game.get("Players", 0)
+        cost_each = money.share(money.from_decimal128(game.get("Cost of Game", Decimal128("0.00"))), players) \
+            if players else 0
+
+        for entry in FootballDB._game_roster(game):
+            attended = 1 if entry.get("status") in playedStatus else 0
+            key = entry.get("pid") if entry.get("pid") is not None else entry.get("name").lower()
+            share = shares.setdefault(key, dict(playerName=entry.get("name"), gamesCost=0, gamesAttended=0))
+            share["gamesCost"] += cost_each * (attended + entry.get("guests", 0))
+            share["gamesAttended"] += attended
+
+        return shares
 
-    def populate_games(self, played_games):
-        """ Logic to add all games into the games collection. This function drops all existing games.
+    @staticmethod
+    def _game_roster(game):
+        """ Returns the players array of a game document. For games still in the v1 schema (a top level key per player
+        holding their status, plus a <player>_guests key) the array is derived from those keys.
 
         Parameters
         ----------
 
-        played_games : `dict` : `list`
-            List of dictionaries containing game data.
+        game : dict
+            Game document.
 
-        """
-        # games should be a list of dicts for each record. This call replaces existing data.
-        self.games.drop()
-        logger.info("Dropping games collection in populate_games()")
-        try:
-            self.games.insert_many(played_games)
-        except pymongo.errors.OperationFailure as e:
-            logger.critical("Unable to insert data into Games collection")
-            logger.critical(e.code + e.details)
+        Returns
+        -------
+
+        players : `dict` : `list`
+            One dict per player that played or brought guests, with keys name : str, status : str (one of playedStatus,
+            None if they only brought guests) and guests : int.
 
-    def populate_adjustments(self, new_adjustments):
-        """ Logic to add all adjustments into the adjustment collection. This function drops all existing adjustments.
+        """
+        if "players" in game:
+            return game.get("players")
+
+        statuses = dict((status.lower(), status) for status in playedStatus)
+        roster = {}
+        for key, value in game.items():
+            if isinstance(value, str) and value.lower() in statuses:
+                entry = roster.setdefault(key.lower(), dict(name=key, status=None, guests=0))
+                entry["status"] = statuses.get(value.lower())
+            elif key.endswith("_guests") and isinstance(value, int) and not isinstance(value, bool):
+                entry = roster.setdefault(key[:-len("_guests")].lower(),
+                                          dict(name=key[:-len("_guests")], status=None, guests=0))
+                entry["guests"] = value
+
+        return list(roster.values())
+
+    @staticmethod
+    def _played_filter(player):
+        """ Query filter for v2 games played by a player, on the players.pid index for a player ID. For a player name
+        use with aggCollation so the players.name index is used.
 
         Parameters
         ----------
 
-        new_adjustments : `dict` : `list`
-            List of dictionaries containing adjustment data.
+        player : int or str
+            Player ID, or name of player.
+
+        Returns
+        -------
+
+        filter : dict
+            MongoDB query filter.
 
         """
+        if isinstance(player, int):
+            return {"players": {"$elemMatch": {"pid": player, "status": {"$in": playedStatus}}}}
+        return {"players": {"$elemMatch": {"name": player, "status": {"$in": playedStatus}}}}
 
-        self.adjustments.drop()
-        logger.info("Dropped adjustments collection in populate_adjustments()")
-        try:
-            self.adjustments.insert_many(new_adjustments)
-        except pymongo.errors.OperationFailure as e:
-            logger.critical("Unable to insert data into Adjustments")
-            logger.critical(e.code, e.details)
+    def migrate_games_to_v2(self, batch_size=500):
+        """ Bulk migrator for existing tenancies. Adds the v2 players array to every game that does not have one, in
+        batches of bulk_write updates, then records the schema version in the tenancy metadata document. The legacy
+        player keys and PlayerList are left in place for the web pages that display them.
 
-    def get_all_adjustments(self):
-        """ Logic to get all adjustments. AS adjustments collection obj is not restricted this fn may not have value.
+        Parameters
+        ----------
+
+        batch_size : int
+            Number of game updates sent per bulk_write.
 
         Returns
         -------
 
-        adjustments : `dict` : `list`
-            List of dictionaries containing adjustment data.
+        migrated : int
+            Number of game documents updated.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the migration did not complete, after logging it. gameSchemaVersion is only recorded on success.
 
         """
+        migrated = 0
+        updates = []
         try:
-            adjustments = list(self.adjustments.find({}))
-            return adjustments
+            indexManager.ensure_collection_indexes(self.games)
+            for game in self.games.find({"schemaVersion": {"$ne": gameSchemaVersion}}):
+                updates.append(pymongo.UpdateOne({"_id": game.get("_id")},
+                                                 {"$set": {"players": self._game_roster(game),
+                                                           "schemaVersion": gameSchemaVersion}}))
+                if len(updates) >= batch_size:
+                    migrated += self.games.bulk_write(updates, ordered=False).modified_count
+                    updates = []
+
+            if len(updates) > 0:
+                migrated += self.games.bulk_write(updates, ordered=False).modified_count
+
+            self.team_settings.update_one({"_id": tenantMetadataId},
+                                          {"$set": {"gameSchemaVersion": gameSchemaVersion}}, upsert=True)
         except pymongo.errors.OperationFailure as e:
-            logger.critical("Unable to insert data into Adjustments")
-            logger.critical(e.code, e.details)
+            logger.critical("Unable to migrate games to schema version " + str(gameSchemaVersion))
+            logger.critical(str(e.code) + " " + str(e.details))
+            raise
 
-        return None
+        logger.info("Migrated " + str(migrated) + " games to schema version " + str(gameSchemaVersion))
+        return migrated
 
-    def calc_populate_team_summary(self, players):
+    def _apply_game_delta(self, old_game, new_game, credits):
+        """ Applies the difference between two versions of a single game to team_summary with $inc updates, instead of
+        rebuilding the summary for every player. Only players in either version of the game, or with a credit, are
+        touched.
+
+        Parameters
+        ----------
+
+        old_game : dict
+            Game document before the change, None if the game is new.
+
+        new_game : dict
+            Game document after the change, None if the game has been deleted.
+
+        credits : `tuple` : `list`
+            (playerName, int money minor units) for each payment inserted alongside the game change, ie booker
+            credits.
+
+        """
+        table = self.ensure_player_ids([player for player, amount in credits])
+        old_shares = self._game_summary_shares(old_game)
+        new_shares = self._game_summary_shares(new_game)
+        old_date = old_game.get("Date of Game dd-MON-YYYY") if old_game is not None else None
+        new_date = new_game.get("Date of Game dd-MON-YYYY") if new_game is not None else None
+
+        deltas = {}
+        for key in set(old_shares) | set(new_shares):
+            old_share = old_shares.get(key, dict(gamesCost=0, gamesAttended=0))
+            new_share = new_shares.get(key, dict(gamesCost=0, gamesAttended=0))
+            delta = deltas.setdefault(key, dict(playerName=new_share.get("playerName", old_share.get("playerName")),
+                                                gamesCost=0, moniespaid=0, gamesAttended=0))
+            delta["gamesCost"] += new_share.get("gamesCost") - old_share.get("gamesCost")
+            delta["gamesAttended"] += new_share.get("gamesAttended") - old_share.get("gamesAttended")
+
+        for player, amount in credits:
+            if player is None or player == "":
+                continue
+            delta = deltas.setdefault(table.id_for(player), dict(playerName=player, gamesCost=0, moniespaid=0,
+                                                                 gamesAttended=0))
+            delta["moniespaid"] += amount
+
+        updates = []
+        recheck_last_played = []
+        for key, delta in deltas.items():
+            change = {}
+            if delta.get("gamesCost") != 0:
+                change["gamesCost"] = money.to_decimal128(delta.get("gamesCost"))
+            if delta.get("moniespaid") != 0:
+                change["moniespaid"] = money.to_decimal128(delta.get("moniespaid"))
+            if delta.get("moniespaid") - delta.get("gamesCost") != 0:
+                change["balance"] = money.to_decimal128(delta.get("moniespaid") - delta.get("gamesCost"))
+            if delta.get("gamesAttended") != 0:
+                change["gamesAttended"] = delta.get("gamesAttended")
+
+            update = {}
+            if len(change) > 0:
+                update["$inc"] = change
+            if new_shares.get(key, {}).get("gamesAttended", 0) > 0:
+                update["$max"] = {"lastPlayed": new_date}
+            if old_shares.get(key, {}).get("gamesAttended", 0) > 0 and \
+                    (new_shares.get(key, {}).get("gamesAttended", 0) == 0 or new_date < old_date):
+                # this game may have been their last played game, so lastPlayed has to be looked up again
+                recheck_last_played.append(key)
+
+            if len(update) > 0:
+                updates.append(pymongo.UpdateOne(self._summary_filter(key, delta.get("playerName")), update,
+                                                 collation=aggCollation))
+
+        try:
+            if len(updates) > 0:
+                self.team_summary.bulk_write(updates, ordered=False)
+
+            for key in recheck_last_played:
+                player = key if isinstance(key, int) else deltas.get(key).get("playerName")
+                last_game = list(self.games.find(self._played_filter(player),
+                                                 {"_id": 0, "Date of Game dd-MON-YYYY": 1},
+                                                 collation=aggCollation)
+                                 .sort("Date of Game dd-MON-YYYY", -1).limit(1))
+                if len(last_game) == 0:
+                    last_played = datetime.datetime(1970, 1, 1, 0, 0)
+                else:
+                    last_played = last_game[0].get("Date of Game dd-MON-YYYY")
+                self.team_summary.update_one(self._summary_filter(key, deltas.get(key).get("playerName")),
+                                             {"$set": {"lastPlayed": last_played}}, collation=aggCollation)
+        except pymongo.errors.OperationFailure as e:
+            logger.error("Problem applying game changes to team_summary")
+            logger.error(str(e.code) + " " + str(e.details))
+
+    @staticmethod
+    def _summary_filter(key, player_name, name_field="playerName"):
+        """ Filter for a player ID, or for player_name in name_field (with aggCollation) if key is not a player ID.
+        """
+        if isinstance(key, int):
+            return {"playerId": key}
+        return {name_field: player_name}
+
+    def calc_populate_team_summary_loop(self, players):
         """ Logic to calculate key stats in the summary including cost of all games, balance and aggregated transaction
-        values. This function drops all existing team summary data..
+        values, one player at a time. This function replaces all existing team summary data, building it in a staging
+        collection that is swapped in when complete (see _swap_in()). Kept as the fallback and benchmark baseline for
+        calc_populate_team_summary().
 
         Parameters
         ----------
@@ -319,18 +1694,18 @@ class FootballDB:
 
         """
 
-        self.team_summary.drop()
-        logger.info("Dropped team_summary collection in calc_populate_team_summary()")
         team = []
+        table = self.ensure_player_ids(players)
         aggregated_payments = self.get_aggregated_payments()
 
         for player in players:
             total_cost = 0
             games_played = 0
+            player_id = table.id_for(player)
 
             try:
-                for x in self.games.find({player: {"$in": ["Win", "Lose", "Draw", "No Show"]}}, collation=aggCollation):
-                    game_cost = float(x.get("Cost of Game").to_decimal()) / float(x.get("Players"))
+                for x in self.games.find(self._played_filter(player_id)):
+                    game_cost = money.share(money.from_decimal128(x.get("Cost of Game")), int(x.get("Players")))
                     total_cost = total_cost + game_cost
                     games_played += 1
             except pymongo.errors.OperationFailure as e:
@@ -339,17 +1714,19 @@ class FootballDB:
 
             # 8th June 2020 - now check player_guest key games and add up guest costs
             try:
-                player_guests = player + "_guests"
-                for x in self.games.find({player_guests: {"$exists": 1}}, collation=aggCollation):
-                    game_cost = float(x.get("Cost of Game").to_decimal()) / float(x.get("Players"))
-                    total_cost = total_cost + (x.get(player_guests) * game_cost)
+                for x in self.games.find({"players": {"$elemMatch": {"pid": player_id, "guests": {"$gt": 0}}}}):
+                    game_cost = money.share(money.from_decimal128(x.get("Cost of Game")), int(x.get("Players")))
+                    for entry in x.get("players"):
+                        if entry.get("pid") == player_id:
+                            total_cost = total_cost + (entry.get("guests") * game_cost)
             except pymongo.errors.OperationFailure as e:
                 logger.error("Unable to process player_guests query for player")
                 logger.error(e.code + e.details)
 
             try:
                 try:
-                    adjust_amount = self.adjustments.find_one({"name": player}, {"_id": 0, "adjust": 1})["adjust"]
+                    adjust_amount = self.adjustments.find_one({"playerId": player_id},
+                                                              {"_id": 0, "adjust": 1})["adjust"]
                 except TypeError:
                     # Player does not have a adjustment listed, so default to 0
                     adjust_amount = Decimal128("0.00")
@@ -359,9 +1736,8 @@ class FootballDB:
 
             # work out last played date via games "Date of Game dd-MMM-YYYY"
             try:
-                last_played_date = list(self.games.find({player: {"$in": ["Win", "Lose", "Draw", "No Show"]}},
-                                                        {"_id": 0, "Date of Game dd-MON-YYYY": 1},
-                                                        collation=aggCollation)
+                last_played_date = list(self.games.find(self._played_filter(player_id),
+                                                        {"_id": 0, "Date of Game dd-MON-YYYY": 1})
                                         .sort("Date of Game dd-MON-YYYY", -1).limit(1))
                 if len(last_played_date) == 0:
                     last_played_date.append({"Date of Game dd-MON-YYYY": datetime.datetime(1970, 1, 1, 0, 0)})
@@ -376,45 +1752,87 @@ class FootballDB:
             # key if it doesn't exist
             try:
                 team.append(dict(playerName=player,
+                                 playerId=player_id,
                                  gamesAttended=games_played,
                                  lastPlayed=last_played_date[0].get("Date of Game dd-MON-YYYY"),
-                                 gamesCost=Decimal128(str(total_cost)),
-                                 moniespaid=aggregated_payments.get(player, Decimal128("0.00")),
-                                 balance=Decimal128(str(float(aggregated_payments.get(player,
-                                                                                      Decimal128(
-                                                                                          "0.00")).to_decimal()) -
-                                                        total_cost + float(adjust_amount.to_decimal())))
+                                 gamesCost=money.to_decimal128(total_cost),
+                                 moniespaid=aggregated_payments.get(table.name_for(player_id), Decimal128("0.00")),
+                                 balance=money.to_decimal128(
+                                     money.from_decimal128(aggregated_payments.get(table.name_for(player_id),
+                                                                                   Decimal128("0.00"))) -
+                                     total_cost + money.from_decimal128(adjust_amount))
                                  )
                             )
             except pymongo.errors.OperationFailure as e:
                 logger.error("Problem with a player when adding their summary:")
-                logger.error(e.code + e.details)
+                logger.error(str(e.code) + " " + str(e.details))
         try:
-            self.team_summary.insert_many(team)
+            self._replace_collection(self.team_summary, lambda staging: staging.insert_many(team) if team else None)
         except pymongo.errors.OperationFailure as e:
             logger.error("Problem with inserting team_summary in DB")
-            logger.error(e.code + e.details)
+            logger.error(str(e.code) + " " + str(e.details))
 
-    def populate_team_players(self, players):
-        """ Logic to write team player names into the DB . This function drops all existing team player data..
+    def populate_team_players(self, players, delta=False, writer=None):
+        """ Logic to write team player names into the DB . This function replaces all existing team player data, unless
+        delta is set. The replacement is built in a staging collection and swapped in when complete, see _swap_in().
 
         Parameters
         ----------
 
         players : `dict` : `list`
-            Player details : key : value -> (playerName : str , retiree : boolean, comment : str)
+            Player details : key : value -> (playerName : str , retiree : boolean, comment : str). Any iterable of
+            dicts is accepted.
+
+        delta : boolean
+            Only insert new or changed players and delete those no longer in players.
+
+        writer : callable
+            Inserts each batch of players, see _sync_documents().
+
+        Returns
+        -------
+
+        player_ids : set
+            IDs of the players inserted or deleted.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the import could not be written, after logging it, so an import is never reported as complete when
+            it is not.
 
         """
         # playerName, comment
-        self.team_players.drop()
+
+        def set_player_ids(batch):
+            table = self.ensure_player_ids([player.get("playerName") for player in batch])
+            for player in batch:
+                player["playerId"] = table.id_for(player.get("playerName"))
+
+        player_ids = set()
         try:
-            self.team_players.insert_many(players)
+            if delta:
+                inserted, deleted, player_ids = self._sync_documents(self.team_players, players, set_player_ids,
+                                                                     writer=writer)
+                indexManager.ensure_collection_indexes(self.team_players)
+            else:
+                inserted, deleted, player_ids = self._replace_collection(
+                    self.team_players, lambda staging: self._sync_documents(staging, players, set_player_ids,
+                                                                            writer=writer))
+            self._set_tenant_metadata({"playerCount": self.team_players.count_documents({})})
         except pymongo.errors.OperationFailure as e:
             logger.critical("Unable to insert players into team_players collection")
-            logger.critical(e.code + e.details)
+            logger.critical(str(e.code) + " " + str(e.details))
+            raise
 
-    def populate_team_settings(self, settings):
-        """ Logic to write CFFA settings into the DB . This function drops all existing setting data.
+        return player_ids
+
+    def populate_team_settings(self, settings, delta=False):
+        """ Logic to write CFFA settings into the DB . This function replaces all existing setting data. The settings
+        are synced in place rather than swapped in from a staging collection, as the tenancy metadata document they
+        share the collection with is written concurrently (ie player IDs allocated by an import). New settings are
+        inserted before old ones are deleted, so the collection is never without settings.
 
         Parameters
         ----------
@@ -422,14 +1840,16 @@ class FootballDB:
         settings : `dict` : `list`
             Currently only teamName key is implemented.
 
+        delta : boolean
+            Kept for the populate_* signature. Settings are always synced, see _sync_documents().
+
         """
-        # TeamName
-        self.team_settings.drop()
+        # TeamName. The tenancy metadata document is outside the scope of the sync.
         try:
-            self.team_settings.insert_many(settings)
+            self._sync_documents(self.team_settings, settings, scope=settingsFilter)
         except pymongo.errors.OperationFailure as e:
             logger.critical("Unable to insert settings into team_settings collection")
-            logger.critical(e.code + e.details)
+            logger.critical(str(e.code) + " " + str(e.details))
 
     def player_exists(self, player_name):
         """ Logic to check if player exists in team_summary.
@@ -448,7 +1868,11 @@ class FootballDB:
 
           """
         # check if player name exists, return true/false
-        player = self.team_summary.find_one({"playerName": player_name})
+        player_id = self.resolve_player_id(player_name)
+        if player_id is None:
+            return False
+
+        player = self.team_summary.find_one({"playerId": player_id}, {"playerName": 1})
         if player is not None:
             if player.get("playerName", None) == player_name:
                 return True
@@ -477,18 +1901,22 @@ class FootballDB:
             message = "Player " + str(player.playername) + " already exists!"
             return message
 
+        player_id = self.ensure_player_ids([player.playername]).id_for(player.playername)
         self.team_players.insert(dict(
             playerName=player.playername,
+            playerId=player_id,
             comment=player.comment,
             retiree=player.retiree))
 
         self.team_summary.insert(dict(
             playerName=player.playername,
+            playerId=player_id,
             gamesAttended=0,
             lastPlayed=datetime.datetime(1970, 1, 1, 0, 0),
             gamesCost=Decimal128("0.00"),
             moniespaid=Decimal128("0.00"),
             balance=Decimal128("0.00")))
+        self._update_tenant_metadata({"playerCount": 1})
 
         message = "Player " + str(player.playername) + " added to System!"
         logger.info(message)
@@ -515,91 +1943,87 @@ class FootballDB:
             Message to show if action succeeded or not.
           """
         #  player is a footballClass.
-        # if name change go through every Game + TeamSummary + TeamPlayers + transactions + adjustments and
-        # update every key. Not nice.
+        # if name change only the player name table, TeamSummary and TeamPlayers change, see rename_player()
 
         # title the new player name to make sure we are consistent.
         titled_player_name = player.playername.title()
         player.playername = titled_player_name
 
         if old_player_name != player.playername:
-            our_games = self.games.find({})
-            for game in our_games:
-                if old_player_name in game:
-                    value = game.get(old_player_name)
-                    self.games.update_one({"_id": game.get("_id")},
-                                          {"$unset": {old_player_name: ""}})
-                    logger.debug("Removed player" + old_player_name + " from game " + str(game.get("_id")))
-                    self.games.update_one({"_id": game.get("_id")},
-                                          {"$set": {player.playername: value}})
-                    logger.debug("Added player" + player.playername + " to game " + str(game.get("_id")))
-
-                guest = old_player_name + "_guests"
-                if guest in game:
-                    new_guest = player.playername + "_guests"
-                    value = game.get(guest)
-                    self.games.update_one({"_id": game.get("_id")},
-                                          {"$unset": {guest: ""}})
-                    logger.debug("Removed guests for " + guest + " with id" + str(game.get("_id")))
-                    self.games.update_one({"_id": game.get("_id")},
-                                          {"$set": {new_guest: value}})
-                    logger.debug("Added guest for " + new_guest + "with game id " + str(game.get("_id")))
-
-                # done - need to separate into comma separate values, then check and rebuild as Mark and Mark D
-                # will clash
-                new_player_list = game.get("PlayerList").replace(old_player_name, player.playername)
-                if new_player_list != game.get("PlayerList"):
-                    player_name_list = game.get("PlayerList").split(',')
-                    player_name_list = [player.playername if w == old_player_name else w for w in player_name_list]
-
-                    guest = old_player_name + "_guests"
-                    new_guest = player.playername + "_guests"
-                    player_name_list = [new_guest if w == guest else w for w in player_name_list]
-
-                    self.games.update_one({"_id": game.get("_id")},
-                                          {"$set": {"PlayerList": ','.join(player_name_list)}})
-                    logger.info("PlayerList modded for old_player_name" + old_player_name + str(game.get("_id")))
-
-            # now team_summary
-            team = self.team_summary.find({})
-            for our_player in team:
-                if old_player_name == our_player.get("playerName", "None"):
-                    self.team_summary.update_one({"_id": our_player.get("_id")},
-                                                {"$set": {"playerName": player.playername}})
-                    logger.debug("Updated team_summary" + str(our_player.get(
-                        "_id")) + "for player " + old_player_name + " and changed name to " + player.playername)
-
-            # now transactions
-            transactions = self.payments.find({})
-            for transaction in transactions:
-                if old_player_name == transaction.get("Player", "None"):
-                    self.payments.update_one({"_id": transaction.get("_id")}, {"$set": {"Player": player.playername}})
-                    logger.debug("Updated transaction " + str(transaction.get(
-                        "_id")) + " for player " + old_player_name + " and changed name to " + player.playername)
-
-            # now team_players
-            team = self.team_players.find({})
-            for our_player in team:
-                if old_player_name == our_player.get("playerName", "None"):
-                    self.team_players.update_one({"_id": our_player.get("_id")},
-                                                {"$set": {"playerName": player.playername}})
-                    logger.debug("Updated teamPlayer " + str(our_player.get(
-                        "_id")) + " for player " + old_player_name + " and changed name to " + player.playername)
-
+            if not self.rename_player(old_player_name, player.playername):
+                message = "Could not rename " + old_player_name + " to " + player.playername + \
+                          ". The new name belongs to another player or the player does not exist"
+                logger.warning(message)
+                return message
             message = "Updated CFFA database from " + old_player_name + " to " + player.playername + "!"
         else:
             message = "Updated player " + player.playername + " details"
 
         # in all cases we update retiree and comment with whatever is passed - doesn't matter to check if they have
         # actually changed.
-        self.team_players.update_one({"playerName": player.playername}, {"$set":
-                                                                            {"retiree": player.retiree,
-                                                                             "comment": player.comment
-                                                                             }})
+        player_id = self.resolve_player_id(player.playername)
+        if player_id is None:
+            message = "Could not update player " + player.playername + ". The player does not exist"
+            logger.warning(message)
+            return message
+
+        self.team_players.update_one({"playerId": player_id},
+                                     {"$set": {"retiree": player.retiree,
+                                               "comment": player.comment
+                                               },
+                                      "$unset": {"contentHash": ""}})
 
         logger.info(message)
         return message
 
+    def rename_player(self, old_player_name, new_player_name):
+        """ Renames a player. Games, payments and adjustments reference the player ID, so only the player's entry in
+        the name table and their team_summary and team_players documents change. Names in older games and payments
+        are labels, replaced with the current name when read.
+
+        Parameters
+        ----------
+
+        old_player_name : str
+            Current player name.
+
+        new_player_name : str
+            New player name.
+
+        Returns
+        -------
+
+        result : boolean
+            True if renamed. False if the player has no ID, the new name belongs to another player, or there is a
+            fault.
+
+        """
+        table = self.get_player_names(refresh=True)
+        player_id = table.id_for(old_player_name)
+        if player_id is None or table.id_for(new_player_name) not in [None, player_id]:
+            return False
+
+        try:
+            # the collated unique playerName index is the final judge of a clash, so team_summary is checked and
+            # updated before the name table, leaving nothing to undo if the new name is taken
+            if self.team_summary.find_one({"playerName": new_player_name, "playerId": {"$ne": player_id}},
+                                          {"_id": 1}, collation=aggCollation) is not None:
+                return False
+            self.team_summary.update_one({"playerId": player_id}, {"$set": {"playerName": new_player_name}})
+            self.team_settings.update_one({"_id": tenantMetadataId},
+                                          {"$set": {"playerNames." + str(player_id): new_player_name}})
+            self.team_players.update_one({"playerId": player_id}, {"$set": {"playerName": new_player_name},
+                                                                   "$unset": {"contentHash": ""}})
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to rename player " + old_player_name + " to " + new_player_name)
+            logger.critical(str(e.code) + " " + str(e.details))
+            return False
+        finally:
+            playerNames.playerNameCache.invalidate(self.db_name, self.tenancy_id)
+
+        logger.info("Renamed player " + str(player_id) + " from " + old_player_name + " to " + new_player_name)
+        return True
+
     def retire_player(self, player_name):
         """ Logic to edit a retire a player
 
@@ -615,8 +2039,15 @@ class FootballDB:
           message : str
             Message to show if action succeeded or not.
           """
+        player_id = self.resolve_player_id(player_name)
+        if player_id is None:
+            message = "Could not retire player " + player_name + ". The player does not exist"
+            logger.warning(message)
+            return message
+
         try:
-            self.team_players.update_one({"playerName": player_name}, {"$set": {"retiree": True}})
+            self.team_players.update_one({"playerId": player_id},
+                                         {"$set": {"retiree": True}, "$unset": {"contentHash": ""}})
         except pymongo.errors.OperationFailure as e:
             logger.critical("Unable to reactivate player in team_players " + player_name)
             logger.critical(e.code + e.details)
@@ -643,8 +2074,15 @@ class FootballDB:
           message : str
             Message to show if action succeeded or not.
           """
+        player_id = self.resolve_player_id(player_name)
+        if player_id is None:
+            message = "Could not reactivate player " + player_name + ". The player does not exist"
+            logger.warning(message)
+            return message
+
         try:
-            self.team_players.update_one({"playerName": player_name}, {"$set": {"retiree": False}})
+            self.team_players.update_one({"playerId": player_id},
+                                         {"$set": {"retiree": False}, "$unset": {"contentHash": ""}})
         except pymongo.errors.OperationFailure as e:
             logger.critical("Unable to reactivate player in team_players " + player_name)
             logger.critical(e.code + e.details)
@@ -683,12 +2121,14 @@ class FootballDB:
         game_record = {"Timestamp": datetime.datetime.now(), "Winning Team Score": 1, "Losing Team Score": 1,
                        "Date of Game dd-MON-YYYY": datetime.datetime(new_game.gamedate.year, new_game.gamedate.month,
                                                                      new_game.gamedate.day),
-                       "Cost of Game": Decimal128(str(new_game.gamecost))}
+                       "Cost of Game": money.to_decimal128(money.from_number(new_game.gamecost))}
 
         #  game_record["Players"] = new_game.currentactiveplayers
         # cannot use the above as this does not include number of guests - need to set this later on
 
+        table = self.ensure_player_ids([player.playername for player in new_game.playerlist] + [new_game.booker])
         team_string = []
+        roster = []
         total_players_this_game = 0
         for player in new_game.playerlist:
             if player.playedlastgame:
@@ -700,95 +2140,91 @@ class FootballDB:
                 game_record[guest_key] = player.guests
                 team_string.append(player.playername + "_has_" + str(player.guests) + "_guests")
                 total_players_this_game += player.guests
+            if player.playedlastgame or player.guests > 0:
+                roster.append(dict(name=player.playername,
+                                   pid=table.id_for(player.playername),
+                                   status="Draw" if player.playedlastgame else None,
+                                   guests=player.guests))
 
         game_record["PlayerList"] = ",".join(team_string)
+        game_record["players"] = roster
+        game_record["schemaVersion"] = gameSchemaVersion
 
         game_record["Players"] = total_players_this_game
-        cost_each = float(new_game.gamecost) / float(total_players_this_game)
-        game_record["Cost Each"] = Decimal128(str(cost_each))
+        game_cost = money.from_number(new_game.gamecost)
+        cost_each = money.share(game_cost, total_players_this_game)
+        game_record["Cost Each"] = money.to_decimal128(cost_each)
         game_record["Booker"] = new_game.booker
+        game_record["bookerId"] = table.id_for(new_game.booker)
 
         game_record["CFFA"] = "Record submitted by CFFA user"
 
         self.games.insert(game_record)
 
         # now update summary collection for each player that played and/or has guests in new_game.playerlist
-        # then handle booker and cost of game
-
+        # then handle booker and cost of game. All players are updated in one bulk_write of $inc updates, with
+        # upserts creating any player not yet in team_summary/team_players, so the number of round trips does not
+        # depend on the number of players.
+        game_date = game_record.get("Date of Game dd-MON-YYYY")
+        summary_updates = []
+        player_updates = []
+        booking_credit = None
         for player in new_game.playerlist:
-            player_document = self.team_summary.find_one({"playerName": player.playername}, collation=aggCollation)
-            if player_document is None and player.playername != "":
-                # ok we didn't find this player so hopefully will be new! let's set the record to zeros
-                new_player = footballClasses.TeamPlayer(player.playername, False, "Created from a New Game")
-                self.add_player(new_player)
-                player_document = self.team_summary.find_one({"playerName": player.playername}, collation=aggCollation)
-                if player_document is None:
-                    logger.critical("add_game(): After adding player, player does not exist in team_summary")
-                    return False
-
-            if player.playedlastgame:
-                logger.info("Played Player:" + player.playername + " gamesCost is " + str(
-                    player_document.get("gamesCost").to_decimal()))
-                previous_cost = player_document.get("gamesCost")
-                del player_document["gamesCost"]
-                player_document["gamesCost"] = Decimal128(str(float(previous_cost.to_decimal()) + cost_each))
-                logger.info(player.playername + " cost of all games:" + str(previous_cost.to_decimal()) + " to " + str(
-                    player_document.get("gamesCost").to_decimal()))
-
-                previous_balance = player_document.get("balance")
-                del player_document["balance"]
-                player_document["balance"] = Decimal128(str(float(previous_balance.to_decimal()) - cost_each))
-                logger.info(player.playername + " balance:" + str(previous_balance.to_decimal()) + " to " + str(
-                    player_document.get("balance").to_decimal()))
-
-                player_document["lastPlayed"] = datetime.datetime(new_game.gamedate.year, new_game.gamedate.month,
-                                                                  new_game.gamedate.day)
-                player_document["gamesAttended"] = player_document.get("gamesAttended") + 1
-                # now update DB player summary record
-                self.team_summary.update_one({"playerName": player.playername},
-                                            {"$set": {
-                                                "gamesCost": player_document.get("gamesCost"),
-                                                "balance": player_document.get("balance"),
-                                                "lastPlayed": player_document.get("lastPlayed"),
-                                                "gamesAttended": player_document.get("gamesAttended")}})
+            if player.playername == "":
+                continue
+
+            played = 1 if player.playedlastgame else 0
+            cost = cost_each * (played + player.guests)
+            credit = game_cost if player.pitchbooker else 0
+            player_id = table.id_for(player.playername)
+            summary_updates.append(pymongo.UpdateOne(
+                {"playerId": player_id},
+                {"$inc": {"gamesAttended": played,
+                          "gamesCost": money.to_decimal128(cost),
+                          "moniespaid": money.to_decimal128(credit),
+                          "balance": money.to_decimal128(credit - cost)},
+                 "$max": {"lastPlayed": game_date if played else datetime.datetime(1970, 1, 1, 0, 0)},
+                 "$setOnInsert": {"playerName": player.playername}},
+                upsert=True))
+            player_updates.append(pymongo.UpdateOne(
+                {"playerId": player_id},
+                {"$setOnInsert": {"playerName": player.playername, "comment": "Created from a New Game",
+                                  "retiree": False}},
+                upsert=True))
+            logger.info("Player " + player.playername + " charged " + money.to_string(cost) + " and credited " +
+                        money.to_string(credit))
 
             if player.pitchbooker:
                 # add booking credit to transactions list as well
-                previous_balance = player_document.get("balance")
-                del player_document["balance"]
-                player_document["balance"] = Decimal128(
-                    str(float(previous_balance.to_decimal()) + float(new_game.gamecost)))
-                logger.info("Booker Player:" + player.playername + " balance is " + str(
-                    player_document.get("balance").to_decimal()))
-
-                self.team_summary.update_one({"playerName": player.playername},
-                                            {"$set": {
-                                                "balance": player_document.get("balance")
-                                            }})
-                transaction_document = {}
-                transaction_document["Player"] = player.playername
-                transaction_document["Type"] = "CFFA Booking Credit"
-                transaction_document["Amount"] = Decimal128(str(float(new_game.gamecost)))
-                transaction_document["Date"] = datetime.datetime(new_game.gamedate.year, new_game.gamedate.month,
-                                                                 new_game.gamedate.day)
-                self.payments.insert(transaction_document)
-                logger.info("Booker " + player.playername + "transaction added for booking credit of " + str(
-                    float(new_game.gamecost)))
+                booking_credit = {"Player": player.playername,
+                                  "playerId": player_id,
+                                  "Type": "CFFA Booking Credit",
+                                  "Amount": money.to_decimal128(game_cost),
+                                  "Date": game_date}
+
+        increments = {"gameCount": 1, "playerCount": 0, "transactionCount": 0}
+        try:
+            if len(summary_updates) > 0:
+                result = self.team_summary.bulk_write(summary_updates, ordered=False)
+                if result.upserted_count > 0:
+                    logger.info("add_game(): added " + str(result.upserted_count) + " new players to team_summary")
+                increments["playerCount"] = self.team_players.bulk_write(player_updates, ordered=False).upserted_count
+
+            if booking_credit is not None:
+                self.payments.insert_one(booking_credit)
+                increments["transactionCount"] = 1
+                logger.info("Booker " + booking_credit.get("Player") + " transaction added for booking credit of " +
+                            money.to_string(game_cost))
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("add_game(): unable to update team_summary, team_players or payments")
+            logger.critical(str(e.code) + " " + str(e.details))
+            return False
+        finally:
+            self._update_tenant_metadata(increments, game_record)
 
-            if player.guests > 0:
-                previous_balance = player_document.get("balance")
-                del player_document["balance"]
-                player_document["balance"] = Decimal128(str(float(previous_balance.to_decimal()) -
-                                                            (cost_each * player.guests)))
-                logger.info("Guests for player:" + player.playername)
-
-                self.team_summary.update_one({"playerName": player.playername},
-                                            {"$set": {
-                                                "balance": player_document.get("balance")
-                                            }})
         return True
 
-    def edit_game(self, db_id, edit_game_form):
+    def edit_game(self, db_id, edit_game_form, loader=None):
         """ Logic to edit a edit an existing game. Updates each player's summary figures (ie: balance)
 
           Parameters
@@ -800,6 +2236,9 @@ class FootballDB:
           edit_game_form : footballClasses.Game
             Populated game object from input form.
 
+          loader : gameLoader.GameLoader
+            Request's game loader, the game is cleared from it.
+
           Returns
           -------
 
@@ -808,8 +2247,15 @@ class FootballDB:
           """
         # db_id must be set and exists
         logger.debug("We got to edit game")
+        if loader is not None:
+            loader.clear(db_id)
 
         game_record = self.games.find_one({"_id": db_id})
+        # relabel first, so keys held under a player's previous name are replaced below
+        self._relabel_games([game_record])
+        original_record = dict(game_record)
+        table = self.ensure_player_ids([player.playername for player in edit_game_form.playerlist] +
+                                       [edit_game_form.booker, game_record.get("Booker")])
 
         # start updating each old record with content in edit_game_form
         game_record["Timestamp"] = datetime.datetime.now()
@@ -817,18 +2263,23 @@ class FootballDB:
                                                                     edit_game_form.gamedate.month,
                                                                     edit_game_form.gamedate.day)
         original_cost_game = game_record.get("Cost of Game")
-        game_record["Cost of Game"] = Decimal128(str(edit_game_form.gamecost))
+        game_cost = money.from_number(edit_game_form.gamecost)
+        game_record["Cost of Game"] = money.to_decimal128(game_cost)
 
         team_string = []
+        roster = []
         total_players_this_game = 0
         for player in edit_game_form.playerlist:
             # first check if any player is new
-            player_document = self.team_summary.find_one({"playerName": player.playername}, collation=aggCollation)
+            player_id = table.id_for(player.playername)
+            player_document = None
+            if player.playername != "":
+                player_document = self.team_summary.find_one({"playerId": player_id}, {"_id": 1})
             if player_document is None and player.playername != "":
                 # ok we didn't find this player so hopefully will be new! let's set the record to zeros
                 new_player = footballClasses.TeamPlayer(player.playername, False, "Created from an Edited Game")
                 self.add_player(new_player)
-                player_document = self.team_summary.find_one({"playerName": player.playername}, collation=aggCollation)
+                player_document = self.team_summary.find_one({"playerId": player_id}, {"_id": 1})
                 if player_document is None:
                     logger.critical("add_game(): After adding player, player does not exist in team_summary")
                     return False
@@ -848,9 +2299,15 @@ class FootballDB:
             else:
                 game_record.pop(guest_key, None)
 
-            # check for guest changes.
+            if player.playedlastgame or player.guests > 0:
+                roster.append(dict(name=player.playername,
+                                   pid=player_id,
+                                   status="Draw" if player.playedlastgame else None,
+                                   guests=player.guests))
 
         game_record["PlayerList"] = ",".join(team_string)
+        game_record["players"] = roster
+        game_record["schemaVersion"] = gameSchemaVersion
 
         # TO DO: Go through team_string again, and if any key has a value (that is set to Draw, Win, Lose, No Show,
         # No Play)
@@ -872,12 +2329,14 @@ class FootballDB:
             game_record.pop(key, None)
 
         game_record["Players"] = total_players_this_game
-        cost_each = float(edit_game_form.gamecost) / float(total_players_this_game)
-        game_record["Cost Each"] = Decimal128(str(cost_each))
+        game_record["Cost Each"] = money.to_decimal128(money.share(game_cost, total_players_this_game))
         original_booker = game_record.get("Booker")
         game_record["Booker"] = edit_game_form.booker
+        game_record["bookerId"] = table.id_for(edit_game_form.booker)
 
         game_record["CFFA"] = "Record edited by CFFA user"
+        # the edited game is no longer the imported row
+        game_record.pop("contentHash", None)
 
         # if we update then we need to add every player status and guests, long document.
         # Instead delete the game document and insert of a new one for now.
@@ -894,38 +2353,45 @@ class FootballDB:
         date_string = str(edit_game_form.gamedate.year) + "/" + str(edit_game_form.gamedate.month) + "/" + str(
             edit_game_form.gamedate.day)
 
+        credits = []
+        transactions_added = 0
         if original_booker != game_record.get("Booker") or original_cost_game != game_record.get("Cost of Game"):
             # add transaction to remove original booker credit with original cost of game then
             # add transaction to add new cost of booking with new (or same) booker)
             logger.debug("edit_game(): Cost of game or change of booker")
 
             transaction_document = {"Player": original_booker,
+                                    "playerId": table.id_for(original_booker),
                                     "Type": "CFFA Game Edit for " + date_string +
                                             ". Booker change - remove original game credit",
-                                    "Amount": Decimal128(str(float(0 - original_cost_game.to_decimal()))),
+                                    "Amount": money.to_decimal128(0 - money.from_decimal128(original_cost_game)),
                                     "Date": datetime.datetime.now()}
             self.payments.insert(transaction_document)
             logger.debug("inserted new transaction for " + original_booker + " to remove credit for this player")
 
             transaction_document = {"Player": game_record.get("Booker"),
+                                    "playerId": game_record.get("bookerId"),
                                     "Type": "CFFA Game Edit for " +
                                             date_string + ". Booker change - add new game credit",
-                                    "Amount": Decimal128(str(float(edit_game_form.gamecost))),
+                                    "Amount": money.to_decimal128(game_cost),
                                     "Date": datetime.datetime.now()}
             self.payments.insert(transaction_document)
             logger.debug(
                 "inserted new transaction for " + game_record.get("Booker") + " to add booking credit for this player")
+            credits = [(original_booker, 0 - money.from_decimal128(original_cost_game)),
+                       (game_record.get("Booker"), game_cost)]
+            transactions_added = 2
 
-        player_dict = list(self.team_summary.find({}, {"playerName": 1}))
-        player_list = []
-        for player in player_dict:
-            player_list.append(player.get("playerName"))
+        # the edited game's date or cost may have changed, so the latest game is looked up again
+        self._update_tenant_metadata({"transactionCount": transactions_added}, self._newest_game(), db_id)
 
-        self.calc_populate_team_summary(player_list)
+        # only the players in the original or edited game (and the bookers) need their summary adjusted.
+        # verify_team_summary() will compare the result against a full rebuild.
+        self._apply_game_delta(original_record, game_record, credits)
 
         return True
 
-    def delete_game(self, db_id):
+    def delete_game(self, db_id, loader=None):
         """ Logic to delete a game
 
           Parameters
@@ -934,6 +2400,9 @@ class FootballDB:
           db_id : ObjectId
             MongoDB ID to game document.
 
+          loader : gameLoader.GameLoader
+            Request's game loader, the game is cleared from it.
+
           Returns
           -------
 
@@ -943,19 +2412,26 @@ class FootballDB:
 
         # not just delete Game record (db_id), but also refund transaction (log in transaction) for booker.
         # Then recalculate summary table.
+        if loader is not None:
+            loader.clear(db_id)
         game_document = self.games.find_one({"_id": db_id})
+        self._relabel_games([game_document])
 
         transaction_document = {}
         game_date = game_document.get("Date of Game dd-MON-YYYY")
         date_string = str(game_date.year) + "/" + str(game_date.month) + "/" + str(game_date.day)
 
         transaction_document["Player"] = game_document.get("Booker")
+        booker_id = game_document.get("bookerId")
+        transaction_document["playerId"] = booker_id if booker_id is not None else \
+            self.resolve_player_id(game_document.get("Booker"))
         transaction_document["Date"] = datetime.datetime.now()
 
         if "Booker" in game_document:
 
             transaction_document["Type"] = "CFFA Game Deletion for " + date_string + ". Booker removal - game credit"
-            transaction_document["Amount"] = Decimal128(str(0 - float(game_document.get("Cost of Game").to_decimal())))
+            transaction_document["Amount"] = money.to_decimal128(
+                0 - money.from_decimal128(game_document.get("Cost of Game")))
             delete_message = "Game " + date_string + " deleted and transactions adjusted."
             logging.debug(
                 "Booking credit for booker" + game_document.get("Booker") + " removed as game is being deleted")
@@ -972,13 +2448,10 @@ class FootballDB:
         logger.debug("Inserted new transaction to remove booking credit")
 
         self.games.delete_one({"_id": db_id})
+        self._update_tenant_metadata({"gameCount": -1, "transactionCount": 1}, self._newest_game(), db_id)
 
-        player_dict = list(self.team_summary.find({}, {"playerName": 1}))
-        player_list = []
-        for player in player_dict:
-            player_list.append(player.get("playerName"))
-
-        self.calc_populate_team_summary(player_list)
+        self._apply_game_delta(game_document, None, [(transaction_document.get("Player"),
+                                                      money.from_decimal128(transaction_document.get("Amount")))])
 
         return delete_message
 
@@ -990,14 +2463,14 @@ class FootballDB:
           -------
 
           aggregated_payments : `dict` : `list`
-            dict is : key: PlayerName, value: sum
+            dict is : key: PlayerName (current name of the player ID), value: sum
           """
         aggregated_payments = {}
         try:
-            agg_cursor = self.payments.aggregate([{"$group": {"_id": "$Player", "sum": {"$sum": "$Amount"}}}
-                                                  ], collation=aggCollation)
+            table = self.get_player_names()
+            agg_cursor = self.payments.aggregate([{"$group": {"_id": "$playerId", "sum": {"$sum": "$Amount"}}}])
             for x in list(agg_cursor):
-                aggregated_payments[x.get("_id")] = x.get("sum")
+                aggregated_payments[table.name_for(x.get("_id"))] = x.get("sum")
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not aggregate payments")
             logger.critical(e.code + e.details)
@@ -1071,59 +2544,255 @@ class FootballDB:
         cur_off_date = datetime.date.today() - datetime.timedelta(days=activeDays)
         cur_off_datetime = datetime.datetime(cur_off_date.year, cur_off_date.month, cur_off_date.day)
         try:
-            games_in_db = list(self.games.find({"Date of Game dd-MON-YYYY": {"$gte": cur_off_datetime}}, {"_id": 0}))
+            games_in_db = self._relabel_games(
+                list(self.games.find({"Date of Game dd-MON-YYYY": {"$gte": cur_off_datetime}}, {"_id": 0})))
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not get list of games in get_recent_games()")
             logger.critical(e.code + e.details)
 
-        return games_in_db
+        return games_in_db
+
+    def get_games_for_player(self, player_name):
+        """ Obtain game summary data for the specified player
+
+          Parameters
+          ----------
+
+          player_name : str
+            Name of player.
+
+          Returns
+          -------
+
+          games_in_db : `dict` : `list`
+            list of recently played game data from game collection
+
+          """
+
+        games_in_db = []
+        try:
+            player_id = self.resolve_player_id(player_name)
+            games_in_db = self._relabel_games(
+                list(self.games.find(self._played_filter(player_name if player_id is None else player_id),
+                                     collation=aggCollation if player_id is None else None)))
+        except Exception as e:
+            logger.critical("Could not get list of games in get_games_for_player() with name " + player_name)
+            logger.critical(e.code + e.details)
+
+        return games_in_db
+
+    def get_all_games(self):
+        """ Obtain all game summary date
+
+          Returns
+          -------
+
+          games_in_db : `dict` : `list`
+            list of all played game data from game collection
+
+          """
+        # sort on date, latest first
+        games_in_db = []
+        try:
+            games_in_db = self._relabel_games(list(self.games.find({}).sort("Date of Game dd-MON-YYYY", -1)))
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Could not get list of games in get_all_games()")
+            logger.critical(e.code + e.details)
+
+        return games_in_db
+
+    def iter_all_games(self, page_size=None, projection=None, resume_token=None):
+        """ Generator over all games, latest first, a page at a time. Uses keyset pagination on game date and _id, so
+        each page costs one indexed query of page_size documents however deep into the list it is.
+
+        Parameters
+        ----------
+
+        page_size : int
+            Games per page, defaults to pageSize.
+
+        projection : `str` : `list`
+            Fields to return, defaults to gameListFields. _id and the game date are always returned.
+
+        resume_token : str
+            Token from a previous page, to continue after that page. None starts at the latest game.
+
+        Yields
+        ------
+
+        page : `dict` : `list`
+            Game documents.
+
+        resume_token : str
+            Token for the next page, or None if this is the last page.
+
+        """
+        return self._iter_keyset(self.games, "Date of Game dd-MON-YYYY", page_size,
+                                 gameListFields if projection is None else projection, resume_token,
+                                 self._relabel_games)
+
+    def get_games_page(self, page_size=None, projection=None, resume_token=None):
+        """ Returns one page of games, latest first. See iter_all_games().
+
+        Returns
+        -------
+
+        page : `dict` : `list`
+            Game documents, empty if there are no more games or there is a fault.
+
+        resume_token : str
+            Token for the next page, or None if this is the last page.
+
+        """
+        return next(self.iter_all_games(page_size, projection, resume_token), ([], None))
+
+    def iter_all_transactions(self, page_size=None, projection=None, resume_token=None):
+        """ Generator over all transactions, latest first, a page at a time. Uses keyset pagination on transaction
+        date and _id.
+
+        Parameters
+        ----------
+
+        page_size : int
+            Transactions per page, defaults to pageSize.
+
+        projection : `str` : `list`
+            Fields to return, defaults to all fields. _id and Date are always returned.
+
+        resume_token : str
+            Token from a previous page, to continue after that page. None starts at the latest transaction.
+
+        Yields
+        ------
+
+        page : `dict` : `list`
+            Transaction documents.
+
+        resume_token : str
+            Token for the next page, or None if this is the last page.
+
+        """
+        return self._iter_keyset(self.payments, "Date", page_size, projection, resume_token, self._relabel_payments)
+
+    def get_transactions_page(self, page_size=None, projection=None, resume_token=None):
+        """ Returns one page of transactions, latest first. See iter_all_transactions().
+
+        Returns
+        -------
+
+        page : `dict` : `list`
+            Transaction documents, empty if there are no more transactions or there is a fault.
+
+        resume_token : str
+            Token for the next page, or None if this is the last page.
+
+        """
+        return next(self.iter_all_transactions(page_size, projection, resume_token), ([], None))
+
+    @staticmethod
+    def _encode_resume_token(date, db_id):
+        """ Encodes the date and _id of the last document in a page as a URL safe string.
+        """
+        return base64.urlsafe_b64encode(json_util.dumps([date, db_id]).encode()).decode()
+
+    @staticmethod
+    def _decode_resume_token(resume_token):
+        """ Decodes a resume token back to (date, _id).
+
+        Raises
+        ------
+
+        ValueError
+            If the token was not made by _encode_resume_token(), or does not hold a datetime and an ObjectId. The
+            values are used in a query, so anything else (ie an operator document) is refused.
+
+        """
+        try:
+            decoded = json_util.loads(base64.urlsafe_b64decode(resume_token.encode()).decode())
+        except (AttributeError, TypeError, ValueError, UnicodeDecodeError):
+            raise ValueError("Invalid resume token")
+
+        if not isinstance(decoded, list) or len(decoded) != 2 or \
+                not isinstance(decoded[0], datetime.datetime) or not isinstance(decoded[1], ObjectId):
+            raise ValueError("Invalid resume token")
+
+        return decoded[0], decoded[1]
 
-    def get_games_for_player(self, player_name):
-        """ Obtain game summary data for the specified player
+    def _iter_keyset(self, collection, date_field, page_size, projection, resume_token, relabel=None):
+        """ Generator that pages through a collection sorted on date_field then _id, both descending (the order of
+        the gameDate_id and Date_id indexes). Each page continues from the last document of the previous page rather
+        than skipping, and only one page is held in memory.
 
-          Parameters
-          ----------
+        Parameters
+        ----------
 
-          player_name : str
-            Name of player.
+        collection : pymongo.collection.Collection
+            Collection to list.
 
-          Returns
-          -------
+        date_field : str
+            Date field to sort on.
 
-          games_in_db : `dict` : `list`
-            list of recently played game data from game collection
+        page_size : int
+            Documents per page, defaults to pageSize.
 
-          """
+        projection : `str` : `list`
+            Fields to return, or None for all fields.
 
-        games_in_db = []
-        try:
-            games_in_db = list(
-                self.games.find({player_name: {"$in": ["Win", "Lose", "Draw", "No Show"]}}, collation=aggCollation))
-        except Exception as e:
-            logger.critical("Could not get list of games in get_games_for_player() with name " + player_name)
-            logger.critical(e.code + e.details)
+        resume_token : str
+            Token to continue after, or None.
 
-        return games_in_db
+        relabel : callable
+            Called with each page to relabel player names in place, ie _relabel_games, or None.
 
-    def get_all_games(self):
-        """ Obtain all game summary date
+        Yields
+        ------
 
-          Returns
-          -------
+        page : `dict` : `list`
+            Documents.
 
-          games_in_db : `dict` : `list`
-            list of all played game data from game collection
+        resume_token : str
+            Token for the next page, or None if this is the last page.
 
-          """
-        # sort on date, latest first
-        games_in_db = []
-        try:
-            games_in_db = list(self.games.find({}).sort("Date of Game dd-MON-YYYY", -1))
-        except pymongo.errors.OperationFailure as e:
-            logger.critical("Could not get list of games in get_all_games()")
-            logger.critical(e.code + e.details)
+        """
+        page_size = page_size or pageSize
+        if projection is not None:
+            projection = dict.fromkeys(projection, 1)
+            projection[date_field] = 1
 
-        return games_in_db
+        after = None
+        if resume_token is not None:
+            try:
+                after = self._decode_resume_token(resume_token)
+            except ValueError:
+                logger.warning("Ignoring invalid resume token for " + collection.name)
+                return
+
+        while True:
+            query = {}
+            if after is not None:
+                query = {"$or": [{date_field: {"$lt": after[0]}},
+                                 {date_field: after[0], "_id": {"$lt": after[1]}}]}
+            try:
+                # one extra document shows whether there is a further page
+                page = list(collection.find(query, projection)
+                            .sort([(date_field, pymongo.DESCENDING), ("_id", pymongo.DESCENDING)])
+                            .limit(page_size + 1))
+            except pymongo.errors.OperationFailure as e:
+                logger.critical("Could not get page of " + collection.name)
+                logger.critical(str(e.code) + " " + str(e.details))
+                return
+
+            if relabel is not None:
+                relabel(page[:page_size])
+
+            if len(page) <= page_size:
+                if len(page) > 0 or after is None:
+                    yield page, None
+                return
+
+            page = page[:page_size]
+            after = (page[-1].get(date_field), page[-1].get("_id"))
+            yield page, self._encode_resume_token(after[0], after[1])
 
     def get_recent_transactions(self):
         """ Obtain transaction data within a recent timeframe (hardcoded daysForRecentPayment value)
@@ -1140,7 +2809,8 @@ class FootballDB:
         cur_off_datetime = datetime.datetime(cur_off_date.year, cur_off_date.month, cur_off_date.day)
 
         try:
-            recent_transactions = list(self.payments.find({"Date": {"$gte": cur_off_datetime}}, {"_id": 0}))
+            recent_transactions = self._relabel_payments(
+                list(self.payments.find({"Date": {"$gte": cur_off_datetime}}, {"_id": 0})))
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not get list of transactions in get_recent_transactions()")
             logger.critical(e.code + e.details)
@@ -1159,7 +2829,7 @@ class FootballDB:
           """
         all_transactions = []
         try:
-            all_transactions = list(self.payments.find({}).sort("Date", -1))
+            all_transactions = self._relabel_payments(list(self.payments.find({}).sort("Date", -1)))
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not get list of transactions in get_all_transactions()")
             logger.critical(e.code + e.details)
@@ -1179,18 +2849,53 @@ class FootballDB:
           """
         # return list dict of players containing keys of "name" and
         # "lastGamePlayed" value 1 (default checked) or 0 (not checked)
+        active_players, last_game = self._active_players_and_last_game()
+        return active_players
+
+    def _active_players_and_last_game(self):
+        """ Fetches the active players (as get_active_players_for_new_game()) and the last game details (as
+        get_last_game_details()) in one aggregation, a $unionWith of the tenancy metadata document onto team_summary.
+
+          Returns
+          -------
+
+          active_players : `dict` : `list`
+            list of recent played players with 'lastGamePlayed' key set to whether they played the last game or not.
+
+          last_game : `dict` : `list`
+            Single element list, as returned by get_last_game_details().
+
+          """
         active_players = []
+        metadata = None
         # work out datetime for cutoff.
         cur_off_date = datetime.date.today() - datetime.timedelta(days=activeDays)
         cur_off_datetime = datetime.datetime(cur_off_date.year, cur_off_date.month, cur_off_date.day)
         try:
-            active_players = list(
-                self.team_summary.find({"lastPlayed": {"$gte": cur_off_datetime}}, {"playerName": 1, "lastPlayed": 1}))
+            for row in self.team_summary.aggregate([
+                    {"$match": {"lastPlayed": {"$gte": cur_off_datetime}}},
+                    {"$project": {"playerName": 1, "lastPlayed": 1}},
+                    {"$unionWith": {"coll": self.team_settings.name,
+                                    "pipeline": [{"$match": {"_id": tenantMetadataId}},
+                                                 {"$project": {"playerNames": 0}},
+                                                 {"$project": {"_id": 0, "metadata": "$$ROOT"}}]}}]):
+                if "metadata" in row:
+                    metadata = row.get("metadata")
+                else:
+                    active_players.append(row)
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not get active Players from Summary in get_active_players_for_new_game()")
-            logger.critical(e.code + e.details)
-
-        last_game = self.get_last_game_details()
+            logger.critical(str(e.code) + " " + str(e.details))
+
+        if metadata is not None and all(counter in metadata for counter in tenantCounters):
+            last_game = [{"Date of Game dd-MON-YYYY": datetime.datetime(1970, 1, 1, 0, 0),
+                          "Cost of Game": Decimal128("0.00")}]
+            if metadata.get("lastGame") is not None:
+                last_game = [{"Date of Game dd-MON-YYYY": metadata.get("lastGame").get("date"),
+                              "Cost of Game": metadata.get("lastGame").get("cost")}]
+        else:
+            # metadata not built yet for this tenancy, get_last_game_details() rebuilds it
+            last_game = self.get_last_game_details()
 
         for player in active_players:
             if player["lastPlayed"] == last_game[0].get("Date of Game dd-MON-YYYY"):
@@ -1198,7 +2903,7 @@ class FootballDB:
             else:
                 player["lastGamePlayed"] = False  # not checked
 
-        return active_players
+        return active_players, last_game
 
     def get_inactive_players_for_new_game(self):
         """ Returns a list of player dicts (who have not played  more than activeDays static)
@@ -1235,23 +2940,12 @@ class FootballDB:
 
           """
         # return the last game cost in Decimal128 in a single element list of dict with date and cost.
-        last_played = []
-        try:
-            last_played = list(self.games.find({}, {"_id": 0, "Date of Game dd-MON-YYYY": 1, "Cost of Game": 1},
-                                               collation=aggCollation)
-                               .sort("Date of Game dd-MON-YYYY", -1).limit(1))
-            if len(last_played) == 0:
-                last_played.append({"Date of Game dd-MON-YYYY": datetime.datetime(1970, 1, 1, 0, 0),
-                                    "Cost of Game": Decimal128("0.00")})
-        except ValueError:
-            logger.warning("Unable to find last played game")
-            last_played = []
-            last_played.append({"Date of Game dd-MON-YYYY": datetime.datetime(1970, 1, 1, 0, 0),
-                                "Cost of Game": Decimal128("0.00")})
-            # last_played will be a list of a single element of datetime.datetime
-            logger.warning(last_played)
-
-        return last_played
+        last_game = self.get_tenant_metadata().get("lastGame")
+        if last_game is None:
+            return [{"Date of Game dd-MON-YYYY": datetime.datetime(1970, 1, 1, 0, 0),
+                     "Cost of Game": Decimal128("0.00")}]
+
+        return [{"Date of Game dd-MON-YYYY": last_game.get("date"), "Cost of Game": last_game.get("cost")}]
 
     def get_last_game_db_id(self):
         """ Returns the DB id (_id) of the last game played.
@@ -1264,14 +2958,12 @@ class FootballDB:
 
           """
 
-        last_played = list(
-            self.games.find({}, {"_id": 1, "Date of Game dd-MON-YYYY": 1}).sort("Date of Game dd-MON-YYYY", -1).limit(
-                1))
-        if len(last_played) == 0:
+        last_game = self.get_tenant_metadata().get("lastGame")
+        if last_game is None:
             logger.warning("getLastGameDBIB(): no games found")
             return 0
 
-        return last_played[0].get("_id")
+        return last_game.get("_id")
 
     def get_defaults_for_new_game(self, logged_in_user):
         """ Returns a list of player objects with defaults for new game form. .
@@ -1291,7 +2983,8 @@ class FootballDB:
            """
         new_game_players = []
 
-        active_players = self.get_active_players_for_new_game()
+        # active players and the last game come from one aggregation
+        active_players, last_game = self._active_players_and_last_game()
 
         count = 0
         for active_player in active_players:
@@ -1312,15 +3005,27 @@ class FootballDB:
                 new_player = footballClasses.Player("empty", "", False, False, 0)
                 new_game_players.append(new_player)
 
-        last_game = self.get_last_game_details()
-
         new_game = footballClasses.Game(last_game[0].get("Cost of Game"),
                                         datetime.datetime.date(datetime.datetime.now()),
                                         new_game_players, "")
 
         return new_game
 
-    def date_of_game(self, game_db_id):
+    def game_loader(self):
+        """ Returns a new game loader for one request, to share between the game helpers (date_of_game,
+        get_game_from_db, check_game_for_booker, check_game_for_guests, did_player_play_this_game) and pass to
+        edit_game and delete_game.
+
+        Returns
+        -------
+
+        loader : gameLoader.GameLoader
+            Loader of this tenancy's games, relabelled with current player names.
+
+        """
+        return gameLoader.GameLoader(self.games, self._relabel_games)
+
+    def date_of_game(self, game_db_id, loader=None):
         """ Returns a datetime.datetime date of the game based on the DB _id.. .
 
             Parameters
@@ -1329,6 +3034,9 @@ class FootballDB:
             game_db_id : ObjectID
                 Unique object ID for the game document.
 
+            loader : gameLoader.GameLoader
+                Request's game loader, or None to query the game.
+
            Returns
            -------
 
@@ -1336,13 +3044,16 @@ class FootballDB:
              Date of game..
 
            """
-        game_date = self.games.find_one({"_id": game_db_id}, {"Date of Game dd-MON-YYYY": 1})
+        if loader is not None:
+            game_date = loader.load(game_db_id)
+        else:
+            game_date = self.games.find_one({"_id": game_db_id}, {"Date of Game dd-MON-YYYY": 1})
         our_date = ""
         if game_date is not None:
             our_date = game_date.get("Date of Game dd-MON-YYYY")
         return our_date
 
-    def get_game_details_for_edit_delete_form(self, game_db_id, long):
+    def get_game_details_for_edit_delete_form(self, game_db_id, long, loader=None):
         """ Returns a list of player objects with defaults for new game form. .
 
             Parameters
@@ -1354,6 +3065,9 @@ class FootballDB:
             long : Boolean
                 If this is true add a player obj for every player in the DB.
 
+            loader : gameLoader.GameLoader
+                Request's game loader. The game read here is added to it.
+
            Returns
            -------
 
@@ -1362,21 +3076,49 @@ class FootballDB:
              forms.
         """
 
+        # all players (from summary table) and the game document are fetched in one aggregation, then each player is
+        # checked against the game's roster and booker.
         game_players = []
-        all_players = self.get_all_players()  # from summary table
+        all_players = []
+        game = None
+        try:
+            for row in self.team_summary.aggregate([
+                    {"$project": {"playerName": 1}},
+                    {"$unionWith": {"coll": self.games.name,
+                                    "pipeline": [{"$match": {"_id": game_db_id}},
+                                                 {"$project": {"_id": 0, "game": "$$ROOT"}}]}}]):
+                if "game" in row:
+                    game = row.get("game")
+                else:
+                    all_players.append(row)
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Could not get players and game in get_game_details_for_edit_delete_form()")
+            logger.critical(str(e.code) + " " + str(e.details))
+
+        roster = {}
+        game_booker = ""
+        if game is not None:
+            self._relabel_games([game])
+            if loader is not None:
+                loader.prime(game)
+            game_booker = game.get("Booker", "")
+            for entry in self._game_roster(game):
+                roster[entry.get("name").lower()] = entry
+
         count = 0
         for player in all_players:
-            if player.get("playerName") == self.check_game_for_booker(game_db_id):
+            if player.get("playerName") == game_booker:
                 booker = True
             else:
                 booker = False
 
-            if self.did_player_play_this_game(game_db_id, player.get("playerName")):
+            entry = roster.get(player.get("playerName", "").lower(), {})
+            if entry.get("status") in playedStatus:
                 played_game = True
             else:
                 played_game = False
 
-            guests = self.check_game_for_guests(game_db_id, player.get("playerName"))
+            guests = entry.get("guests", 0)
             if long or booker or played_game or guests > 0:
                 add_player = footballClasses.Player(player.get("_id"),
                                                     player.get("playerName"),
@@ -1392,7 +3134,7 @@ class FootballDB:
                 blank_player = footballClasses.Player("empty", "", False, False, 0)
                 game_players.append(blank_player)
 
-        return self.get_game_from_db(game_db_id, game_players)
+        return self._game_from_document(game, game_players)
 
     def new_manager(self):
         """ If this is a new manager session (played less than 3 games, keep a banner popping up. .
@@ -1404,15 +3146,13 @@ class FootballDB:
              Return true if the manager has only submitted 3 games or less, else False.
 
            """
-        all_games = list(self.games.find())
-        if len(all_games) <= 3:
+        if self.get_tenant_metadata().get("gameCount", 0) <= 3:
             return True
 
         return False
 
     def get_all_players(self):
-        """ Returns a list of all player details - requires an effective join between team_summary and team_players, not
-         efficient in mongoDB as it is not relational..
+        """ Returns a list of all player details, joining team_summary and team_players. See _player_view().
 
            Returns
            -------
@@ -1423,26 +3163,57 @@ class FootballDB:
         """
         all_players = []
         try:
-            all_players = list(self.team_summary.find({}, {"_id": 1, "playerName": 1, "lastGamePlayed": 1}))
-        except pymongo.errors.OperationFailure as e:
-            logger.critical("Could not get All Players from Summary in get_all_players()")
-            logger.critical(e.code + e.details)
-
-        try:
-            # inefficient - mongoDB is not relational!
-            all_player_details = list(self.team_players.find({}))
-            for player in all_players:
-                for playerX in all_player_details:
-                    if player.get("playerName", None) == playerX.get("playerName", "Not Set"):
-                        player["retiree"] = playerX.get("retiree", False)
-                        player["comment"] = playerX.get("comment", "No comment set")
+            all_players = self._player_view()
         except pymongo.errors.OperationFailure as e:
-            logger.critical("Could not get/process All Players from team_players in get_all_players()")
-            logger.critical(e.code + e.details)
+            logger.critical("Could not get All Players in get_all_players()")
+            logger.critical(str(e.code) + " " + str(e.details))
 
         return all_players
 
-    def get_game_from_db(self, game_db_id, player_list):
+    def _player_view(self, player_name=None):
+        """ Joins each team_summary player to their team_players document with $lookup, on the playerId index, in one
+        aggregation.
+
+        Parameters
+        ----------
+
+        player_name : str
+            If set only this player is returned.
+
+        Returns
+        -------
+
+        players : `dict` : `list`
+            One dict per team_summary player with keys _id, playerName, and retiree and comment from team_players.
+            retiree and comment are left out if the player has no team_players document.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If the aggregation fails.
+
+        """
+        pipeline = []
+        if player_name is not None:
+            pipeline.append({"$match": {"playerName": player_name}})
+
+        has_details = {"$ne": [{"$type": "$details"}, "missing"]}
+        pipeline += [
+            {"$project": {"playerName": 1, "playerId": 1}},
+            {"$lookup": {"from": self.team_players.name,
+                         "localField": "playerId",
+                         "foreignField": "playerId",
+                         "as": "details"}},
+            {"$set": {"details": {"$arrayElemAt": ["$details", 0]}}},
+            {"$project": {"playerName": 1,
+                          "retiree": {"$cond": [has_details, {"$ifNull": ["$details.retiree", False]}, "$$REMOVE"]},
+                          "comment": {"$cond": [has_details, {"$ifNull": ["$details.comment", "No comment set"]},
+                                                "$$REMOVE"]}}}]
+
+        return list(self.team_summary.aggregate(pipeline, collation=aggCollation))
+
+    def get_game_from_db(self, game_db_id, player_list, loader=None):
 
         """ Returns a game object from game_db_id key.
 
@@ -1453,7 +3224,10 @@ class FootballDB:
                 Unique object ID for the game document.
 
             player_list : `footballClasses.Player` : `list`
-                A list of Player objects.
+                A list of Player objects. If None, the list is built from the game's players array.
+
+            loader : gameLoader.GameLoader
+                Request's game loader, or None to query the game.
 
            Returns
            -------
@@ -1463,15 +3237,52 @@ class FootballDB:
 
         """
 
-        game = self.games.find_one({"_id": game_db_id}, {"Date of Game dd-MON-YYYY": 1, "Cost of Game": 1,
-                                                         "PlayerList": 1, "Players": 1, "Booker": 1})
+        if loader is not None:
+            game = loader.load(game_db_id)
+        else:
+            game = self.games.find_one({"_id": game_db_id}, {"Date of Game dd-MON-YYYY": 1, "Cost of Game": 1,
+                                                             "PlayerList": 1, "Players": 1, "Booker": 1, "players": 1,
+                                                             "bookerId": 1})
+            if game is not None:
+                self._relabel_games([game])
+
+        return self._game_from_document(game, player_list)
+
+    @staticmethod
+    def _game_from_document(game, player_list):
+        """ Builds a game object from a game document. See get_game_from_db().
+
+            Parameters
+            ----------
+
+            game : dict
+                Game document, or None.
 
+            player_list : `footballClasses.Player` : `list`
+                A list of Player objects. If None, the list is built from the game's players array.
+
+           Returns
+           -------
+
+           game : `footballClasses.Game`
+             Game object, or None if there is no game document.
+
+        """
         our_game = None
         booker = ""
         if game is not None:
             if "Booker" in game:
                 booker = game["Booker"]
 
+            if player_list is None:
+                player_list = []
+                for entry in game.get("players", []):
+                    player_list.append(footballClasses.Player("empty",
+                                                              entry.get("name"),
+                                                              entry.get("status") in playedStatus,
+                                                              entry.get("name") == booker,
+                                                              entry.get("guests", 0)))
+
             game_date = datetime.datetime.date(game.get("Date of Game dd-MON-YYYY"))
             our_game = footballClasses.Game(game.get("Cost of Game"),
                                             game_date,
@@ -1479,7 +3290,7 @@ class FootballDB:
 
         return our_game
 
-    def check_game_for_booker(self, game_db_id):
+    def check_game_for_booker(self, game_db_id, loader=None):
         """ returns the booker playerName for requested game ID
 
         Parameters
@@ -1488,6 +3299,9 @@ class FootballDB:
             game_db_id : ObjectID
                 Unique object ID for the game document.
 
+            loader : gameLoader.GameLoader
+                Request's game loader, or None to query the game.
+
         Returns
         -------
 
@@ -1495,7 +3309,12 @@ class FootballDB:
             The booker name string (playerName)
         """
 
-        game = self.games.find_one({"_id": game_db_id}, {"Booker": 1})
+        if loader is not None:
+            game = loader.load(game_db_id)
+        else:
+            game = self.games.find_one({"_id": game_db_id}, {"Booker": 1, "bookerId": 1})
+            if game is not None:
+                self._relabel_games([game])
         booker = ""
         if game is not None:
             if "Booker" in game:
@@ -1503,7 +3322,7 @@ class FootballDB:
 
         return booker
 
-    def check_game_for_guests(self, game_db_id, player_name):
+    def check_game_for_guests(self, game_db_id, player_name, loader=None):
         """ checks the player_list value for the specified game and player for number of guests using regex
 
         Parameters
@@ -1515,6 +3334,9 @@ class FootballDB:
         player_name : str
             player to check for guests
 
+        loader : gameLoader.GameLoader
+            Request's game loader, or None to query the game.
+
         Returns
         -------
 
@@ -1522,19 +3344,29 @@ class FootballDB:
                 The number of guests for requested player and game
         """
 
-        # need to traverse the playerList string for "<name>_has_X_guests"
-        game = self.games.find_one({"_id": game_db_id}, {"PlayerList": 1})
+        if loader is not None:
+            game = loader.load(game_db_id)
+        else:
+            game = self.games.find_one({"_id": game_db_id}, {"PlayerList": 1, "players": 1})
+            if game is not None:
+                self._relabel_games([game])
         guests = 0
         if game is not None:
-            must_match = player_name + "_has_(\d)+_guests"
-            regex = re.compile(must_match)
-            r = regex.search(game.get("PlayerList"))
-            if r is not None:
-                guests = r.group(1)
+            if "players" in game:
+                for entry in game.get("players"):
+                    if entry.get("name").lower() == player_name.lower():
+                        guests = entry.get("guests", 0)
+            else:
+                # v1 game, need to traverse the playerList string for "<name>_has_X_guests"
+                must_match = re.escape(player_name) + "_has_(\d+)_guests"
+                regex = re.compile(must_match)
+                r = regex.search(game.get("PlayerList", ""))
+                if r is not None:
+                    guests = int(r.group(1))
 
         return guests
 
-    def did_player_play_this_game(self, game_db_id, name):
+    def did_player_play_this_game(self, game_db_id, name, loader=None):
         """ checks if a player played the specified game
 
         Parameters
@@ -1546,16 +3378,25 @@ class FootballDB:
         name : str
             player to check for whether they played game
 
+        loader : gameLoader.GameLoader
+            Request's game loader, or None to query the game.
+
         Returns
         -------
 
             played : boolean
                 True if game played else false.
         """
-        game = self.games.find_one({"_id": game_db_id}, {name: 1})
+        if loader is not None:
+            game = loader.load(game_db_id)
+        else:
+            game = self.games.find_one({"_id": game_db_id}, {name: 1, "players": 1})
+            if game is not None:
+                self._relabel_games([game])
         if game is not None:
-            if game.get(name) in ["Win", "win", "Draw", "draw", "Lose", "lose", "no show", "No Show"]:
-                return True
+            for entry in self._game_roster(game):
+                if entry.get("name").lower() == name.lower() and entry.get("status") in playedStatus:
+                    return True
 
         return False
 
@@ -1570,11 +3411,12 @@ class FootballDB:
         """
         # returns a list of teamPlayer objects
         all_players = []
+        our_players = []
         try:
-            our_players = list(self.team_summary.find({}, {"_id": 1, "playerName": 1, "comment": 1, "retiree": 1}))
+            our_players = self._player_view()
         except pymongo.errors.OperationFailure as e:
-            logger.critical("Could not get All Players from Summary in get_all_player_details_for_player_edit()")
-            logger.critical(e.code + e.details)
+            logger.critical("Could not get All Players in get_all_player_details_for_player_edit()")
+            logger.critical(str(e.code) + " " + str(e.details))
 
         for player in our_players:
             team_player = footballClasses.TeamPlayer(player.get("playerName"),
@@ -1599,11 +3441,14 @@ class FootballDB:
             player : footballClasses.Player
 
         """
+        this_player = {}
         try:
-            this_player = self.team_players.find_one({"playerName": player_name})
+            players = self._player_view(player_name)
+            if len(players) > 0:
+                this_player = players[0]
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not get the player in team_players in get_player_defaults_for_edit()")
-            logger.critical(e.code + e.details)
+            logger.critical(str(e.code) + " " + str(e.details))
 
         player = footballClasses.TeamPlayer(player_name, this_player.get("retiree", False),
                                             this_player.get("comment", "Not set"))
@@ -1648,7 +3493,8 @@ class FootballDB:
         cur_off_date = datetime.date.today() - datetime.timedelta(days=activeDays)
         cur_off_datetime = datetime.datetime(cur_off_date.year, cur_off_date.month, cur_off_date.day)
 
-        player_last_played = self.team_summary.find_one({"playerName": player_name}, {"lastPlayed": 1})
+        player_last_played = self.team_summary.find_one({"playerName": player_name}, {"lastPlayed": 1},
+                                                        collation=aggCollation)
 
         if player_last_played.get("lastPlayed", datetime.datetime(1970, 1, 1, 0, 0)) < cur_off_datetime:
             return True
@@ -1673,17 +3519,20 @@ class FootballDB:
         """
 
         # assumes transaction.transactiondate is a datetime.date object, not datetime.datetime
-        # assumes Amount is a float
+        # assumes Amount is a float (or anything money.from_number() accepts)
+        amount = money.from_number(transaction.amount)
 
         if self.player_exists(transaction.player):
-            payment = {"Player": transaction.player, "Type": transaction.description,
-                       "Amount": Decimal128(str(transaction.amount)),
+            player_id = self.resolve_player_id(transaction.player)
+            payment = {"Player": transaction.player, "playerId": player_id, "Type": transaction.description,
+                       "Amount": money.to_decimal128(amount),
                        "Date": datetime.datetime(transaction.transactiondate.year,
                                                  transaction.transactiondate.month,
                                                  transaction.transactiondate.day)}
 
             try:
                 self.payments.insert(payment)
+                self._update_tenant_metadata({"transactionCount": 1})
                 message = "Added transaction £" + str(transaction.amount) + " against " + transaction.player
             except pymongo.errors.OperationFailure as e:
                 logger.critical("Could not add transaction in add_transaction()")
@@ -1698,7 +3547,7 @@ class FootballDB:
             return message
 
         # TO DO - update Summary table. ALso check if AutoPay has a duplicate
-        player_document = self.team_summary.find_one({"playerName": transaction.player}, collation=aggCollation)
+        player_document = self.team_summary.find_one({"playerId": player_id})
         if player_document is None:
             # no record for player, this should not happen as it was in a select list. lets abort
             message = "Selected player" + transaction.player + " is not in team_summary table. Did not adjust Summary"
@@ -1706,16 +3555,16 @@ class FootballDB:
             return message
 
         # only balance and moniespaid needs to be adjusted - add transaction amount to both values
-        current_balance = float(player_document.get("balance", Decimal128("0.00")).to_decimal())
-        current_payments = float(player_document.get("moniespaid", Decimal128("0.00")).to_decimal())
-        current_balance += transaction.amount
-        current_payments += transaction.amount  # transaction.amount is a float
+        current_balance = money.from_decimal128(player_document.get("balance", Decimal128("0.00")))
+        current_payments = money.from_decimal128(player_document.get("moniespaid", Decimal128("0.00")))
+        current_balance += amount
+        current_payments += amount
 
         try:
-            self.team_summary.update_one({"playerName": transaction.player},
+            self.team_summary.update_one({"playerId": player_id},
                                         {"$set": {
-                                            "balance": Decimal128(str(current_balance)),
-                                            "moniespaid": Decimal128(str(current_payments))}})
+                                            "balance": money.to_decimal128(current_balance),
+                                            "moniespaid": money.to_decimal128(current_payments)}})
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not update summary table in  add_transaction()")
             logger.critical(e.code + e.details)
@@ -1745,12 +3594,13 @@ class FootballDB:
         # return a transaction object with logged in user, amount and todays date set. description is AutoPay
         # however return a £0 credit if the transaction already exists
 
-        last_game = list(self.games.find({}).sort("Date of Game dd-MON-YYYY", -1).limit(1))
-        if len(last_game) == 1:
-            rounded_cost_each = round(last_game[0].get("Cost Each").to_decimal(), 2)
+        last_game = self.get_tenant_metadata().get("lastGame")
+        if last_game is not None and last_game.get("costEach") is not None:
+            rounded_cost_each = money.round_pence(money.from_decimal128(last_game.get("costEach")))
         else:
-            rounded_cost_each = "0.00"
-        payment = footballClasses.Transaction(user, "CFFA AutoPay", float(rounded_cost_each), datetime.date.today())
+            rounded_cost_each = 0
+        payment = footballClasses.Transaction(user, "CFFA AutoPay", money.to_float(rounded_cost_each),
+                                              datetime.date.today())
 
         return payment
 
@@ -1774,7 +3624,8 @@ class FootballDB:
         last_game = list(self.games.find({}).sort("Date of Game dd-MON-YYYY", -1).limit(1))
         if len(last_game) == 1:
             transaction = footballClasses.Transaction(player, "Transfer",
-                                                      float(round(last_game[0].get("Cost Each").to_decimal(), 2)),
+                                                      money.to_float(money.round_pence(
+                                                          money.from_decimal128(last_game[0].get("Cost Each")))),
                                                       datetime.date.today())
         else:
             transaction = footballClasses.Transaction(player, "Transfer", float("0.00"), datetime.date.today())
@@ -1799,7 +3650,7 @@ class FootballDB:
             message : str
                 Message for web user if the action succeeded or not.
         """
-        settings = list(self.team_settings.find({}))
+        settings = list(self.team_settings.find(settingsFilter))
         our_id = None
         message = ""
 
@@ -1810,7 +3661,8 @@ class FootballDB:
 
         if our_id is not None:
             try:
-                self.team_settings.update({"_id": our_id}, {"$set": {"teamName": new_name}})
+                self.team_settings.update({"_id": our_id}, {"$set": {"teamName": new_name},
+                                                            "$unset": {"contentHash": ""}})
                 message = "Successfully updated teamName from " + current_team + " to " + new_name
             except pymongo.errors.OperationFailure as e:
                 logger.critical("Could not update team_settings in  update_team_name()")
@@ -1820,6 +3672,7 @@ class FootballDB:
             try:
                 self.tenancy.update({"userID": user_id, "teamName": current_team}, {"$set": {"teamName": new_name}})
                 # TO DO:  find all records on tenancyID and update team name
+                tenancyCache.tenancyCache.invalidate(self.db_name, user_id, tenancy_id=self.tenancy_id)
             except pymongo.errors.PyMongoError:
                 logger.critical("Could not update tenancy for teamName " + current_team + " to team " + new_name)
                 message = "Internal error when updating database"
@@ -1837,7 +3690,7 @@ class FootballDB:
                 Single obj returned.
         """
         # TO DO: this is ugly, must be a better way to populate object
-        settings = list(self.team_settings.find({}))
+        settings = list(self.team_settings.find(settingsFilter))
         team_name = None
         for setting in settings:
             if setting.get("teamName", None) is not None:
@@ -1858,7 +3711,7 @@ class FootballDB:
         """
         all_settings = []
         try:
-            all_settings = list(self.team_settings.find())
+            all_settings = list(self.team_settings.find(settingsFilter))
         except pymongo.errors.OperationFailure as e:
             logger.critical("Could not get/process settings from team_settings in get_team_settings()")
             logger.critical(e.code + e.details)
@@ -1933,13 +3786,15 @@ class FootballDB:
                 Tenancy prefix for collections
         """
         try:
-            tenancy_document = self.tenancy.find_one({"$and": [{"userID": user_id, "default": True}]},
-                                                     {"tenancyID": 1})
+            tenancy_document = self.resolve_tenancy(user_id)
         except Exception as e:
             logger.critical("Unable to find tenancyID when get_tenancy_id()")
             logger.critical(e.code + e.details)
             return None
 
+        if tenancy_document is None:
+            return None
+
         return tenancy_document.get("tenancyID", None)
 
     def get_team_name(self, tenancy_id):
@@ -1959,7 +3814,7 @@ class FootballDB:
         """
         team_name = None
         try:
-            cffa_settings = list(self.team_settings.find())
+            cffa_settings = list(self.team_settings.find(settingsFilter))
             for setting in cffa_settings:
                 if setting.get("teamName", None) is not None:
                     team_name = setting.get("teamName", None)
@@ -1997,8 +3852,17 @@ class FootballDB:
                 Message contains if action was successful.
         """
 
-        tenancy_id = self.get_tenancy_id(this_user_id)
-        team_name = self.get_team_name(tenancy_id)
+        try:
+            this_user = self.resolve_tenancy(this_user_id)
+        except pymongo.errors.PyMongoError:
+            logger.critical("Unable to find tenancy of user in add_user_access()")
+            this_user = None
+
+        tenancy_id = None
+        team_name = None
+        if this_user is not None:
+            tenancy_id = this_user.get("tenancyID")
+            team_name = this_user.get("teamName") or self.get_team_name(tenancy_id)
 
         if tenancy_id is not None and team_name is not None:
             try:
@@ -2010,6 +3874,7 @@ class FootballDB:
                     userType=role,
                     revoked=False,
                     default=True))
+                tenancyCache.tenancyCache.invalidate(self.db_name, auth_id)
                 message = "Added user to CFFA"
             except Exception as e:
                 logger.critical("Unable to insert user into tenancy collection in add_user_access()")
@@ -2058,6 +3923,9 @@ class FootballDB:
                                                                           }})
             message = "Updated user " + titled_user_name + " access details"
 
+        # the user ID itself may have changed, so also drop any entry still holding the old or new user name
+        tenancyCache.tenancyCache.invalidate(self.db_name, cffa_user.authid, user_name=old_user_name)
+        tenancyCache.tenancyCache.invalidate(self.db_name, cffa_user.authid, user_name=titled_user_name)
         logger.info(message)
         return message
 
@@ -2084,8 +3952,7 @@ class FootballDB:
             # access without a user_id.
 
         try:
-            user = self.tenancy.find_one({"$and": [{"userID": user_id, "default": True}]},
-                                         {"tenancyID": 1, "userType": 1, "name": 1})
+            user = self.resolve_tenancy(user_id)
             if user is None:
                 logger.warning("User ID " + str(user_id) + "has no tenancies set. Will be new manager")
                 # TO DO: Needs to be redesigned to tighten up access.
@@ -2119,7 +3986,8 @@ class FootballDB:
 
         """
         try:
-            player_summary = self.team_summary.find_one({"playerName": player_name}, {"_id": 0})
+            player_summary = self.team_summary.find_one({"playerName": player_name}, {"_id": 0},
+                                                        collation=aggCollation)
         except Exception as e:
             logger.critical("Could not return summary in get_summary_for_player() for player " + player_name)
             logger.critical(e.code, e.details)
@@ -2141,17 +4009,181 @@ class FootballDB:
 
         return this_player
 
-    def calc_ledger_for_player(self, player_name):
+    def calc_ledger_for_player(self, player_name, page=0, limit=None, since=None):
         """ Method builds a ledger for all transactions and game costs in reverse chronological order (since their
          first transaction/game) in the form of a bank-like statement. Merges data across both transactions and
          game collections.
 
+        The merge, sort and running balance are done server side in one aggregation ($unionWith and $setWindowFields,
+        MongoDB 5.0+), so only the requested page of entries is returned. If the pipeline cannot run,
+        calc_ledger_for_player_loop() is used instead.
+
+        Parameters
+        ----------
+
+        player_name : str
+            Player to build the ledger for.
+
+        page : int
+            Page number, 0 for the latest entries. Only used with limit.
+
+        limit : int
+            Entries per page, or None for all entries.
+
+        since : datetime.datetime
+            If set, only entries on or after this date are returned. Balances still include earlier entries.
+
+        Returns
+        -------
+
+            sortedLedger : `footballClasses.LedgerEntry` : `list`
+                Latest first list of transactions and game costs showing financial activity since player started.
+        """
+        try:
+            rows = self.adjustments.aggregate(self._ledger_pipeline(player_name, page, limit, since),
+                                              collation=aggCollation)
+            ledger = [(row.get("date"), money.from_decimal128(row.get("amount")),
+                       money.from_decimal128(row.get("balance")), row.get("description")) for row in rows]
+        except pymongo.errors.OperationFailure as e:
+            logger.error("Server side ledger failed, falling back to building the ledger in python")
+            logger.error(str(e.code) + " " + str(e.details))
+            return self.calc_ledger_for_player_loop(player_name, page, limit, since)
+
+        return self._ledger_entries(ledger, page, since)
+
+    def _ledger_pipeline(self, player_name, page=0, limit=None, since=None):
+        """ Builds the aggregation pipeline for a player's ledger. The pipeline starts on adjustments and unions the
+        player's games and payments, giving one row per entry with a signed amount. Rows are ordered by date, then
+        adjustments, games and payments, then _id, and the running balance is summed over that order.
+
+        Parameters
+        ----------
+
+        player_name : str
+            Player to build the ledger for.
+
+        page : int
+            Page number, 0 for the latest entries. Only used with limit.
+
+        limit : int
+            Entries per page, or None for all entries.
+
+        since : datetime.datetime
+            If set, only entries on or after this date are returned.
+
+        Returns
+        -------
+
+        pipeline : `dict` : `list`
+            Aggregation stages. Run on the adjustments collection with aggCollation. Output documents have date,
+            amount, balance and description, latest first.
+
+        """
+        # the player's share of a game, rounded half to even to money.PLACES the same as money.share(). A game with no
+        # players costs nothing rather than failing the whole pipeline on a divide by zero
+        players = {"$toInt": {"$ifNull": ["$Players", 0]}}
+        cost_each = {"$cond": [{"$gt": [players, 0]},
+                               {"$round": [{"$divide": [{"$toDecimal": "$Cost of Game"}, players]}, money.PLACES]},
+                               {"$toDecimal": 0}]}
+
+        player_id = self.resolve_player_id(player_name)
+        pipeline = [
+            {"$match": self._summary_filter(player_id, player_name, "name")},
+            {"$project": {"date": {"$literal": datetime.datetime(2010, 1, 1, 0, 0)},
+                          "kind": {"$literal": 0},
+                          "amount": {"$toDecimal": "$adjust"},
+                          "description": {"$literal": "Initial balance adjustment"}}},
+            {"$unionWith": {"coll": self.games.name,
+                            "pipeline": [{"$match": self._played_filter(player_name if player_id is None
+                                                                         else player_id)},
+                                         {"$project": {"date": "$Date of Game dd-MON-YYYY",
+                                                       "kind": {"$literal": 1},
+                                                       "amount": {"$multiply": [cost_each, -1]},
+                                                       "description": {"$literal": "Game"}}}]}},
+            {"$unionWith": {"coll": self.payments.name,
+                            "pipeline": [{"$match": self._summary_filter(player_id, player_name, "Player")},
+                                         {"$project": {"date": "$Date",
+                                                       "kind": {"$literal": 2},
+                                                       "amount": {"$toDecimal": "$Amount"},
+                                                       "description": "$Type"}}]}},
+            {"$setWindowFields": {"sortBy": {"date": 1, "kind": 1, "_id": 1},
+                                  "output": {"balance": {"$sum": "$amount",
+                                                         "window": {"documents": ["unbounded", "current"]}}}}},
+        ]
+
+        if since is not None:
+            pipeline.append({"$match": {"date": {"$gte": since}}})
+
+        # latest date first, entries on the same date stay in the order they were applied
+        pipeline.append({"$sort": {"date": -1, "kind": 1, "_id": 1}})
+        if limit is not None:
+            pipeline.append({"$skip": page * limit})
+            pipeline.append({"$limit": limit})
+
+        pipeline.append({"$project": {"_id": 0, "date": 1, "amount": 1, "balance": {"$toDecimal": "$balance"},
+                                      "description": 1}})
+        return pipeline
+
+    @staticmethod
+    def _ledger_entries(ledger, page, since):
+        """ Builds LedgerEntry objects from ledger rows.
+
+        Parameters
+        ----------
+
+        ledger : `tuple` : `list`
+            Latest first (date, amount, balance, description) tuples, with amounts in money minor units. Positive
+            amounts are credits and negative amounts debits.
+
+        page : int
+            Page number requested.
+
+        since : datetime.datetime
+            Since date requested, or None.
+
+        Returns
+        -------
+
+            sortedLedger : `footballClasses.LedgerEntry` : `list`
+
+        """
+        sorted_ledger = []
+        for date, amount, balance, description in ledger:
+            # credit and debit are blank when not applicable, all figures are rounded for presentation
+            sorted_ledger.append(footballClasses.LedgerEntry(
+                date,
+                money.to_decimal128(money.round_pence(amount)) if amount >= 0 else "",
+                money.to_decimal128(money.round_pence(-amount)) if amount < 0 else "",
+                money.to_decimal128(money.round_pence(balance)),
+                description))
+
+        if len(sorted_ledger) == 0 and page == 0 and since is None:
+            # if there are is no activity, at least show something when rendering table
+            sorted_ledger.append(
+                footballClasses.LedgerEntry(datetime.datetime(1970, 1, 1, 0, 0), "", "", Decimal128("0.00"),
+                                            "Initial Balance"))
+
+        return sorted_ledger
+
+    def calc_ledger_for_player_loop(self, player_name, page=0, limit=None, since=None):
+        """ Builds a player's ledger in python, for servers that cannot run the calc_ledger_for_player() pipeline.
+        Takes the same parameters and returns the same entries.
+
         Parameters
         ----------
 
         player_name : str
             Player to build the ledger for.
 
+        page : int
+            Page number, 0 for the latest entries. Only used with limit.
+
+        limit : int
+            Entries per page, or None for all entries.
+
+        since : datetime.datetime
+            If set, only entries on or after this date are returned. Balances still include earlier entries.
+
         Returns
         -------
 
@@ -2159,86 +4191,85 @@ class FootballDB:
                 Latest first list of transactions and game costs showing financial activity since player started.
         """
 
-        # create a list from games that the player played, and append a list of their transactions, then sort on date,
-        # latest first.
+        # rows are (date, kind, amount, description) with amounts in money minor units, kind orders entries on the same
+        # date: adjustment, game then payment.
         ledger = []
         try:
             # first append the adjustment, if any
-            adjustment = self.adjustments.find_one({"name": player_name})
+            player_id = self.resolve_player_id(player_name)
+            adjustment = self.adjustments.find_one(self._summary_filter(player_id, player_name, "name"),
+                                                   collation=aggCollation)
             if adjustment is not None:
-                if adjustment.get("adjust").to_decimal() > 0:
-                    ledger_record = footballClasses.LedgerEntry(datetime.datetime(2010, 1, 1, 0, 0),
-                                                                adjustment.get("adjust"),
-                                                                "",
-                                                                "",
-                                                                "Initial balance adjustment")
-                else:
-                    ledger_record = footballClasses.LedgerEntry(datetime.datetime(2010, 1, 1, 0, 0),
-                                                                "",
-                                                                Decimal128(
-                                                                    str(abs(adjustment.get("adjust").to_decimal()))),
-                                                                "",
-                                                                "Initial balance adjustment")
-                ledger.append(ledger_record)
-            for x in self.games.find({player_name: {"$in": ["Win", "Lose", "Draw", "No Show"]}},
-                                     collation=aggCollation):
-                actual_cost_each = Decimal128(str(x.get("Cost of Game").to_decimal() / x.get('Players')))
-                ledger_record = footballClasses.LedgerEntry(x.get("Date of Game dd-MON-YYYY"),
-                                                            "",
-                                                            actual_cost_each,
-                                                            "",
-                                                            "Game")
-                ledger.append(ledger_record)
-
-            for x in self.payments.find({"Player": player_name}):
-                if x.get("Amount").to_decimal() >= 0:
-                    credit = x.get("Amount")
-                    debit = ""
-                else:
-                    debit = Decimal128(str(abs(x.get('Amount').to_decimal())))
-                    credit = ""
-
-                ledger_record = footballClasses.LedgerEntry(x.get("Date"),
-                                                            credit,
-                                                            debit,
-                                                            "",
-                                                            x.get("Type"))
-                ledger.append(ledger_record)
-
-            # now sort on date then calc balance on each row assuming initial balance is 0
-            sorted_ledger = sorted(ledger, key=lambda k: k.date)
-
-            rolling_balance = 0
-            for record in sorted_ledger:
-                if record.credit == "":
-                    credit = float()  # 0.0
-                else:
-                    credit = float(record.credit.to_decimal())
-                    record.credit = Decimal128(str(round(credit, 2)))  # rounded for presentation
+                ledger.append((datetime.datetime(2010, 1, 1, 0, 0), 0, money.from_decimal128(adjustment.get("adjust")),
+                               "Initial balance adjustment"))
+
+            for x in self.games.find(self._played_filter(player_name if player_id is None else player_id),
+                                     {"Date of Game dd-MON-YYYY": 1, "Cost of Game": 1, "Players": 1},
+                                     collation=aggCollation).sort("_id", pymongo.ASCENDING):
+                players = int(x.get("Players") or 0)
+                actual_cost_each = money.share(money.from_decimal128(x.get("Cost of Game")), players) \
+                    if players > 0 else 0
+                ledger.append((x.get("Date of Game dd-MON-YYYY"), 1, -actual_cost_each, "Game"))
+
+            for x in self.payments.find(self._summary_filter(player_id, player_name, "Player"),
+                                        {"Date": 1, "Amount": 1, "Type": 1},
+                                        collation=aggCollation).sort("_id", pymongo.ASCENDING):
+                ledger.append((x.get("Date"), 2, money.from_decimal128(x.get("Amount")), x.get("Type")))
+        except Exception as e:
+            logger.error("Internal Error: Unable to process ledger logic for player " + player_name)
+            logger.error(str(e))
+            return []
 
-                if record.debit == "":
-                    debit = float()
-                else:
-                    debit = float(record.debit.to_decimal())
-                    record.debit = Decimal128(str(round(debit, 2)))  # rounded for presentation
+        # now sort on date then calc balance on each row assuming initial balance is 0
+        ledger.sort(key=lambda k: (k[0], k[1]))
 
-                rolling_balance = rolling_balance + credit - debit
-                record.balance = Decimal128(str(round(rolling_balance, 2)))
+        rows = []
+        rolling_balance = 0
+        for date, kind, amount, description in ledger:
+            rolling_balance = rolling_balance + amount
+            if since is None or date >= since:
+                rows.append((date, kind, amount, rolling_balance, description))
 
-            if len(sorted_ledger) == 0:
-                # if there are is no activity, at least show something when rendering table
-                sorted_ledger.append(
-                    footballClasses.LedgerEntry(datetime.datetime(1970, 1, 1, 0, 0), "", "", Decimal128("0.00"),
-                                                "Initial Balance"))
+        # latest first, entries on the same date stay in the order they were applied
+        rows.sort(key=lambda k: (k[0], -k[1]), reverse=True)
+        if limit is not None:
+            rows = rows[page * limit:(page + 1) * limit]
 
-            # reverse list so latest dates are first
-            sorted_ledger = sorted(sorted_ledger, key=lambda k: k.date, reverse=True)
+        return self._ledger_entries([(date, amount, balance, description)
+                                     for date, kind, amount, balance, description in rows], page, since)
 
-        except Exception as e:
-            logger.error("Internal Error: Unable to process ledger logic for player " + player_name)
-            logger.error(e.code + e.details)
+    def export_tenancy(self, directory=None, compression=None, archive_format="bson"):
+        """ Streams the loaded tenancy (its six collections and its MultiTenancy rows) to a compressed archive with a
+        sha256 manifest, see tenantExport.export(). Use this rather than get_all_games()/get_all_transactions() for
+        backups, as documents are written a cursor batch at a time and never held in lists.
 
-        return sorted_ledger
+        Parameters
+        ----------
+
+        directory : str
+            Directory to write the archive and manifest to. Defaults to the EXPORTDIRECTORY environment variable.
+
+        compression : str
+            "gzip" or "zstd" (needs zstandard). Defaults to zstd if installed, else gzip.
+
+        archive_format : str
+            "bson" for concatenated BSON documents or "jsonl" for canonical extended JSON lines.
+
+        Returns
+        -------
+
+        manifest : dict
+            Manifest with collection counts and checksums, plus manifestPath and archivePath. None if a collection
+            could not be read.
+
+        """
+        try:
+            return tenantExport.export(self, directory, compression, archive_format)
+        except pymongo.errors.OperationFailure as e:
+            logger.critical("Unable to export tenancy " + str(self.tenancy_id))
+            logger.critical(str(e.code) + " " + str(e.details))
+
+        return None
 
     def drop_all_collections(self, user_id):
         """ Drops all tenancy collections for the user ID and tenancy collection..
@@ -2268,6 +4299,9 @@ class FootballDB:
             self.team_settings.drop()
             self.team_summary.drop()
             self.tenancy.drop()
+            tenancyCache.tenancyCache.clear()
+            with self._sessions_lock:
+                self._sessions.clear()
             message = "Dropped all data for user ID: " + user_id
         except Exception as e:
             logger.error("Internal Error: Unable to process drop database for player " + user_id)
@@ -2275,3 +4309,78 @@ class FootballDB:
             message = "Internal Error: Unable to process drop database for player " + user_id
 
         return message
+
+
+class TenantSession(FootballDB):
+    """ TenantSession class - a FootballDB bound to one tenancy for its lifetime.
+
+    Shares the database handle (and so the MongoClient) of the FootballDB that created it, and holds only collection
+    handles, so it is cheap to create. As the tenancy never changes, one session can serve many threads at once.
+    Create sessions with FootballDB.session_for_user() or FootballDB.session_for_tenancy().
+
+    Attributes
+    ----------
+
+    parent : FootballDB
+        FootballDB that created, and caches, this session.
+
+    """
+
+    def __init__(self, parent, tenancy_id):
+        """ TenantSession constructor.
+
+        Parameters
+        ----------
+
+        parent : FootballDB
+            FootballDB to share the database handle and session cache with.
+
+        tenancy_id : str
+            Tenancy prefix for collections.
+
+        """
+        self.parent = parent
+        self.connect_string = parent.connect_string
+        self.db_name = parent.db_name
+        self.max_pool_size = parent.max_pool_size
+        self.min_pool_size = parent.min_pool_size
+        self.tenancy_id = None
+        self._the_db = parent.theDB
+        self._db_pid = parent._db_pid
+        self._tenancy = parent.tenancy
+        self._sessions = parent._sessions
+        self._sessions_lock = parent._sessions_lock
+        self._bind_tenancy(tenancy_id)
+
+    def load_team_tables_for_user_id(self, user_id):
+        """ A session never changes tenancy. Checks the user belongs to this session's tenancy instead.
+
+        Parameters
+        ----------
+
+        user_id : str
+            Auth0 user ID - must start with auth0|
+
+        Returns
+        -------
+
+        Status : boolean
+            True if the user's default tenancy is this session's tenancy, else False.
+
+        """
+        if user_id is None:
+            return False
+
+        try:
+            team = self.resolve_tenancy(user_id)
+        except pymongo.errors.PyMongoError:
+            logger.critical("Unable to check tenancy of user for session")
+            return False
+
+        return team is not None and team.get("tenancyID") == self.tenancy_id
+
+    def _new_team_db(self, user_id, tenancy_id):
+        """ A session never changes tenancy, so a team added by add_team() on a session is written through the
+        session for the new tenancy, and this session's collections are left alone.
+        """
+        return self.parent.session_for_tenancy(tenancy_id)
@@ -0,0 +1,332 @@
+""" fileImport.py
+
+Offline import of the CFFA google sheet from local exports, for large historic imports that are slow (and rate limited)
+through gspread. Reads the same three worksheet layouts (transactions, games and summary) from CSV files, or from
+worksheets of an XLSX workbook (needs openpyxl), and applies the googleImport post processing: Decimal128 amounts,
+%d-%b-%Y dates as datetime.datetime, titled player names and PlayerList.
+
+Transactions and games are streamed chunkSize rows at a time from the file straight into the FootballDB.populate_*
+methods, so memory use does not grow with the size of the export. Only the summary worksheet is held in memory.
+
+  sheet = FileSheet("transactions.csv", "games.csv", "summary.csv")
+  sheet.import_to_db(football_db, 0, 30)
+
+"""
+
+import csv
+import time
+import datetime
+import itertools
+import logging
+from cffadb import googleImport
+
+try:
+    import openpyxl
+except ImportError:
+    # only needed for XLSX files
+    openpyxl = None
+
+# logging config
+logger = logging.getLogger("cffa_file_import")
+logger.setLevel(logging.DEBUG)
+# console handler
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+# config variables
+chunkSize = 1000  # rows read, post processed and inserted at a time
+dateFormat = '%d-%b-%Y'  # dates in XLSX date cells are written in the sheet's text format before post processing
+xlsxExtensions = (".xlsx", ".xlsm")
+
+
+def _cell_text(value):
+    """ Converts an XLSX cell value to the value the google values API returns for the cell: blank as "", dates in
+    dateFormat and whole numbers as int.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.strftime(dateFormat)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def read_rows(path, worksheet=None):
+    """ Generator over the rows of a CSV file or an XLSX worksheet, header row first. XLSX workbooks are read in
+    openpyxl read only mode so rows are not all loaded at once. Rows with every cell blank are skipped: read only
+    mode yields every row up to the recorded dimension of the worksheet, including formatted but empty trailing rows
+    that the google values API leaves out.
+
+    Parameters
+    ----------
+
+    path : str
+        CSV or XLSX (.xlsx, .xlsm) file.
+
+    worksheet : str
+        Worksheet name for an XLSX file, defaults to the active worksheet. Not used for CSV files.
+
+    Yields
+    ------
+
+    row : list
+        Cell values.
+
+    Raises
+    ------
+
+    ImportError
+        If the file is XLSX and openpyxl is not installed.
+
+    """
+    if not path.lower().endswith(xlsxExtensions):
+        with open(path, newline="", encoding="utf-8-sig") as csv_file:
+            for row in csv.reader(csv_file):
+                if any(cell.strip() for cell in row):
+                    yield row
+        return
+
+    if openpyxl is None:
+        raise ImportError("openpyxl is required to import XLSX files")
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[worksheet] if worksheet is not None else workbook.active
+        for row in sheet.iter_rows(values_only=True):
+            row = [_cell_text(value) for value in row]
+            if any(str(cell).strip() for cell in row):
+                yield row
+    finally:
+        workbook.close()
+
+
+def iter_file_records(path, worksheet=None, chunk_size=None):
+    """ Generator converting the rows of a CSV file or XLSX worksheet into records in chunks, the same as
+    googleImport.iter_records() does for worksheet rows from google.
+
+    Parameters
+    ----------
+
+    path : str
+        CSV or XLSX file.
+
+    worksheet : str
+        Worksheet name for an XLSX file.
+
+    chunk_size : int
+        Records per chunk, defaults to chunkSize.
+
+    Yields
+    ------
+
+    records : `dict` : `list`
+        Up to chunk_size records, one dict per row keyed on the header.
+
+    """
+    rows = read_rows(path, worksheet)
+    header = next(rows, None)
+    if header is None:
+        return
+
+    chunk_size = chunk_size or chunkSize
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if len(chunk) == 0:
+            return
+        yield next(googleImport.iter_records([header] + chunk, chunk_size))
+
+
+def _count_records(chunks, counted):
+    """ Generator flattening chunks of records, appending the size of each chunk to counted.
+    """
+    for chunk in chunks:
+        counted.append(len(chunk))
+        for record in chunk:
+            yield record
+
+
+class FileSheet(googleImport.Googlesheet):
+    """ FileSheet class - a Googlesheet read from local CSV or XLSX exports.
+
+    derive_players(), calc_player_adjustments() and get_summary() work as for Googlesheet. Transactions and games are
+    not held in memory, use iter_transactions() and iter_games(), or import_to_db().
+
+    Attributes
+    ----------
+
+    transactions_file : str
+        File with the transaction worksheet.
+
+    games_file : str
+        File with the games worksheet.
+
+    summary_worksheet : `dict` : `list`
+        Summary worksheet records.
+
+    chunk_size : int
+        Rows processed at a time.
+
+    """
+
+    def __init__(self, transactions_file, games_file, summary_file, transactions_worksheet=None, game_worksheet=None,
+                 summary_worksheet=None, chunk_size=None):
+        """ Constructor for FileSheet. Reads the summary worksheet. The same XLSX file may be given for all three
+        worksheets.
+
+        Parameters
+        ----------
+
+        transactions_file : str
+            CSV or XLSX file with the transaction worksheet.
+
+        games_file : str
+            CSV or XLSX file with the games worksheet.
+
+        summary_file : str
+            CSV or XLSX file with the summary worksheet.
+
+        transactions_worksheet : str
+            Transaction worksheet name, for an XLSX file.
+
+        game_worksheet : str
+            Games worksheet name, for an XLSX file.
+
+        summary_worksheet : str
+            Summary worksheet name, for an XLSX file.
+
+        chunk_size : int
+            Rows processed at a time, defaults to chunkSize.
+
+        """
+        self.client = None
+        self.transactions_file = transactions_file
+        self.transactions_worksheet = transactions_worksheet
+        self.games_file = games_file
+        self.game_worksheet = game_worksheet
+        self.chunk_size = chunk_size or chunkSize
+        self.transactions = []  # not held, see iter_transactions()
+        self.all_games = []  # not held, see iter_games()
+        self.summary_worksheet = list(itertools.chain.from_iterable(
+            iter_file_records(summary_file, summary_worksheet, self.chunk_size)))
+        self.players = []   # this list has to be explicitly populated.
+        self.actual_adjustments = []  # this list has to be explicitly populated
+
+    def iter_transactions(self):
+        """ Generator over the post processed transaction records, a chunk at a time.
+
+        Yields
+        ------
+
+        transactions : `dict` : `list`
+            Up to chunk_size transaction records.
+
+        """
+        for chunk in iter_file_records(self.transactions_file, self.transactions_worksheet, self.chunk_size):
+            yield googleImport.process_transactions(chunk)
+
+    def iter_games(self):
+        """ Generator over the post processed game records, with PlayerList set, a chunk at a time. Call
+        derive_players() first.
+
+        Yields
+        ------
+
+        games : `dict` : `list`
+            Up to chunk_size game records.
+
+        """
+        for chunk in iter_file_records(self.games_file, self.game_worksheet, self.chunk_size):
+            yield googleImport.calc_player_list(googleImport.process_games(chunk), self.players)
+
+    def get_transactions(self):
+        """ Returns all transaction records. Reads the whole file into memory, see iter_transactions().
+        """
+        return list(itertools.chain.from_iterable(self.iter_transactions()))
+
+    def get_games(self):
+        """ Returns all game records, with PlayerList set. Reads the whole file into memory, see iter_games().
+        """
+        return list(itertools.chain.from_iterable(self.iter_games()))
+
+    def calc_player_list_per_game(self):
+        """ PlayerList is set on each chunk of games by iter_games(), so there is nothing to do.
+        """
+        return True
+
+    def import_to_db(self, football_db, row_start, row_end, comment="Imported from file", delta=False,
+                     bulk_loader=None):
+        """ Imports the sheet into the loaded tenancy of football_db, replacing its players, games, payments and
+        adjustments, then rebuilds team_summary. Logs the rows per second for transactions and games.
+
+        With delta set only the rows that changed since the last import are written, and team_summary is only
+        recalculated for the players on those rows.
+
+        Parameters
+        ----------
+
+        football_db : dbinterface.FootballDB
+            FootballDB with the tenancy collections loaded.
+
+        row_start : int
+            The summary row to start reading players and adjustments.
+
+        row_end : int
+            The summary row to stop reading players and adjustments.
+
+        comment : str
+            Comment set on each imported team player.
+
+        delta : boolean
+            Write only the difference from the last import, see dbinterface.FootballDB._sync_documents().
+
+        bulk_loader : bulkLoader.BulkLoader
+            Loader to write the collections concurrently with, or None to write them one after another.
+
+        Returns
+        -------
+
+        throughput : dict
+            Rows and rows per second, keyed on "transactions" and "games". With a bulk_loader both collections are
+            timed together.
+
+        Raises
+        ------
+
+        pymongo.errors.OperationFailure
+            If a collection could not be written. team_summary is then not rebuilt.
+
+        """
+        players = self.derive_players(row_start, row_end)
+        team_players = [dict(playerName=player, retiree=False, comment=comment) for player in players]
+        adjustments = self.calc_player_adjustments(row_start, row_end)
+        counted = {"transactions": [], "games": []}
+        transactions = _count_records(self.iter_transactions(), counted["transactions"])
+        games = _count_records(self.iter_games(), counted["games"])
+
+        elapsed = {}
+        if bulk_loader is not None:
+            start = time.perf_counter()
+            player_ids = bulk_loader.load(team_players, adjustments, transactions, games, delta)
+            elapsed["transactions"] = elapsed["games"] = time.perf_counter() - start
+        else:
+            player_ids = football_db.populate_team_players(team_players, delta)
+            player_ids |= football_db.populate_adjustments(adjustments, delta)
+            for name, records, populate in [("transactions", transactions, football_db.populate_payments),
+                                            ("games", games, football_db.populate_games)]:
+                start = time.perf_counter()
+                player_ids |= populate(records, delta)
+                elapsed[name] = time.perf_counter() - start
+
+        throughput = {}
+        for name in ["transactions", "games"]:
+            rows = sum(counted[name])
+            throughput[name] = dict(rows=rows, rowsPerSecond=rows / elapsed[name] if elapsed[name] > 0 else 0.0)
+            logger.info("Imported %d %s in %.2fs, %.0f rows per second", rows, name, elapsed[name],
+                        throughput[name]["rowsPerSecond"])
+
+        football_db.calc_populate_team_summary(players, player_ids if delta else None)
+        return throughput
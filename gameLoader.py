@@ -0,0 +1,136 @@
+""" gameLoader.py
+
+Request scoped loader of game documents (in the style of DataLoader). A single edit or delete game request calls several
+FootballDB helpers (date_of_game, get_game_from_db, check_game_for_booker, check_game_for_guests,
+did_player_play_this_game...) for the same game. Passing one GameLoader to each of them means the game document is
+fetched once, and games asked for together with load_many() are fetched in one query.
+
+A loader holds whole game documents, relabelled with current player names, for as long as the request. It is not
+thread safe and is not meant to outlive a request. FootballDB.edit_game and delete_game clear the games they change.
+
+  loader = football_db.game_loader()
+  football_db.check_game_for_booker(game_id, loader=loader)
+  football_db.did_player_play_this_game(game_id, name, loader=loader)
+
+"""
+
+import logging
+import pymongo
+
+# logging config
+logger = logging.getLogger("cffa_db_game_loader")
+logger.setLevel(logging.DEBUG)
+# console handler
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+
+class GameLoader:
+    """ GameLoader class - memoizes game documents by _id for one request.
+
+    Documents returned by the loader are shared between callers and must not be changed.
+
+    Attributes
+    ----------
+
+    games : collection
+        Games collection handle for the tenancy.
+
+    relabel : callable
+        Called with each list of fetched documents to relabel player names in place, or None.
+
+    fetches : int
+        Number of queries sent to the games collection.
+
+    """
+
+    def __init__(self, games, relabel=None):
+        """ GameLoader constructor.
+
+        Parameters
+        ----------
+
+        games : collection
+            Games collection handle for the tenancy.
+
+        relabel : callable
+            Called with each list of fetched documents, ie FootballDB._relabel_games.
+
+        """
+        self.games = games
+        self.relabel = relabel
+        self.fetches = 0
+        self._documents = {}
+
+    def load(self, db_id):
+        """ Returns the game document for an _id, fetching it if it has not been loaded.
+
+        Parameters
+        ----------
+
+        db_id : ObjectID
+            Unique object ID for the game document.
+
+        Returns
+        -------
+
+        game : dict
+            Game document, or None if there is no game with this _id (or it could not be read).
+
+        """
+        return self.load_many([db_id])[0]
+
+    def load_many(self, db_ids):
+        """ Returns the game documents for a list of _id, fetching all that have not been loaded with one query.
+
+        Parameters
+        ----------
+
+        db_ids : `ObjectID` : `list`
+            Unique object IDs for the game documents.
+
+        Returns
+        -------
+
+        games : `dict` : `list`
+            Game documents in the order of db_ids, None for any _id without a game.
+
+        """
+        missing = []
+        for db_id in db_ids:
+            if db_id not in self._documents and db_id not in missing:
+                missing.append(db_id)
+
+        if len(missing) > 0:
+            try:
+                found = list(self.games.find({"_id": missing[0]} if len(missing) == 1 else {"_id": {"$in": missing}}))
+                self.fetches += 1
+            except pymongo.errors.OperationFailure as e:
+                logger.critical("Could not load games " + str(missing))
+                logger.critical(str(e.code) + " " + str(e.details))
+                return [self._documents.get(db_id) for db_id in db_ids]
+
+            if self.relabel is not None:
+                self.relabel(found)
+            for db_id in missing:
+                self._documents[db_id] = None
+            for game in found:
+                self._documents[game.get("_id")] = game
+
+        return [self._documents.get(db_id) for db_id in db_ids]
+
+    def prime(self, game):
+        """ Adds a game document already read by the caller (relabelled, with all fields) to the loader.
+        """
+        self._documents[game.get("_id")] = game
+
+    def clear(self, db_id=None):
+        """ Forgets a game, ie after it has been edited or deleted, or every game if db_id is None.
+        """
+        if db_id is None:
+            self._documents.clear()
+        else:
+            self._documents.pop(db_id, None)
@@ -6,15 +6,34 @@ execute post import, include:
  b) handle dates as datetime.datetime
  c) ensure player names are titled (start with capital for forename/surname letter.)
 
+The spreadsheet is opened once and the transaction, game and summary worksheets are read with one batched values request
+(values_batch_get), rather than a metadata fetch and full download per worksheet. Rows are then turned into records and
+post processed chunkSize rows at a time. Post processing works a column at a time, with memoized date and amount
+parsing (process_transactions, process_games), the original row at a time versions are kept for comparison.
+
 """
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-from bson import Decimal128
-from re import sub
+from cffadb import money
 import datetime
+import functools
 import logging
 
+try:
+    import pandas
+except ImportError:
+    # optional, only used to deduplicate long columns in _convert_column()
+    pandas = None
+
+try:
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+    _sheetErrors = (ValueError, gspread.exceptions.GSpreadException)
+except ImportError:
+    # only needed to read from google, process_transactions() and process_games() are also used by fileImport.py
+    gspread = None
+    ServiceAccountCredentials = None
+    _sheetErrors = (ValueError,)
+
 # logging config
 logger = logging.getLogger("mafm_google_import")
 logger.setLevel(logging.DEBUG)
@@ -25,6 +44,336 @@ formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pat
 ch.setFormatter(formatting)
 logger.addHandler(ch)
 
+# config variables
+chunkSize = 1000  # rows converted to records and post processed at a time
+sheetDateFormat = '%d-%b-%Y'  # format of dates in the sheet
+cacheSize = 4096  # distinct dates and amounts memoized by sheet_date() and sheet_amount()
+pandasMinRows = 2000  # columns at least this long are deduplicated with pandas, if installed
+
+_failed = object()  # marks a value _convert_column() could not convert
+
+# game cell values that mean a player attended, and the roster status stored for each (dbinterface.playedStatus)
+rosterStatus = {"Win": "Win", "win": "Win", "Lose": "Lose", "lose": "Lose", "Draw": "Draw", "draw": "Draw",
+                "No Show": "No Show", "no show": "No Show"}
+
+
+def worksheet_range(worksheet_name):
+    """ Returns the A1 range for a whole worksheet, ie "'Game Data'", quoting the name as the values API requires.
+    """
+    return "'" + worksheet_name.replace("'", "''") + "'"
+
+
+def numericise(value):
+    """ Converts a cell value string to an int or float if it is one, as gspread numericises get_all_records values.
+    """
+    if not isinstance(value, str) or value == "" or "_" in value:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def iter_records(rows, chunk_size=None):
+    """ Generator converting worksheet rows into records, the same as gspread get_all_records(head=1): the first row is
+    the header, short rows are padded with "" and numbers are numericised.
+
+    Parameters
+    ----------
+
+    rows : `list` : `list`
+        Cell values of a worksheet, header row first, as returned by the values API.
+
+    chunk_size : int
+        Records per chunk, defaults to chunkSize.
+
+    Yields
+    ------
+
+    records : `dict` : `list`
+        Up to chunk_size records, one dict per row keyed on the header.
+
+    """
+    if len(rows) == 0:
+        return
+
+    chunk_size = chunk_size or chunkSize
+    header = rows[0]
+    width = len(header)
+    for start in range(1, len(rows), chunk_size):
+        records = []
+        for row in rows[start:start + chunk_size]:
+            values = [numericise(value) for value in row[:width]] + [""] * (width - len(row))
+            records.append(dict(zip(header, values)))
+        yield records
+
+
+def process_transactions_loop(transactions):
+    """ Post processes a chunk of transaction records in place, one row at a time: Amount to Decimal128, Date to
+    datetime.datetime and Player titled. Kept as the benchmark baseline for process_transactions(), which gives
+    identical records.
+
+    Parameters
+    ----------
+
+    transactions : `dict` : `list`
+        Transaction records.
+
+    Returns
+    -------
+
+    transactions : `dict` : `list`
+        The same records.
+
+    """
+    for payment in transactions:
+        try:
+            decimal_value = money.to_decimal128(money.from_sheet(payment["Amount"]))
+            del payment["Amount"]
+            payment["Amount"] = decimal_value
+        except ValueError:
+            logger.critical("Unsupported payment record." + str(payment.get("Date")))
+
+        try:
+            transaction_date = datetime.datetime.strptime(payment.get("Date"), '%d-%b-%Y').date()
+            del payment["Date"]
+            payment["Date"] = datetime.datetime(transaction_date.year, transaction_date.month, transaction_date.day)
+        except ValueError:
+            logger.error("Bad date in transaction record" + payment.get("Date"))
+
+        # make sure each PlayerName is titled with capital for first name and surname letter using title()
+        try:
+            titled_player = payment["Player"].title()
+            del payment["Player"]
+            payment["Player"] = titled_player
+        except ValueError:
+            logger.error("Document has invalid Player Name and cannot be titled." + payment["Player"])
+
+    return transactions
+
+
+def process_games_loop(games):
+    """ Post processes a chunk of game records in place, one row at a time: "Date of Game dd-MON-YYYY" to
+    datetime.datetime and the costs to Decimal128. Kept as the benchmark baseline for process_games(), which gives
+    identical records.
+
+    Parameters
+    ----------
+
+    games : `dict` : `list`
+        Game records.
+
+    Returns
+    -------
+
+    games : `dict` : `list`
+        The same records.
+
+    """
+    # - convert "Date of Game dd-MON-YYYY" into suitable format for MongoDB
+    #    - datetime.date needs converting to datetime.datetime
+    for game in games:
+        try:
+            game_date = datetime.datetime.strptime(game.get("Date of Game dd-MON-YYYY"), '%d-%b-%Y').date()
+            del game["Date of Game dd-MON-YYYY"]
+            game["Date of Game dd-MON-YYYY"] = datetime.datetime(game_date.year, game_date.month, game_date.day)
+        except ValueError:
+            logger.warning("Bad date in game record" + game.get("Timestamp", "Timestamp undefined"))
+
+        # - convert "Cost of Game" and "Cost Each" to Decimal128.
+        try:
+            game_cost = money.to_decimal128(money.from_sheet(game["Cost of Game"]))
+            cost_each = money.to_decimal128(money.from_sheet(game["Cost Each"]))
+            del game["Cost of Game"]
+            del game["Cost Each"]
+            game["Cost of Game"] = game_cost
+            game["Cost Each"] = cost_each
+        except ValueError:
+            logger.warning("Bad costs in game record" + game.get("Timestamp"))
+
+    return games
+
+
+def _convert_column(values, convert):
+    """ Converts a column of values with convert, returning _failed for values that raise ValueError. When pandas is
+    installed, columns of at least pandasMinRows values are deduplicated with pandas.factorize so convert is called
+    once per distinct value.
+    """
+    def converted(value):
+        try:
+            return convert(value)
+        except ValueError:
+            return _failed
+
+    if pandas is None or len(values) < pandasMinRows:
+        return [converted(value) for value in values]
+
+    codes, uniques = pandas.factorize(pandas.Series(values, dtype=object))
+    unique_values = [converted(value) for value in uniques]
+    return [unique_values[code] if code >= 0 else converted(value) for code, value in zip(codes, values)]
+
+
+@functools.lru_cache(maxsize=cacheSize, typed=True)
+def sheet_date(text):
+    """ Parses a sheet date, ie "01-Jan-2020", into a datetime.datetime at midnight. Memoized, as most dates repeat
+    across games and payments.
+
+    Raises
+    ------
+
+    ValueError
+        If text is not a date in sheetDateFormat.
+
+    """
+    parsed = datetime.datetime.strptime(text, sheetDateFormat)
+    return datetime.datetime(parsed.year, parsed.month, parsed.day)
+
+
+@functools.lru_cache(maxsize=cacheSize, typed=True)
+def sheet_amount(text):
+    """ Converts a sheet currency value, ie "£1,234.50", into a Decimal128. Memoized, as game costs and payment amounts
+    repeat.
+
+    Raises
+    ------
+
+    ValueError
+        If text is not a money amount.
+
+    """
+    return money.to_decimal128(money.from_sheet(text))
+
+
+def process_transactions(transactions):
+    """ Post processes a chunk of transaction records in place: Amount to Decimal128, Date to datetime.datetime and
+    Player titled. Each column is converted in one pass (see _convert_column) before the records are updated.
+    Converted keys are moved to the end of each record, as process_transactions_loop() does.
+
+    Parameters
+    ----------
+
+    transactions : `dict` : `list`
+        Transaction records.
+
+    Returns
+    -------
+
+    transactions : `dict` : `list`
+        The same records.
+
+    """
+    amounts = _convert_column([payment["Amount"] for payment in transactions], sheet_amount)
+    dates = _convert_column([payment.get("Date") for payment in transactions], sheet_date)
+
+    for payment, amount, date in zip(transactions, amounts, dates):
+        if amount is _failed:
+            logger.critical("Unsupported payment record." + str(payment.get("Date")))
+        else:
+            del payment["Amount"]
+            payment["Amount"] = amount
+
+        if date is _failed:
+            logger.error("Bad date in transaction record" + payment.get("Date"))
+        else:
+            del payment["Date"]
+            payment["Date"] = date
+
+        # make sure each PlayerName is titled with capital for first name and surname letter using title()
+        payment["Player"] = payment.pop("Player").title()
+
+    return transactions
+
+
+def process_games(games):
+    """ Post processes a chunk of game records in place: "Date of Game dd-MON-YYYY" to datetime.datetime and the
+    costs to Decimal128. Each column is converted in one pass before the records are updated, giving the same
+    records as process_games_loop().
+
+    Parameters
+    ----------
+
+    games : `dict` : `list`
+        Game records.
+
+    Returns
+    -------
+
+    games : `dict` : `list`
+        The same records.
+
+    """
+    dates = _convert_column([game.get("Date of Game dd-MON-YYYY") for game in games], sheet_date)
+    game_costs = _convert_column([game["Cost of Game"] for game in games], sheet_amount)
+    costs_each = _convert_column([game["Cost Each"] for game in games], sheet_amount)
+
+    for game, game_date, game_cost, cost_each in zip(games, dates, game_costs, costs_each):
+        if game_date is _failed:
+            logger.warning("Bad date in game record" + game.get("Timestamp", "Timestamp undefined"))
+        else:
+            del game["Date of Game dd-MON-YYYY"]
+            game["Date of Game dd-MON-YYYY"] = game_date
+
+        # both costs are only replaced if both are valid
+        if game_cost is _failed or cost_each is _failed:
+            logger.warning("Bad costs in game record" + game.get("Timestamp"))
+        else:
+            del game["Cost of Game"]
+            del game["Cost Each"]
+            game["Cost of Game"] = game_cost
+            game["Cost Each"] = cost_each
+
+    return games
+
+
+def calc_player_list(games, players):
+    """ Sets PlayerList on each game record, the comma separated (and terminated) names of players in the game, and
+    players, the structured roster the DB layer stores (see dbinterface.FootballDB.populate_games). See
+    Googlesheet.calc_player_list_per_game().
+
+    The player and guest columns are worked out once, and each game is checked against them with dict lookups, so the
+    cost is one lookup per player column per game.
+
+    Parameters
+    ----------
+
+    games : `dict` : `list`
+        Game records, with a key for each player name (and optionally <player>_guests).
+
+    players : `str` : `list`
+        Player names, ie from Googlesheet.derive_players().
+
+    Returns
+    -------
+
+    games : `dict` : `list`
+        The same records.
+
+    """
+    columns = [(player, player + "_guests") for player in players]
+    for game in games:
+        played = []
+        roster = []
+        for player, guests_column in columns:
+            status = rosterStatus.get(game.get(player))
+            guests = game.get(guests_column, 0)
+            if not isinstance(guests, int) or isinstance(guests, bool):
+                guests = 0
+
+            if status is not None:
+                played.append(player)
+            if status is not None or guests > 0:
+                roster.append(dict(name=player, status=status, guests=guests))
+
+        # - add new field containing a coma separated string of players in that game
+        game["PlayerList"] = "".join(player + "," for player in played)
+        game["players"] = roster
+
+    return games
+
 
 class Googlesheet:
     """ googlesheet class.
@@ -53,10 +402,13 @@ class Googlesheet:
 
     """
 
-    def __init__(self, credential_file, sheet_name, transactions_worksheet, game_worksheet, summary_worksheet):
+    def __init__(self, credential_file, sheet_name, transactions_worksheet, game_worksheet, summary_worksheet,
+                 client=None, chunk_size=None):
         """ Constructor for Googlesheet.
 
-        The constructor will connect to the google sheet and download worksheets into memory.
+        The constructor will connect to the google sheet and download worksheets into memory. The spreadsheet is opened
+        once and all three worksheets are fetched with one batched values request, then converted into records and
+        post processed chunk_size rows at a time.
 
         Parameters
         ----------
@@ -76,6 +428,13 @@ class Googlesheet:
         summary_worksheet : str
             Summary worksheet name in the google sheet.
 
+        client : gspread.Client
+            Authorised client to use instead of authorising with credential_file, ie a fake client for testing. Must
+            provide open(sheet_name).values_batch_get(ranges).
+
+        chunk_size : int
+            Rows processed at a time, defaults to chunkSize.
+
         Returns
         -------
 
@@ -85,70 +444,43 @@ class Googlesheet:
 
         # init does not do anything much other than load the google sheet into the object - but using Decimal128
         # for financial figures that have been loaded as float introduces inaccuracies.
-        try:
-            scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-            creds = ServiceAccountCredentials.from_json_keyfile_name(credential_file, scope)
-            self.client = gspread.authorize(creds)
-        except ValueError:
-            logger.critical('ValueError: Unable to access google for download. Check credentials')
+        self.client = client
+        if self.client is None:
+            if gspread is None:
+                raise ImportError("gspread and oauth2client are required to import from google")
+            try:
+                scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+                creds = ServiceAccountCredentials.from_json_keyfile_name(credential_file, scope)
+                self.client = gspread.authorize(creds)
+            except ValueError:
+                logger.critical('ValueError: Unable to access google for download. Check credentials')
 
+        self.transactions = []
+        self.all_games = []
+        self.summary_worksheet = []
+        self.players = []   # this list has to be explicitly populated.
+        self.actual_adjustments = []  # this list has to be explicitly populated
+        chunk_size = chunk_size or chunkSize
         try:
-            self.transactions = self.client.open(sheet_name).worksheet(transactions_worksheet).get_all_records(head=1)
-            self.all_games = self.client.open(sheet_name).worksheet(game_worksheet).get_all_records(head=1)
-            self.summary_worksheet = self.client.open(sheet_name).worksheet(summary_worksheet).get_all_records(head=1)
-        except ValueError:
+            spreadsheet = self.client.open(sheet_name)
+            value_ranges = spreadsheet.values_batch_get(
+                [worksheet_range(name) for name in [transactions_worksheet, game_worksheet, summary_worksheet]])
+            transaction_rows, game_rows, summary_rows = [value_range.get("values", [])
+                                                         for value_range in value_ranges.get("valueRanges", [])]
+        except _sheetErrors:
             logger.critical("ValueError: Unable to open requested worksheets from google")
+            return
 
         # Post processing, cleaning up transactions number figures to Decimal128 for better storage
         # also convert date to ISODate for storage and further querying
-        for payment in self.transactions:
-            try:
-                decimal_value = Decimal128(sub(r'[^\d\-.]', '', payment["Amount"]))
-                del payment["Amount"]
-                payment["Amount"] = decimal_value
-            except ValueError:
-                logger.critical("Unsupported payment record." + str(payment.get("Date")))
-
-            try:
-                transaction_date = datetime.datetime.strptime(payment.get("Date"), '%d-%b-%Y').date()
-                del payment["Date"]
-                payment["Date"] = datetime.datetime(transaction_date.year, transaction_date.month, transaction_date.day)
-            except ValueError:
-                logger.error("Bad date in transaction record" + payment.get("Date"))
-
-            # make sure each PlayerName is titled with capital for first name and surname letter using title()
-            try:
-                titled_player = payment["Player"].title()
-                del payment["Player"]
-                payment["Player"] = titled_player
-            except ValueError:
-                logger.error("Document has invalid Player Name and cannot be titled." + payment["Player"])
-
-        # Post processing on games table
-        # - convert "Date of Game dd-MON-YYYY" into suitable format for MongoDB
-        #    - datetime.date needs converting to datetime.datetime
-
-        for game in self.all_games:
-            try:
-                game_date = datetime.datetime.strptime(game.get("Date of Game dd-MON-YYYY"), '%d-%b-%Y').date()
-                del game["Date of Game dd-MON-YYYY"]
-                game["Date of Game dd-MON-YYYY"] = datetime.datetime(game_date.year, game_date.month, game_date.day)
-            except ValueError:
-                logger.warning("Bad date in game record" + game.get("Timestamp", "Timestamp undefined"))
+        for chunk in iter_records(transaction_rows, chunk_size):
+            self.transactions.extend(process_transactions(chunk))
 
-            # - convert "Cost of Game" and "Cost Each" to Decimal128.
-            try:
-                game_cost = Decimal128(sub(r'[^\d\-.]', '', game["Cost of Game"]))
-                cost_each = Decimal128(sub(r'[^\d\-.]', '', game["Cost Each"]))
-                del game["Cost of Game"]
-                del game["Cost Each"]
-                game["Cost of Game"] = game_cost
-                game["Cost Each"] = cost_each
-            except ValueError:
-                logger.warning("Bad costs in game record" + game.get("Timestamp"))
+        for chunk in iter_records(game_rows, chunk_size):
+            self.all_games.extend(process_games(chunk))
 
-        self.players = []   # this list has to be explicitly populated.
-        self.actual_adjustments = []  # this list has to be explicitly populated
+        for chunk in iter_records(summary_rows, chunk_size):
+            self.summary_worksheet.extend(chunk)
 
     def derive_players(self, row_start, row_end):
         """ derive_players returns the players on the summary sheet based on specified row range. In the spreadsheet
@@ -208,8 +540,8 @@ class Googlesheet:
                 player_name = player_adjustment.get("Names", None)
 
                 if player_name != "":
-                    adjust_amount = Decimal128(sub(r'[^\d\-.]', '',
-                                                   player_adjustment.get("Money Carry Over", "£0.00")))
+                    adjust_amount = money.to_decimal128(money.from_sheet(player_adjustment.get("Money Carry Over",
+                                                                                               "£0.00")))
                     self.actual_adjustments.append(dict(name=player_name, adjust=adjust_amount))
             except ValueError:
                 logger.warning("Bad player record found" + player_adjustment.get("Names", None))
@@ -265,31 +597,17 @@ class Googlesheet:
     def calc_player_list_per_game(self):
         """" When importing data, each game row has a key for each player name. However it is not easy to determine
         who played the game. This logic creates a new key, PlayerList that concatenates all player Names separated
-        by commas into the key value
+        by commas into the key value, and players, a list of dicts with name, status and guests for each player in the
+        game, ready for FootballDB.populate_games().
 
         Returns
         -------
 
             Result : Boolean
-                Currently always returns True. NB: playerList may be set to "Error" if an exception occurs.
+                Currently always returns True.
 
         """
-        # - add new field containing a coma separated string of players in that game
-        validation = ['Win', 'win', 'lose', 'Lose', 'Draw', 'draw', 'no show', 'No Show']
-
-        for game in self.all_games:
-            player_list = ""
-            try:
-                for player in self.players:
-                    if game[player] in validation:
-                        player_list = player_list + player + ","
-            except ValueError:
-                logger.error("Problem calculating player list for game", game.get("Date of Game dd-MON-YYYY",
-                                                                                  "Missing key for Game Date"))
-                player_list = "Error!"
-
-            game["PlayerList"] = player_list
-
+        calc_player_list(self.all_games, self.players)
         return True
 
 
@@ -0,0 +1,283 @@
+""" indexManager.py
+
+Declares the indexes CFFA needs on the MultiTenancy collection and on each tenancy collection, and creates them on
+demand. Indexes over player names use aggCollation (case insensitive) so that the collated queries in dbinterface.py
+can use them. Date and player ID indexes are created without a collation as the queries on them do not compare
+strings.
+
+  ensure_tenancy_indexes(db)               MultiTenancy indexes
+  ensure_tenant_indexes(db, tenancy_id)    all indexes for one tenancy, once per process
+  ensure_collection_indexes(collection)    indexes for a single tenancy collection, eg after drop()
+  report_indexes(db, tenancy_id)           missing and unused indexes for one tenancy
+
+"""
+
+import threading
+import logging
+import pymongo
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.collation import Collation
+
+# logging config
+logger = logging.getLogger("cffa_db_indexes")
+logger.setLevel(logging.DEBUG)
+# console handler
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+# case insensitive collation used by all player name queries. dbinterface.aggCollation is this object.
+aggCollation = Collation(locale='en', strength=1, alternate='shifted')
+
+# indexes for the MultiTenancy collection
+tenancyIndexes = [
+    IndexModel([("userID", ASCENDING), ("default", ASCENDING)], name="userID_default"),
+    IndexModel([("tenancyID", ASCENDING)], name="tenancyID"),
+    IndexModel([("teamName", ASCENDING)], name="teamName"),
+]
+
+# indexes for each tenancy collection, keyed on the collection name after the "<tenancyID>_" prefix
+tenantIndexes = {
+    "teamSummary": [
+        IndexModel([("playerName", ASCENDING)], name="playerName_collated", unique=True, collation=aggCollation),
+        IndexModel([("playerId", ASCENDING)], name="playerId"),
+        IndexModel([("lastPlayed", DESCENDING)], name="lastPlayed"),
+    ],
+    "games": [
+        # date then _id, for the date sorted listings and their keyset pagination
+        IndexModel([("Date of Game dd-MON-YYYY", DESCENDING), ("_id", DESCENDING)], name="gameDate_id"),
+        IndexModel([("players.name", ASCENDING)], name="players_name_collated", collation=aggCollation),
+        IndexModel([("players.pid", ASCENDING)], name="players_pid"),
+        IndexModel([("contentHash", ASCENDING)], name="contentHash"),
+    ],
+    "payments": [
+        IndexModel([("Player", ASCENDING)], name="Player_collated", collation=aggCollation),
+        IndexModel([("playerId", ASCENDING)], name="playerId"),
+        IndexModel([("contentHash", ASCENDING)], name="contentHash"),
+        IndexModel([("Date", DESCENDING), ("_id", DESCENDING)], name="Date_id"),
+    ],
+    "adjustments": [
+        IndexModel([("name", ASCENDING)], name="name_collated", collation=aggCollation),
+        IndexModel([("playerId", ASCENDING)], name="playerId"),
+    ],
+    "teamPlayers": [
+        IndexModel([("playerName", ASCENDING)], name="playerName_collated", collation=aggCollation),
+        IndexModel([("playerId", ASCENDING)], name="playerId"),
+    ],
+    "teamSettings": [],
+}
+
+# server error codes for an index declared here that clashes with an existing index of the same keys or name, ie
+# playerName_1 created on teamSummary by older releases
+indexConflictCodes = {85, 86}  # IndexOptionsConflict, IndexKeySpecsConflict
+
+_ensured = set()  # (db name, tenancy ID) already ensured by this process
+_ensured_lock = threading.Lock()
+
+
+def collection_kind(collection_name):
+    """ Returns the tenantIndexes key for a tenancy collection name, ie "games" for "171f0ac9e41_games".
+
+    Parameters
+    ----------
+
+    collection_name : str
+        Full collection name.
+
+    Returns
+    -------
+
+    kind : str
+        Collection name without the tenancy ID prefix.
+
+    """
+    return collection_name.split("_", 1)[-1]
+
+
+def _drop_conflicting_indexes(collection, models):
+    """ Drops the indexes of a collection that have the keys of a declared index under another name, or the name of
+    a declared index over other keys, so the declared index can be created.
+
+    Parameters
+    ----------
+
+    collection : pymongo.collection.Collection
+        Tenancy collection.
+
+    models : `pymongo.IndexModel` : `list`
+        Declared indexes for the collection.
+
+    Returns
+    -------
+
+    dropped : `str` : `list`
+        Names of the indexes dropped.
+
+    """
+    declared = [(model.document.get("name"), list(model.document.get("key").items())) for model in models]
+    dropped = []
+    for name, info in collection.index_information().items():
+        if name == "_id_":
+            continue
+        keys = [tuple(key) for key in info.get("key")]
+        if any((name == declared_name) != (keys == declared_keys) for declared_name, declared_keys in declared):
+            logger.warning("Dropping index " + name + " on " + collection.name + " as it clashes with a declared index")
+            collection.drop_index(name)
+            dropped.append(name)
+
+    return dropped
+
+
+def ensure_collection_indexes(collection, kind=None):
+    """ Creates the declared indexes for one tenancy collection. Creating an index that already exists is a no-op on
+    the server, so this is safe to call after every drop() and re-insert. An existing index that clashes with a
+    declared one (the same keys under another name, or the same name over other keys) is dropped and the declared
+    indexes created again.
+
+    Parameters
+    ----------
+
+    collection : pymongo.collection.Collection
+        Tenancy collection.
+
+    kind : str
+        tenantIndexes key. Derived from the collection name if not set, set it for staging collections.
+
+    Returns
+    -------
+
+    result : boolean
+        True if the indexes exist, False if they could not be created.
+
+    """
+    models = tenantIndexes.get(kind or collection_kind(collection.name), [])
+    if len(models) == 0:
+        return True
+
+    try:
+        try:
+            collection.create_indexes(models)
+        except pymongo.errors.OperationFailure as e:
+            if e.code not in indexConflictCodes or len(_drop_conflicting_indexes(collection, models)) == 0:
+                raise
+            collection.create_indexes(models)
+    except pymongo.errors.OperationFailure as e:
+        logger.error("Unable to create indexes on " + collection.name + ": " + str(e.details))
+        return False
+
+    return True
+
+
+def ensure_tenancy_indexes(db):
+    """ Creates the declared MultiTenancy indexes.
+
+    Parameters
+    ----------
+
+    db : pymongo.database.Database
+        CFFA database.
+
+    Returns
+    -------
+
+    result : boolean
+        True if the indexes exist, False if they could not be created.
+
+    """
+    try:
+        db["MultiTenancy"].create_indexes(tenancyIndexes)
+    except pymongo.errors.OperationFailure as e:
+        logger.error("Unable to create indexes on MultiTenancy: " + str(e.details))
+        return False
+
+    return True
+
+
+def ensure_tenant_indexes(db, tenancy_id, force=False):
+    """ Creates the declared indexes for every collection in a tenancy, the first time the tenancy is seen by this
+    process (or every time if force is set).
+
+    Parameters
+    ----------
+
+    db : pymongo.database.Database
+        CFFA database.
+
+    tenancy_id : str
+        Tenancy prefix for collections.
+
+    force : boolean
+        Ensure the indexes even if this process has already done so.
+
+    Returns
+    -------
+
+    result : boolean
+        True if all indexes exist, False if any could not be created.
+
+    """
+    key = (db.name, tenancy_id)
+    with _ensured_lock:
+        if key in _ensured and not force:
+            return True
+
+    result = ensure_tenancy_indexes(db)
+    for kind in tenantIndexes:
+        result = ensure_collection_indexes(db[tenancy_id + "_" + kind], kind) and result
+
+    if result:
+        with _ensured_lock:
+            _ensured.add(key)
+        logger.info("Indexes ensured for tenancy " + tenancy_id)
+
+    return result
+
+
+def report_indexes(db, tenancy_id):
+    """ Reports declared indexes that are missing, and indexes that have not been used since the server started
+    (from $indexStats), for MultiTenancy and each collection in a tenancy.
+
+    Parameters
+    ----------
+
+    db : pymongo.database.Database
+        CFFA database.
+
+    tenancy_id : str
+        Tenancy prefix for collections.
+
+    Returns
+    -------
+
+    report : dict
+        Keyed on collection name, values are dicts with keys missing : `str` : `list` and unused : `str` : `list` of
+        index names.
+
+    """
+    collections = [("MultiTenancy", tenancyIndexes)]
+    for kind, models in tenantIndexes.items():
+        collections.append((tenancy_id + "_" + kind, models))
+
+    report = {}
+    for name, models in collections:
+        missing = []
+        unused = []
+        try:
+            existing = db[name].index_information()
+            for model in models:
+                if model.document.get("name") not in existing:
+                    missing.append(model.document.get("name"))
+
+            for stats in db[name].aggregate([{"$indexStats": {}}]):
+                if stats.get("name") != "_id_" and stats.get("accesses", {}).get("ops", 0) == 0:
+                    unused.append(stats.get("name"))
+        except pymongo.errors.OperationFailure as e:
+            logger.error("Unable to report indexes for " + name + ": " + str(e.details))
+
+        report[name] = dict(missing=missing, unused=unused)
+        if len(missing) > 0:
+            logger.warning("Collection " + name + " is missing indexes " + ", ".join(missing))
+
+    return report
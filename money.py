@@ -0,0 +1,229 @@
+""" money.py
+
+Fixed point money arithmetic for CFFA. Amounts are held as python ints of minor units (SCALE units per pound, ie four
+decimal places) so that sums over games and payments are exact and no Decimal, float or str objects are created inside
+the summary and ledger loops. Four places rather than pence are used as game costs are split between players, and a
+per player share rounded to a penny would drift over a season of games.
+
+Conversions decode and encode the Decimal128 binary (BID) layout directly, rather than going through Decimal.
+
+  from_decimal128(Decimal128) -> int         to_decimal128(int) -> Decimal128
+  from_number(float/int/str/Decimal) -> int  from_sheet(str) -> int, ie "£1,234.50"
+  share(int, parts) -> int                   round_pence(int) -> int
+  to_float(int) -> float                     to_string(int) -> str, ie "12.34"
+
+"""
+
+import re
+import struct
+from decimal import Decimal, ROUND_HALF_EVEN
+from bson import Decimal128
+
+SCALE = 10000  # minor units per pound
+PLACES = 4  # decimal places held, 10 ** PLACES == SCALE
+PENNY = SCALE // 100
+
+_BID = struct.Struct("<QQ")  # Decimal128 is a little endian low, high pair of 64 bit words
+_SIGN = 1 << 63
+_COMBINATION = 3 << 61  # both set: infinity, NaN or a coefficient too large for the common layout
+_EXPONENT_BIAS = 6176
+_COEFFICIENT_HIGH = (1 << 49) - 1
+_LOW_WORD = (1 << 64) - 1
+_MAX_COEFFICIENT = 10 ** 34 - 1  # 34 significant digits, larger coefficients would encode as infinity or zero
+_POWERS = [10 ** power for power in range(40)]
+
+_NON_NUMERIC = re.compile(r'[^\d\-.]')
+
+
+def _divide_half_even(numerator, denominator):
+    """ Integer division of a non negative numerator, rounding half to even (the same as MongoDB $round).
+    """
+    quotient, remainder = divmod(numerator, denominator)
+    if remainder * 2 > denominator or (remainder * 2 == denominator and quotient & 1):
+        quotient += 1
+    return quotient
+
+
+def _from_decimal(value):
+    """ Converts a decimal.Decimal into minor units.
+    """
+    return int(value.scaleb(PLACES).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_decimal128(value):
+    """ Converts a Decimal128 from the DB into minor units, rounding half to even beyond four decimal places.
+
+    Parameters
+    ----------
+
+    value : bson.Decimal128
+        Amount from a document.
+
+    Returns
+    -------
+
+    units : int
+        Amount in minor units.
+
+    """
+    low, high = _BID.unpack(value.bid)
+    if high & _COMBINATION == _COMBINATION:
+        # rare layouts (and NaN/infinity, which raise here) are left to Decimal
+        return _from_decimal(value.to_decimal())
+
+    exponent = ((high >> 49) & 0x3FFF) - _EXPONENT_BIAS + PLACES
+    coefficient = ((high & _COEFFICIENT_HIGH) << 64) | low
+    if exponent >= 0:
+        units = coefficient * _POWERS[exponent] if exponent < 40 else coefficient * 10 ** exponent
+    else:
+        units = _divide_half_even(coefficient, _POWERS[-exponent] if -exponent < 40 else 10 ** -exponent)
+
+    return -units if high & _SIGN else units
+
+
+def to_decimal128(units):
+    """ Converts minor units into a Decimal128 for storage. Whole pence are stored with two decimal places, as the rest
+    of CFFA stores amounts, otherwise all four places are kept.
+
+    Parameters
+    ----------
+
+    units : int
+        Amount in minor units.
+
+    Returns
+    -------
+
+    value : bson.Decimal128
+
+    Raises
+    ------
+
+    OverflowError
+        If the amount has more than 34 significant digits, which Decimal128 cannot hold.
+
+    """
+    sign = 0
+    if units < 0:
+        sign = _SIGN
+        units = -units
+
+    if units % PENNY == 0:
+        coefficient = units // PENNY
+        exponent = -2
+    else:
+        coefficient = units
+        exponent = -PLACES
+
+    if coefficient > _MAX_COEFFICIENT:
+        raise OverflowError("Amount of " + str(units) + " minor units is too large for Decimal128")
+
+    high = sign | ((exponent + _EXPONENT_BIAS) << 49) | (coefficient >> 64)
+    return Decimal128.from_bid(_BID.pack(coefficient & _LOW_WORD, high))
+
+
+def from_number(value):
+    """ Converts an amount from a form or calculation into minor units. Floats are converted via their shortest repr so
+    that 0.1 is 1000 units and not the binary approximation.
+
+    Parameters
+    ----------
+
+    value : float, int, str, decimal.Decimal or bson.Decimal128
+        Amount.
+
+    Returns
+    -------
+
+    units : int
+        Amount in minor units.
+
+    """
+    if isinstance(value, bool):
+        raise TypeError("Boolean is not a money amount")
+    if isinstance(value, int):
+        return value * SCALE
+    if isinstance(value, Decimal128):
+        return from_decimal128(value)
+    if isinstance(value, Decimal):
+        return _from_decimal(value)
+    if isinstance(value, float):
+        return _from_decimal(Decimal(repr(value)))
+
+    return _from_decimal(Decimal(str(value).strip()))
+
+
+def from_sheet(text):
+    """ Converts a currency string from a sheet, such as "£1,234.50" or "-£3.00", into minor units.
+
+    Parameters
+    ----------
+
+    text : str
+        Formatted amount. Numbers (as numericised by gspread) are also accepted.
+
+    Returns
+    -------
+
+    units : int
+        Amount in minor units.
+
+    Raises
+    ------
+
+    ValueError
+        If no number remains once currency symbols and separators are removed.
+
+    """
+    if not isinstance(text, str):
+        return from_number(text)
+
+    cleaned = _NON_NUMERIC.sub('', text)
+    try:
+        return _from_decimal(Decimal(cleaned))
+    except ArithmeticError:
+        raise ValueError("Not a money amount: " + repr(text))
+
+
+def share(units, parts):
+    """ Divides an amount between a number of parts, ie the cost each of a game, rounding half to even.
+
+    Parameters
+    ----------
+
+    units : int
+        Amount in minor units.
+
+    parts : int
+        Number of shares, must be greater than 0.
+
+    Returns
+    -------
+
+    units : int
+        One share in minor units.
+
+    """
+    if units < 0:
+        return -_divide_half_even(-units, parts)
+    return _divide_half_even(units, parts)
+
+
+def round_pence(units):
+    """ Rounds an amount in minor units to whole pence (half to even), for display.
+    """
+    return share(units, PENNY) * PENNY
+
+
+def to_float(units):
+    """ Converts minor units to a float of pounds, for the forms that still hold float amounts.
+    """
+    return units / SCALE
+
+
+def to_string(units):
+    """ Formats minor units rounded to pence, ie "-12.34".
+    """
+    pence = share(units, PENNY)
+    sign = "-" if pence < 0 else ""
+    return sign + str(abs(pence) // 100) + "." + str(abs(pence) % 100).zfill(2)
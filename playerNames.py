@@ -0,0 +1,99 @@
+""" playerNames.py
+
+Player identity for CFFA. Each player in a tenancy has a compact integer player ID, referenced from games (pid on each
+players array entry), payments (playerId), adjustments (playerId), team_summary (playerId) and team_players (playerId).
+Names are only labels: the ID to name table is held on the tenancy metadata document as playerNames, keyed on the ID as
+a string, so a rename changes one entry of one document.
+
+The table is cached per tenancy in memory (playerNameCache) so resolving a name to an ID, or relabelling a document
+with current names, needs no query. Names are matched on name_key(), which treats names as equal when the
+team_summary unique playerName index (collated with aggCollation) does, so two players never share a summary row.
+
+"""
+
+import unicodedata
+from cffadb import tenancyCache
+
+# config variables
+ttlSeconds = 60  # maximum age of a cached name table, renames by other processes show after this
+maxEntries = 1000  # tenancies cached
+
+
+def name_key(name):
+    """ Returns the key player names are matched on. It follows aggCollation (locale en, strength 1, alternate
+    shifted): case and accents are ignored, as are spaces, punctuation and control characters, so "José" and
+    "jose" share a key, as do "O'Neil" and "o neil".
+
+    Parameters
+    ----------
+
+    name : str
+        Player name.
+
+    Returns
+    -------
+
+    key : str
+
+    """
+    decomposed = unicodedata.normalize("NFKD", name).casefold()
+    return "".join(char for char in decomposed
+                   if unicodedata.category(char) != "Mn" and unicodedata.category(char)[0] not in "PZC")
+
+
+class PlayerNameTable:
+    """ PlayerNameTable class - read only snapshot of a tenancy's player ID to name table.
+
+    Attributes
+    ----------
+
+    names : dict
+        Player name keyed on player ID (int).
+
+    ids : dict
+        Player ID keyed on name_key() of the player name. If names share a key the lowest ID is used.
+
+    """
+
+    def __init__(self, player_names=None):
+        """ PlayerNameTable constructor.
+
+        Parameters
+        ----------
+
+        player_names : dict
+            playerNames value from the tenancy metadata document, player name keyed on player ID as a string.
+
+        """
+        self.names = {}
+        self.ids = {}
+        for pid, name in sorted((int(pid), name) for pid, name in (player_names or {}).items()):
+            self.names[pid] = name
+            self.ids.setdefault(name_key(name), pid)
+
+    def id_for(self, name):
+        """ Returns the player ID for a name (matched on name_key()), or None if the name is not known.
+        """
+        if name is None:
+            return None
+        return self.ids.get(name_key(name))
+
+    def name_for(self, pid, default=None):
+        """ Returns the current name for a player ID, or default if the ID is not known.
+        """
+        return self.names.get(pid, default)
+
+    def missing(self, names):
+        """ Returns the names (without duplicates, in order) that have no player ID.
+        """
+        missing = []
+        seen = set()
+        for name in names:
+            key = name_key(name) if name else None
+            if key is not None and key not in self.ids and key not in seen:
+                seen.add(key)
+                missing.append(name)
+        return missing
+
+
+playerNameCache = tenancyCache.TenancyCache(ttl=ttlSeconds, max_size=maxEntries)
@@ -0,0 +1,121 @@
+""" tenancyCache.py
+
+Process wide, size and time limited cache of the default MultiTenancy document for each user ID. Every authenticated
+request resolves the user to a tenancy (load_team_tables_for_user_id, get_tenancy_id, validate_user_as_player_role...),
+so a hit saves a MultiTenancy query per call.
+
+FootballDB invalidates entries explicitly when it changes MultiTenancy (add_team, add_user_access, edit_user_access,
+update_team_name). Changes made by other processes are picked up when the entry expires, after ttlSeconds.
+
+The TenancyCache class is also used for the per tenancy player name tables, see playerNames.py.
+
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+# config variables
+ttlSeconds = 60  # maximum age of an entry
+maxEntries = 10000  # least recently used entries are dropped beyond this
+
+
+class TenancyCache:
+    """ TenancyCache class - LRU cache of tenancy entries with a TTL.
+
+    Entries are dicts with keys tenancyID, userType (role), teamName, revoked and userName, keyed on DB name and
+    user ID.
+
+    Attributes
+    ----------
+
+    ttl : float
+        Maximum age of an entry in seconds.
+
+    max_size : int
+        Maximum number of entries.
+
+    """
+
+    def __init__(self, ttl=ttlSeconds, max_size=maxEntries):
+        """ TenancyCache constructor.
+
+        Parameters
+        ----------
+
+        ttl : float
+            Maximum age of an entry in seconds.
+
+        max_size : int
+            Maximum number of entries.
+
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, db_name, user_id):
+        """ Returns the cached entry for a user, or None if there is no entry or it has expired.
+        """
+        key = (db_name, user_id)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is None:
+                return None
+
+            expires, entry = cached
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, db_name, user_id, entry):
+        """ Caches the entry for a user.
+        """
+        key = (db_name, user_id)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, db_name, user_id=None, tenancy_id=None, user_name=None):
+        """ Removes entries for a user ID, and any entries matching a tenancy ID or user name.
+
+        Parameters
+        ----------
+
+        db_name : str
+            Database the entries belong to.
+
+        user_id : str
+            Auth0 user ID.
+
+        tenancy_id : str
+            Remove all entries for users of this tenancy.
+
+        user_name : str
+            Remove all entries for this user name.
+
+        """
+        with self._lock:
+            self._entries.pop((db_name, user_id), None)
+            if tenancy_id is None and user_name is None:
+                return
+
+            for key, (expires, entry) in list(self._entries.items()):
+                if key[0] == db_name and ((tenancy_id is not None and entry.get("tenancyID") == tenancy_id) or
+                                          (user_name is not None and entry.get("userName") == user_name)):
+                    del self._entries[key]
+
+    def clear(self):
+        """ Removes all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+tenancyCache = TenancyCache()
@@ -0,0 +1,338 @@
+""" tenantExport.py
+
+Streaming export of one tenancy to a single compressed archive in EXPORTDIRECTORY. The six tenancy collections
+(payments, games, adjustments, teamSummary, teamPlayers and teamSettings) and the tenancy's MultiTenancy rows are read
+with batched cursors and written one after another into the archive, so memory use is bounded by a few cursor batches
+whatever the size of the tenancy.
+
+The archive is either concatenated BSON documents (the default, written from the raw bytes the server returns so no
+document is decoded, as read by bson.decode_file_iter) or JSONL of canonical extended JSON (one document per line,
+types such as Decimal128 and ObjectId kept). It is compressed with gzip, or with zstd if the zstandard package is
+installed. Cursor batches are fetched on a second thread while the previous batch is compressed and written, so the
+export runs at the speed of the slower of the server and the disk.
+
+A manifest is written next to the archive as <archive>.manifest.json. It lists the collections in archive order with
+their document count, uncompressed bytes and sha256, and the size and sha256 of the archive file itself. The archive is
+written under a .part name and renamed when complete, and the manifest is written last, so an archive with a manifest
+is always complete.
+
+  manifest = football_db.export_tenancy()
+  for collection, document in tenantExport.iter_archive(manifest["manifestPath"]):
+      ...
+
+Collections are read one after another, not from a single snapshot, so writes made during an export may show in some
+collections and not others.
+
+"""
+
+import os
+import io
+import gzip
+import json
+import queue
+import hashlib
+import secrets
+import datetime
+import threading
+import logging
+import bson
+from bson import json_util
+from bson.raw_bson import RawBSONDocument
+from bson.codec_options import CodecOptions
+from cffadb import constants
+
+try:
+    import zstandard
+except ImportError:
+    # only needed for zstd archives
+    zstandard = None
+
+# logging config
+logger = logging.getLogger("cffa_db_export")
+logger.setLevel(logging.DEBUG)
+# console handler
+ch = logging.StreamHandler()
+ch.setLevel(logging.DEBUG)
+formatting = logging.Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+ch.setFormatter(formatting)
+logger.addHandler(ch)
+
+# config variables
+batchSize = 1000  # documents per cursor batch, and per write to the archive
+prefetchBatches = 2  # batches read ahead of the archive writer
+gzipLevel = 1  # higher levels compress slower than a disk writes
+zstdLevel = 3
+readBufferSize = 1024 * 1024  # bytes read at a time when checking an archive
+archiveFormats = {"bson": ".bson", "jsonl": ".jsonl"}
+compressions = {"gzip": ".gz", "zstd": ".zst"}
+manifestSuffix = ".manifest.json"
+manifestVersion = 1
+nameSuffixBytes = 3  # random bytes in each archive name, as hex
+# tenancy collection attributes of FootballDB, exported in this order under these names
+tenantCollections = [("payments", "payments"), ("games", "games"), ("adjustments", "adjustments"),
+                     ("teamSummary", "team_summary"), ("teamPlayers", "team_players"),
+                     ("teamSettings", "team_settings")]
+tenancyCollection = "MultiTenancy"
+
+
+class _HashingWriter:
+    """ Write only file wrapper keeping the sha256 and size of everything written, so the archive checksum needs no
+    second read of the file.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def flush(self):
+        self.raw.flush()
+
+
+def default_compression():
+    """ Returns "zstd" if the zstandard package is installed, else "gzip".
+    """
+    return "zstd" if zstandard is not None else "gzip"
+
+
+def _open_compressed(raw, compression):
+    """ Returns a binary stream compressing into raw with the given compression. Whole batches are written to it, so it
+    needs no further buffering.
+    """
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required for zstd exports")
+        return zstandard.ZstdCompressor(level=zstdLevel).stream_writer(raw, closefd=False)
+    return gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=gzipLevel)
+
+
+def _open_decompressed(path, compression):
+    """ Returns a binary stream decompressing the archive at path.
+    """
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstandard is required to read zstd exports")
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+                                 buffer_size=readBufferSize)
+    return gzip.open(path, "rb")
+
+
+def _encode_batch(batch, archive_format):
+    """ Returns a batch of documents as archive bytes.
+    """
+    if archive_format == "bson":
+        return b"".join(document.raw for document in batch)
+    return "".join(json_util.dumps(document, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n"
+                   for document in batch).encode("utf-8")
+
+
+def _read_batches(sources, archive_format, batches, stop):
+    """ Producer thread for export(). Puts (name, encoded batch, document count) on batches for each cursor batch of
+    each source, then (name, None, 0) at the end of the source. An exception is put on the queue and ends the thread,
+    as does setting stop.
+    """
+    try:
+        for name, collection, query in sources:
+            if stop.is_set():
+                return
+            if archive_format == "bson":
+                collection = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+            batch = []
+            for document in collection.find(query, batch_size=batchSize):
+                batch.append(document)
+                if len(batch) == batchSize:
+                    if stop.is_set():
+                        return
+                    batches.put((name, _encode_batch(batch, archive_format), len(batch)))
+                    batch = []
+            if len(batch) > 0:
+                batches.put((name, _encode_batch(batch, archive_format), len(batch)))
+            batches.put((name, None, 0))
+    except Exception as e:
+        batches.put(e)
+
+
+def export(football_db, directory=None, compression=None, archive_format="bson"):
+    """ Exports the loaded tenancy of football_db, and its MultiTenancy rows, to a compressed archive and manifest.
+
+    Parameters
+    ----------
+
+    football_db : dbinterface.FootballDB
+        FootballDB with the tenancy collections loaded.
+
+    directory : str
+        Directory to write to, created if needed. Defaults to the EXPORTDIRECTORY environment variable.
+
+    compression : str
+        "gzip" or "zstd", defaults to default_compression().
+
+    archive_format : str
+        "bson" or "jsonl".
+
+    Returns
+    -------
+
+    manifest : dict
+        The manifest written, with manifestPath and archivePath added.
+
+    Raises
+    ------
+
+    ValueError
+        If there is no directory, or the compression or archive_format is not known.
+
+    FileExistsError
+        If the archive name is already taken. Existing archives are never overwritten.
+
+    ImportError
+        If compression is "zstd" and zstandard is not installed.
+
+    pymongo.errors.PyMongoError
+        If a collection cannot be read. No archive or manifest is left behind.
+
+    """
+    directory = directory or os.getenv(constants.EXPORTDIRECTORY)
+    if not directory:
+        raise ValueError("No export directory given and " + constants.EXPORTDIRECTORY + " is not set")
+    compression = compression or default_compression()
+    if compression not in compressions or archive_format not in archiveFormats:
+        raise ValueError("Unknown export compression or format: " + str(compression) + " " + str(archive_format))
+
+    # microseconds and a random suffix keep the names of exports started at the same time apart
+    created = datetime.datetime.now(datetime.timezone.utc)
+    archive_name = football_db.tenancy_id + "-" + created.strftime("%Y%m%dT%H%M%S%fZ") + "-" + \
+        secrets.token_hex(nameSuffixBytes) + archiveFormats[archive_format] + compressions[compression]
+    os.makedirs(directory, exist_ok=True)
+    archive_path = os.path.join(directory, archive_name)
+    part_path = archive_path + ".part"
+    if os.path.exists(archive_path):
+        raise FileExistsError("Export archive " + archive_path + " already exists")
+    # created exclusively, so an existing file is never written over
+    raw_file = open(part_path, "xb")
+
+    sources = [(name, getattr(football_db, attribute), {}) for name, attribute in tenantCollections]
+    sources.append((tenancyCollection, football_db.tenancy, {"tenancyID": football_db.tenancy_id}))
+    collections = []
+    current = None
+    batches = queue.Queue(maxsize=prefetchBatches)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_batches, args=(sources, archive_format, batches, stop), daemon=True,
+                              name="cffa-export-reader")
+
+    start = datetime.datetime.now()
+    try:
+        with raw_file:
+            hashing = _HashingWriter(raw_file)
+            with _open_compressed(hashing, compression) as archive:
+                reader.start()
+                while len(collections) < len(sources):
+                    item = batches.get()
+                    if isinstance(item, Exception):
+                        raise item
+                    name, data, count = item
+                    if current is None:
+                        current = dict(name=name, documents=0, bytes=0, sha256=hashlib.sha256())
+                    if data is None:
+                        current["sha256"] = current["sha256"].hexdigest()
+                        collections.append(current)
+                        current = None
+                        continue
+                    archive.write(data)
+                    current["sha256"].update(data)
+                    current["documents"] += count
+                    current["bytes"] += len(data)
+            hashing.flush()
+        os.replace(part_path, archive_path)
+    except BaseException:
+        logger.critical("Export of tenancy " + football_db.tenancy_id + " failed, removing " + part_path)
+        # stop the reader, emptying the queue so it is not left blocked on a put
+        stop.set()
+        while reader.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+    manifest = dict(manifestVersion=manifestVersion,
+                    tenancyID=football_db.tenancy_id,
+                    created=created.isoformat(),
+                    format=archive_format,
+                    compression=compression,
+                    archive=archive_name,
+                    archiveBytes=hashing.size,
+                    archiveSha256=hashing.sha256.hexdigest(),
+                    collections=collections)
+    manifest_path = archive_path + manifestSuffix
+    with open(manifest_path + ".part", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + ".part", manifest_path)
+
+    elapsed = (datetime.datetime.now() - start).total_seconds()
+    documents = sum(collection["documents"] for collection in collections)
+    logger.info("Exported %d documents of tenancy %s to %s (%d bytes) in %.2fs, %.0f documents per second",
+                documents, football_db.tenancy_id, archive_path, hashing.size, elapsed,
+                documents / elapsed if elapsed > 0 else 0)
+    return dict(manifest, manifestPath=manifest_path, archivePath=archive_path)
+
+
+def iter_archive(manifest_path):
+    """ Generator over the documents of an exported archive, checking the archive and each collection against the
+    manifest checksums as it reads.
+
+    Parameters
+    ----------
+
+    manifest_path : str
+        Manifest written by export().
+
+    Yields
+    ------
+
+    document : tuple
+        (collection name, document) in archive order, ie ("games", {...}).
+
+    Raises
+    ------
+
+    ValueError
+        If the archive does not match a checksum or count of the manifest. Documents already yielded from the
+        collection being read when this is raised must be discarded.
+
+    """
+    with open(manifest_path) as manifest_file:
+        manifest = json.load(manifest_file)
+    archive_path = os.path.join(os.path.dirname(manifest_path), manifest["archive"])
+
+    sha256 = hashlib.sha256()
+    with open(archive_path, "rb") as archive_file:
+        for block in iter(lambda: archive_file.read(readBufferSize), b""):
+            sha256.update(block)
+    if sha256.hexdigest() != manifest["archiveSha256"]:
+        raise ValueError("Archive " + archive_path + " does not match its manifest checksum")
+
+    with _open_decompressed(archive_path, manifest["compression"]) as archive:
+        for collection in manifest["collections"]:
+            sha256 = hashlib.sha256()
+            for count in range(collection["documents"]):
+                if manifest["format"] == "bson":
+                    size = archive.read(4)
+                    data = size + archive.read(int.from_bytes(size, "little") - 4) if len(size) == 4 else b""
+                    document = bson.decode(data) if len(data) > 4 else None
+                else:
+                    data = archive.readline()
+                    document = json_util.loads(data, json_options=json_util.CANONICAL_JSON_OPTIONS) if data else None
+                if document is None:
+                    raise ValueError("Archive " + archive_path + " ends inside " + collection["name"])
+                sha256.update(data)
+                yield collection["name"], document
+            if sha256.hexdigest() != collection["sha256"]:
+                raise ValueError("Collection " + collection["name"] + " does not match its manifest checksum")
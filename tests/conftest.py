@@ -0,0 +1,41 @@
+""" conftest.py
+
+Shared fixtures. Tests that need a database use mongomock, an in memory stand in for pymongo, and are skipped if it is
+not installed. mongomock does not run every query CFFA sends, so tests of the aggregation pipelines use a real MongoDB
+instead, see server_db, and are skipped unless CFFA_TEST_MONGODB_URI names a server to create scratch databases on.
+
+"""
+
+import os
+import uuid
+import pytest
+from cffadb import dbinterface
+
+serverUriVariable = "CFFA_TEST_MONGODB_URI"  # MongoDB (5.0+) URI for tests of the aggregation pipelines
+
+
+@pytest.fixture
+def mock_db():
+    """ FootballDB on an empty mongomock database, with no tenancy loaded. Each test gets its own database name, so
+    the per process caches (tenancies, player names, ensured indexes) never carry over between tests.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    db_name = "cffa_test_" + uuid.uuid4().hex
+    football_db = dbinterface.FootballDB("mongodb://localhost", db_name)
+    football_db._the_db = mongomock.MongoClient()[db_name]
+    football_db._db_pid = os.getpid()
+    return football_db
+
+
+@pytest.fixture
+def server_db():
+    """ FootballDB on an empty scratch database of the MongoDB server at CFFA_TEST_MONGODB_URI, dropped after the
+    test. The test is skipped if the variable is not set.
+    """
+    uri = os.getenv(serverUriVariable)
+    if not uri:
+        pytest.skip(serverUriVariable + " is not set")
+    db_name = "cffa_test_" + uuid.uuid4().hex
+    football_db = dbinterface.FootballDB(uri, db_name)
+    yield football_db
+    football_db.theDB.client.drop_database(db_name)
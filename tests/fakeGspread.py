@@ -0,0 +1,69 @@
+""" fakeGspread.py
+
+In memory stand ins for a gspread client and spreadsheet, and a generator of worksheet rows in the layout of the CFFA
+google sheet template, so googleImport can be tested and benchmarked without google access. Used by
+test_googleImport.py and benchmark.py.
+
+"""
+
+import datetime
+
+
+class FakeSpreadsheet:
+    """ Stands in for a gspread Spreadsheet, answering values_batch_get() from rows held in memory.
+    """
+
+    def __init__(self, worksheets):
+        self.worksheets = worksheets
+        self.requests = 0
+
+    def values_batch_get(self, ranges, params=None):
+        self.requests += 1
+        return {"valueRanges": [{"range": name, "values": self.worksheets[name.strip("'")]} for name in ranges]}
+
+
+class FakeGspreadClient:
+    """ Stands in for an authorised gspread Client, see googleImport.Googlesheet(client=...).
+    """
+
+    def __init__(self, worksheets):
+        self.spreadsheet = FakeSpreadsheet(worksheets)
+        self.opens = 0
+
+    def open(self, sheet_name):
+        self.opens += 1
+        return self.spreadsheet
+
+
+def fake_sheet(game_rows, player_count=30):
+    """ Builds transaction, game and summary worksheet rows in the layout of the CFFA google sheet template.
+
+    Parameters
+    ----------
+
+    game_rows : int
+        Number of games, there are twice as many transactions.
+
+    player_count : int
+        Number of players (columns on the game worksheet).
+
+    Returns
+    -------
+
+    worksheets : dict
+        Rows (header first) keyed on worksheet name.
+
+    """
+    players = ["Player " + str(index) for index in range(player_count)]
+    start = datetime.date(2010, 1, 1)
+    games = [["Timestamp", "Date of Game dd-MON-YYYY", "Cost of Game", "Players", "Cost Each"] + players]
+    transactions = [["Date", "Player", "Amount", "Type"]]
+    for index in range(game_rows):
+        date = (start + datetime.timedelta(days=index)).strftime("%d-%b-%Y")
+        results = ["Win" if (index + column) % 3 == 0 else "" for column in range(player_count)]
+        games.append([date, date, "£30.00", str(player_count), "£1.00"] + results)
+        for column in range(2):
+            transactions.append([date, players[(index + column) % player_count], "£1,234.50", "Bank Transfer"])
+
+    summary = [["Names", "Money Carry Over"]] + [[player, "-£3.00"] for player in players]
+    return {"Transactions": transactions, "Games": games, "Summary": summary}
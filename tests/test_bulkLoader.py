@@ -0,0 +1,91 @@
+""" test_bulkLoader.py
+
+Checks how BulkLoader classifies a failed chunk (retry, ignore duplicates, fail), what it counts as written, and that a
+failed import is reported rather than returning player IDs.
+
+"""
+
+import pymongo
+import pytest
+from cffadb import bulkLoader
+
+
+class FakeCollection:
+    """ Collection whose insert_many raises the given errors in turn, then succeeds.
+    """
+
+    name = "fake"
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if len(self.errors) > 0:
+            raise self.errors.pop(0)
+
+
+def write_error(codes, inserted=0):
+    return pymongo.errors.BulkWriteError({"writeErrors": [{"index": index, "code": code}
+                                                          for index, code in enumerate(codes)],
+                                          "writeConcernErrors": [], "nInserted": inserted})
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    monkeypatch.setattr(bulkLoader, "retryDelay", 0)
+    return bulkLoader.BulkLoader(None, retries=3)
+
+
+def test_duplicates_on_first_attempt_fail(loader):
+    collection = FakeCollection([write_error([11000], inserted=1)])
+    with pytest.raises(pymongo.errors.BulkWriteError):
+        loader._insert_chunk(collection, [{}, {}])
+    assert collection.calls == 1
+    assert loader.written == {}
+
+
+def test_permanent_write_error_fails_without_retry(loader):
+    collection = FakeCollection([write_error([121])])
+    with pytest.raises(pymongo.errors.BulkWriteError):
+        loader._insert_chunk(collection, [{}])
+    assert collection.calls == 1
+
+
+def test_duplicates_ignored_on_retry_and_not_counted(loader):
+    # the first attempt wrote 2 of 3 documents before failing, the retry only adds the third
+    collection = FakeCollection([write_error([11602], inserted=2), write_error([11000, 11000], inserted=1)])
+    loader._insert_chunk(collection, [{}, {}, {}])
+    assert collection.calls == 2
+    assert loader.written == {"fake": 3}
+
+
+def test_transient_errors_retried(loader):
+    collection = FakeCollection([pymongo.errors.AutoReconnect("dropped"), write_error([189])])
+    loader._insert_chunk(collection, [{}, {}])
+    assert collection.calls == 3
+    assert loader.written == {"fake": 2}
+
+
+def test_retries_exhausted_fail(loader):
+    collection = FakeCollection([pymongo.errors.AutoReconnect("dropped")] * 4)
+    with pytest.raises(pymongo.errors.AutoReconnect):
+        loader._insert_chunk(collection, [{}])
+    assert collection.calls == 4
+
+
+def test_failed_import_is_reported(mock_db):
+    mock_db.add_team("Team", "auth0|manager", "Ann")
+    session = mock_db.session_for_user("auth0|manager")
+
+    def failing_writer(collection, documents):
+        raise write_error([121])
+
+    with pytest.raises(pymongo.errors.BulkWriteError):
+        session.populate_payments([{"Player": "Ann", "Amount": 1}], writer=failing_writer)
+
+    loader = bulkLoader.BulkLoader(session)
+    loader.insert = failing_writer
+    with pytest.raises(pymongo.errors.BulkWriteError):
+        loader.load(payments=[{"Player": "Ann", "Amount": 1}])
@@ -0,0 +1,40 @@
+""" test_clientRegistry.py
+
+Checks that a forked child never uses its parent's MongoClient, through the registry or through a FootballDB that
+cached its database handle before the fork.
+
+"""
+
+import os
+import pytest
+from cffadb import clientRegistry
+
+
+def test_registry_forgets_clients_of_another_process(monkeypatch):
+    parent_client = object()
+    monkeypatch.setattr(clientRegistry, "_clients", {"mongodb://cffa-test": parent_client})
+    monkeypatch.setattr(clientRegistry, "_pid", -1)
+
+    client = clientRegistry.get_client("mongodb://cffa-test")
+
+    assert client is not parent_client
+    assert clientRegistry._pid == os.getpid()
+    assert clientRegistry.get_client("mongodb://cffa-test") is client
+    client.close()
+
+
+def test_football_db_reconnects_after_fork(mock_db, monkeypatch):
+    mongomock = pytest.importorskip("mongomock")
+    mock_db.add_team("Team", "auth0|manager", "Ann")
+    mock_db.load_team_tables_for_user_id("auth0|manager")
+    mock_db.session_for_user("auth0|manager")
+    parent_db = mock_db.theDB
+    child_client = mongomock.MongoClient()
+    monkeypatch.setattr(clientRegistry, "get_client", lambda *args: child_client)
+    mock_db._db_pid = -1  # as if the handle was resolved before a fork
+
+    assert mock_db.theDB is not parent_db
+    assert mock_db.theDB.client is child_client
+    assert mock_db.payments.database is mock_db.theDB
+    assert mock_db.tenancy.database is mock_db.theDB
+    assert mock_db._sessions == {}
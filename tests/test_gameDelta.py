@@ -0,0 +1,119 @@
+""" test_gameDelta.py
+
+Checks that the team_summary left by _apply_game_delta(), after a game is edited or deleted, is the team_summary a full
+rebuild gives, both by verify_team_summary() and against calc_populate_team_summary_loop(). Needs a real MongoDB (see
+server_db in conftest.py), as mongomock cannot run the bulk updates or the summary pipeline.
+
+"""
+
+import copy
+import datetime
+import pytest
+from bson import Decimal128
+from cffadb import money
+
+PLAYERS = ["Ann", "Bob", "Cy", "Dee"]
+
+
+def game(day, cost, booker, **statuses):
+    record = {"Date of Game dd-MON-YYYY": datetime.datetime(2021, 1, day), "Cost of Game": Decimal128(cost),
+              "Players": len(statuses), "Booker": booker}
+    record.update(statuses)
+    return record
+
+
+def load_tenancy(football_db):
+    football_db.add_team("Team", "auth0|manager", "Ann")
+    session = football_db.session_for_user("auth0|manager")
+    session.populate_games([game(1, "12.00", "Ann", Ann="Win", Bob="Lose", Cy="Draw"),
+                            game(4, "9.00", "Bob", Ann="Draw", Bob="Win", Cy="Lose"),
+                            game(6, "8.00", "Ann", Ann="Win", Bob="Lose", Cy="Draw", Dee="No Show")])
+    session.populate_payments([{"Player": name, "Amount": Decimal128("10.00"), "Type": "Bank",
+                                "Date": datetime.datetime(2021, 1, 2)} for name in PLAYERS])
+    session.calc_populate_team_summary_loop(PLAYERS)
+    return session
+
+
+def stored_game(session, day):
+    return session.games.find_one({"Date of Game dd-MON-YYYY": datetime.datetime(2021, 1, day)})
+
+
+def apply_change(session, old_game, new_game, credits=()):
+    """ Writes the change as edit_game() and delete_game() do, then applies it to team_summary.
+    """
+    if new_game is None:
+        session.games.delete_one({"_id": old_game["_id"]})
+    else:
+        session.games.replace_one({"_id": old_game["_id"]}, new_game)
+    table = session.get_player_names()
+    for player, amount in credits:
+        session.payments.insert_one({"Player": player, "playerId": table.id_for(player), "Type": "CFFA Game Edit",
+                                     "Amount": money.to_decimal128(amount), "Date": datetime.datetime.now()})
+    session._apply_game_delta(old_game, new_game, list(credits))
+
+
+def summaries(session):
+    rows = {}
+    for player in session.team_summary.find({}, {"_id": 0}):
+        values = {"gamesAttended": player.get("gamesAttended"), "lastPlayed": player.get("lastPlayed")}
+        for key in ["gamesCost", "moniespaid", "balance"]:
+            values[key] = money.round_pence(money.from_decimal128(player.get(key)))
+        rows[player.get("playerId")] = values
+    return rows
+
+
+def without_player(game_document, name):
+    game_document.pop(name, None)
+    game_document["players"] = [entry for entry in game_document["players"] if entry["name"] != name]
+    game_document["Players"] -= 1
+    return game_document
+
+
+def move_earlier(session):
+    old_game = stored_game(session, 6)
+    new_game = copy.deepcopy(old_game)
+    new_game["Date of Game dd-MON-YYYY"] = datetime.datetime(2021, 1, 3)
+    return old_game, new_game, []
+
+
+def remove_player(session):
+    old_game = stored_game(session, 6)
+    return old_game, without_player(copy.deepcopy(old_game), "Cy"), []
+
+
+def change_booker(session):
+    old_game = stored_game(session, 4)
+    new_game = copy.deepcopy(old_game)
+    new_game["Booker"] = "Cy"
+    new_game["bookerId"] = session.resolve_player_id("Cy")
+    cost = money.from_decimal128(old_game["Cost of Game"])
+    return old_game, new_game, [("Bob", -cost), ("Cy", cost)]
+
+
+def guests_only(session):
+    old_game = stored_game(session, 1)
+    new_game = without_player(copy.deepcopy(old_game), "Bob")
+    new_game["Dee_guests"] = 2
+    new_game["players"].append(dict(name="Dee", pid=session.resolve_player_id("Dee"), status=None, guests=2))
+    new_game["Players"] += 2
+    return old_game, new_game, []
+
+
+def delete(session):
+    old_game = stored_game(session, 6)
+    return old_game, None, [("Ann", -money.from_decimal128(old_game["Cost of Game"]))]
+
+
+CHANGES = [move_earlier, remove_player, change_booker, guests_only, delete]
+
+
+@pytest.mark.parametrize("change", CHANGES)
+def test_delta_matches_full_rebuild(server_db, change):
+    session = load_tenancy(server_db)
+
+    apply_change(session, *change(session))
+    after_delta = summaries(session)
+
+    assert session.verify_team_summary() == []
+    session.calc_populate_team_summary_loop(PLAYERS)
+    assert after_delta == summaries(session)
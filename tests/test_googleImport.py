@@ -0,0 +1,101 @@
+""" test_googleImport.py
+
+Checks googleImport.Googlesheet against a fake gspread client (fakeGspread.FakeGspreadClient): the records built from
+one batched values request, and post processed a column at a time, must equal (values and key order) the records the
+original importer built from gspread get_all_records(head=1) and post processed a row at a time.
+
+Run with: python -m pytest tests, with cffadb importable (see PYTHONPATH in the README).
+
+"""
+
+import copy
+from cffadb import googleImport
+from cffadb.tests.fakeGspread import FakeGspreadClient, fake_sheet
+
+try:
+    from gspread.utils import numericise_all
+except ImportError:
+    numericise_all = None
+
+
+def _numericise(value):
+    """ gspread.utils.numericise with the get_all_records defaults, for when gspread is not installed.
+    """
+    if isinstance(value, str) and "_" not in value:
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return value
+
+
+def get_all_records(rows):
+    """ Records as gspread Worksheet.get_all_records(head=1) returns them: rows padded to the header width with ""
+    and every value numericised.
+    """
+    header = rows[0]
+    records = []
+    for row in rows[1:]:
+        values = list(row) + [""] * (len(header) - len(row))
+        values = numericise_all(values) if numericise_all is not None else [_numericise(value) for value in values]
+        records.append(dict(zip(header, values)))
+    return records
+
+
+def sheet_with_edge_cases(game_rows=40):
+    """ fake_sheet rows plus short rows, numeric looking text and values with underscores.
+    """
+    worksheets = fake_sheet(game_rows, player_count=6)
+    worksheets["Transactions"].append(["01-Feb-2011", "player 1", "£12.00"])  # no Type cell
+    worksheets["Transactions"].append(["02-Feb-2011", "player_2", "£0.50", "12"])
+    worksheets["Games"].append(["03-Feb-2011", "03-Feb-2011", "£6.00", "2", "£3.00", "Win"])  # short row
+    worksheets["Summary"].append(["Player 9", "1.5"])
+    return worksheets
+
+
+def expected_records(worksheets):
+    """ Records as the original importer built them: get_all_records() then the row at a time post processing.
+    """
+    return (googleImport.process_transactions_loop(get_all_records(worksheets["Transactions"])),
+            googleImport.process_games_loop(get_all_records(worksheets["Games"])),
+            get_all_records(worksheets["Summary"]))
+
+
+def assert_same_records(actual, expected):
+    assert [list(record.items()) for record in actual] == [list(record.items()) for record in expected]
+
+
+def test_googlesheet_matches_get_all_records():
+    worksheets = sheet_with_edge_cases()
+    client = FakeGspreadClient(copy.deepcopy(worksheets))
+    sheet = googleImport.Googlesheet(None, "Sheet", "Transactions", "Games", "Summary", client=client)
+
+    transactions, games, summary = expected_records(worksheets)
+    assert_same_records(sheet.get_transactions(), transactions)
+    assert_same_records(sheet.get_games(), games)
+    assert_same_records(sheet.summary_worksheet, summary)
+    assert client.opens == 1
+    assert client.spreadsheet.requests == 1
+
+
+def test_googlesheet_chunks_match_get_all_records():
+    worksheets = sheet_with_edge_cases()
+    client = FakeGspreadClient(copy.deepcopy(worksheets))
+    sheet = googleImport.Googlesheet(None, "Sheet", "Transactions", "Games", "Summary", client=client, chunk_size=7)
+
+    transactions, games, summary = expected_records(worksheets)
+    assert_same_records(sheet.get_transactions(), transactions)
+    assert_same_records(sheet.get_games(), games)
+    assert_same_records(sheet.summary_worksheet, summary)
+
+
+def test_columnar_processing_matches_loops():
+    worksheets = sheet_with_edge_cases(200)
+    for rows, columnar, loop in [(worksheets["Transactions"], googleImport.process_transactions,
+                                  googleImport.process_transactions_loop),
+                                 (worksheets["Games"], googleImport.process_games, googleImport.process_games_loop)]:
+        records = get_all_records(rows)
+        assert_same_records(columnar(copy.deepcopy(records)), loop(copy.deepcopy(records)))
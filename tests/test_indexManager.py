@@ -0,0 +1,47 @@
+""" test_indexManager.py
+
+Checks that an index left by an older release under another name (playerName_1 on teamSummary) is replaced by the
+declared indexes rather than blocking them.
+
+"""
+
+import pymongo
+from cffadb import indexManager
+
+
+class FakeCollection:
+    """ Collection whose first create_indexes fails with a conflict while playerName_1 exists.
+    """
+
+    name = "171f0ac9e41_teamSummary"
+
+    def __init__(self, indexes):
+        self.indexes = indexes
+        self.created = []
+
+    def create_indexes(self, models):
+        if "playerName_1" in self.indexes:
+            raise pymongo.errors.OperationFailure("Index already exists with a different name: playerName_1", code=85)
+        self.created = [model.document.get("name") for model in models]
+
+    def index_information(self):
+        return dict(self.indexes)
+
+    def drop_index(self, name):
+        del self.indexes[name]
+
+
+def test_conflicting_index_is_replaced():
+    collection = FakeCollection({"_id_": {"key": [("_id", 1)]}, "playerName_1": {"key": [("playerName", 1)]},
+                                 "playerId": {"key": [("playerId", 1)]}})
+
+    assert indexManager.ensure_collection_indexes(collection) is True
+    assert list(collection.indexes) == ["_id_", "playerId"]
+    assert collection.created == ["playerName_collated", "playerId", "lastPlayed"]
+
+
+def test_other_failures_are_reported():
+    collection = FakeCollection({"_id_": {"key": [("_id", 1)]}, "playerName_1": {"key": [("other", 1)]}})
+
+    assert indexManager.ensure_collection_indexes(collection) is False
+    assert "playerName_1" in collection.indexes
@@ -0,0 +1,59 @@
+""" test_ledger.py
+
+Checks that a game with no players does not break a player's ledger, and that the server side ledger pipeline and the
+python fallback return the same entries for every page, limit and since.
+
+"""
+
+import datetime
+import pytest
+from bson import Decimal128
+
+SINCE = datetime.datetime(2021, 1, 3)
+
+
+def game(day, cost, players, **statuses):
+    record = {"Date of Game dd-MON-YYYY": datetime.datetime(2021, 1, day), "Cost of Game": Decimal128(cost),
+              "Players": players, "Booker": "Ann"}
+    record.update(statuses)
+    return record
+
+
+def load_tenancy(football_db):
+    football_db.add_team("Team", "auth0|manager", "Ann")
+    session = football_db.session_for_user("auth0|manager")
+    session.populate_games([game(1, "10.00", 3, Ann="Win", Bob="Lose", Cy="Draw"),
+                            game(2, "7.00", 0, Ann="Draw"),  # no players recorded
+                            game(3, "10.00", 3, Ann="Win", Bob="Win", Cy="Lose"),
+                            game(5, "5.00", 2, Ann="No Show", Bob="Draw")])
+    session.populate_payments([{"Player": "Ann", "Amount": Decimal128("20.00"), "Type": "Bank",
+                                "Date": datetime.datetime(2021, 1, 3)},
+                               {"Player": "Ann", "Amount": Decimal128("-1.50"), "Type": "Refund",
+                                "Date": datetime.datetime(2021, 1, 4)}])
+    session.populate_adjustments([{"name": "Ann", "adjust": Decimal128("2.00")}])
+    return session
+
+
+def entries(ledger):
+    return [(entry.date, str(entry.credit), str(entry.debit), str(entry.balance), entry.description)
+            for entry in ledger]
+
+
+def test_loop_ledger_with_game_of_no_players(mock_db):
+    session = load_tenancy(mock_db)
+
+    ledger = entries(session.calc_ledger_for_player_loop("Ann"))
+
+    assert len(ledger) == 7
+    assert (datetime.datetime(2021, 1, 2), "0.00", "", "-1.33", "Game") in ledger
+    assert ledger[0][3] == "11.33"
+
+
+@pytest.mark.parametrize("page, limit, since", [(0, None, None), (0, 2, None), (1, 2, None), (3, 2, None),
+                                                (0, None, SINCE), (1, 2, SINCE), (5, 2, SINCE)])
+def test_pipeline_matches_loop(server_db, page, limit, since):
+    session = load_tenancy(server_db)
+
+    for player in ["Ann", "Bob", "Cy", "Dee"]:
+        assert entries(session.calc_ledger_for_player(player, page, limit, since)) == \
+            entries(session.calc_ledger_for_player_loop(player, page, limit, since))
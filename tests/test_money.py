@@ -0,0 +1,24 @@
+""" test_money.py
+
+Checks that to_decimal128 round trips the largest amounts Decimal128 can hold and refuses larger ones.
+
+"""
+
+import pytest
+from decimal import Decimal
+from cffadb import money
+
+LARGEST = 10 ** 34 - 1  # 34 significant digits
+
+
+@pytest.mark.parametrize("units", [LARGEST, -LARGEST, LARGEST * money.PENNY, 1, -money.PENNY, 0])
+def test_round_trip(units):
+    value = money.to_decimal128(units)
+    assert money.from_decimal128(value) == units
+    assert value.to_decimal() == Decimal(str(units) + "E-" + str(money.PLACES))
+
+
+@pytest.mark.parametrize("units", [LARGEST + 2, -(LARGEST + 2), 10 ** 40, (LARGEST + 1) * money.PENNY])
+def test_too_large_raises(units):
+    with pytest.raises(OverflowError):
+        money.to_decimal128(units)
@@ -0,0 +1,37 @@
+""" test_playerNames.py
+
+Checks that player names are matched as the collated team_summary playerName index matches them, so a name that the
+index treats as taken is never given its own ID or used for a rename.
+
+"""
+
+import pytest
+from cffadb import playerNames
+
+
+@pytest.mark.parametrize("name, same", [("Jose", "José"), ("Jose", "JOSE"), ("O'Neil", "o neil"),
+                                        ("Anne-Marie", "annemarie"), ("Strauss", "STRAUß")])
+def test_name_key_follows_collation(name, same):
+    assert playerNames.name_key(name) == playerNames.name_key(same)
+
+
+def test_name_key_keeps_different_names_apart():
+    assert playerNames.name_key("Jose") != playerNames.name_key("Josh")
+
+
+def test_table_matches_accented_names():
+    table = playerNames.PlayerNameTable({"1": "Jose", "2": "Ann", "3": "José"})
+    assert table.id_for("JOSÉ") == 1
+    assert table.missing(["josé", "Ann", "Bob", "bob", "B.O.B"]) == ["Bob"]
+
+
+def test_rename_to_collated_name_of_another_player_is_refused(mock_db):
+    mock_db.add_team("Team", "auth0|manager", "Ann")
+    session = mock_db.session_for_user("auth0|manager")
+    table = session.ensure_player_ids(["Jose", "Ann"])
+    session.team_summary.insert_many([dict(playerName=name, playerId=table.id_for(name)) for name in ["Jose", "Ann"]])
+
+    assert session.rename_player("Ann", "José") is False
+    assert session.get_player_names(refresh=True).name_for(table.id_for("Ann")) == "Ann"
+    assert session.rename_player("Ann", "Annie") is True
+    assert session.team_summary.find_one({"playerId": table.id_for("Ann")})["playerName"] == "Annie"
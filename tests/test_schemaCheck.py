@@ -0,0 +1,32 @@
+""" test_schemaCheck.py
+
+Checks that a tenancy is only marked as schema checked once its migrations have succeeded.
+
+"""
+
+import pymongo
+from cffadb import dbinterface
+
+
+def test_failed_migration_is_retried(mock_db, monkeypatch):
+    mock_db.add_team("Team", "auth0|manager", "Ann")
+    session = mock_db.session_for_user("auth0|manager")
+    session.team_settings.update_one({"_id": dbinterface.tenantMetadataId}, {"$set": {"gameSchemaVersion": 1}},
+                                     upsert=True)
+    checked = (session.db_name, session.tenancy_id)
+    dbinterface._schemaChecked.discard(checked)
+    calls = []
+
+    def failing_migration(self, batch_size=500):
+        calls.append(self.tenancy_id)
+        raise pymongo.errors.OperationFailure("migration failed", code=11600)
+
+    monkeypatch.setattr(dbinterface.FootballDB, "migrate_games_to_v2", failing_migration)
+    monkeypatch.setattr(dbinterface.FootballDB, "migrate_player_ids", lambda self: 0)
+    session._bind_tenancy(session.tenancy_id)
+    assert checked not in dbinterface._schemaChecked
+
+    monkeypatch.setattr(dbinterface.FootballDB, "migrate_games_to_v2", lambda self, batch_size=500: 0)
+    session._bind_tenancy(session.tenancy_id)
+    assert checked in dbinterface._schemaChecked
+    assert calls == [session.tenancy_id]
@@ -0,0 +1,58 @@
+""" test_stagingSwap.py
+
+Checks that a full import or summary rebuild whose swap fails leaves the live collection as it was and drops the
+staging collection.
+
+"""
+
+import pymongo
+import pytest
+from cffadb import dbinterface
+
+
+@pytest.fixture
+def session(mock_db):
+    mock_db.add_team("Team", "auth0|manager", "Ann")
+    return mock_db.session_for_user("auth0|manager")
+
+
+def fail_swap(monkeypatch):
+    def swap_in(self, staging, collection):
+        raise pymongo.errors.OperationFailure("rename failed", code=20)
+
+    monkeypatch.setattr(dbinterface.FootballDB, "_swap_in", swap_in)
+
+
+def collection_names(session):
+    return session.theDB.list_collection_names()
+
+
+def test_failed_swap_keeps_payments_and_drops_staging(session, monkeypatch):
+    session.populate_payments([{"Player": "Ann", "Amount": 5}])
+    fail_swap(monkeypatch)
+
+    with pytest.raises(pymongo.errors.OperationFailure):
+        session.populate_payments([{"Player": "Bob", "Amount": 7}])
+
+    assert [payment["Player"] for payment in session.payments.find()] == ["Ann"]
+    assert session.payments.name + dbinterface.stagingSuffix not in collection_names(session)
+
+
+def test_failed_build_drops_staging(session):
+    def failing_writer(collection, documents):
+        raise pymongo.errors.OperationFailure("insert failed", code=121)
+
+    with pytest.raises(pymongo.errors.OperationFailure):
+        session.populate_games([{"Date": "01-Jan-2020", "Booker": "Ann"}], writer=failing_writer)
+
+    assert session.games.name + dbinterface.stagingSuffix not in collection_names(session)
+
+
+def test_failed_summary_swap_keeps_summary_and_drops_staging(session, monkeypatch):
+    session.team_summary.insert_one({"playerName": "Ann", "playerId": 1, "balance": 5})
+    fail_swap(monkeypatch)
+
+    session.calc_populate_team_summary_loop([])
+
+    assert [player["playerName"] for player in session.team_summary.find()] == ["Ann"]
+    assert session.team_summary.name + dbinterface.stagingSuffix not in collection_names(session)
@@ -0,0 +1,82 @@
+""" test_syncDocuments.py
+
+Checks the import fingerprints (_content_hash) and the delta writes of _sync_documents: repeated rows, deleted rows,
+rows added by the app, and the player IDs reported for the team_summary update.
+
+"""
+
+import pytest
+from cffadb import dbinterface
+
+
+def payment(player, amount):
+    return {"Player": player, "Amount": amount, "Type": "Bank"}
+
+
+@pytest.fixture
+def collection(mock_db):
+    return mock_db.theDB["payments"]
+
+
+def set_player_ids(batch):
+    for document in batch:
+        document["playerId"] = {"Ann": 1, "Bob": 2, "Cy": 3}.get(document.get("Player"))
+
+
+def sync(football_db, collection, documents, prepare=set_player_ids):
+    return football_db._sync_documents(collection, documents, prepare)
+
+
+def test_content_hash_numbers_repeated_rows():
+    occurrences = {}
+    hashes = [dbinterface.FootballDB._content_hash(document, occurrences)
+              for document in [payment("Ann", 5), payment("Ann", 5), payment("Bob", 5), payment("Ann", 5)]]
+
+    digest = hashes[0]
+    assert hashes == [digest, digest + ":1", hashes[2], digest + ":2"]
+    assert ":" not in hashes[2] and hashes[2] != digest
+
+
+def test_content_hash_ignores_key_order_id_and_hash():
+    document = payment("Ann", 5)
+    reordered = dict(reversed(list(document.items())), _id=1, contentHash="old")
+    assert dbinterface.FootballDB._content_hash(document, {}) == dbinterface.FootballDB._content_hash(reordered, {})
+
+
+def test_repeated_rows_are_all_stored(mock_db, collection):
+    inserted, deleted, player_ids = sync(mock_db, collection, [payment("Ann", 5), payment("Ann", 5)])
+
+    assert (inserted, deleted, player_ids) == (2, 0, {1})
+    assert collection.count_documents({"Player": "Ann"}) == 2
+
+
+def test_unchanged_import_writes_nothing(mock_db, collection):
+    rows = [payment("Ann", 5), payment("Ann", 5), payment("Bob", 7)]
+    sync(mock_db, collection, [dict(row) for row in rows])
+    prepared = []
+
+    result = sync(mock_db, collection, [dict(row) for row in rows], prepare=prepared.extend)
+
+    assert result == (0, 0, set())
+    assert prepared == []
+
+
+def test_removed_rows_are_deleted(mock_db, collection):
+    sync(mock_db, collection, [payment("Ann", 5), payment("Ann", 5), payment("Bob", 7), payment("Cy", 1)])
+
+    inserted, deleted, player_ids = sync(mock_db, collection, [payment("Ann", 5), payment("Cy", 2)])
+
+    # one of Ann's repeats, Bob's row and Cy's changed row go, Cy's new row is added
+    assert (inserted, deleted) == (1, 3)
+    assert player_ids == {1, 2, 3}
+    assert sorted((row["Player"], row["Amount"]) for row in collection.find()) == [("Ann", 5), ("Cy", 2)]
+
+
+def test_rows_without_hash_are_deleted(mock_db, collection):
+    sync(mock_db, collection, [payment("Ann", 5)])
+    collection.insert_one(dict(payment("Bob", 9), playerId=2))  # added by the app, no contentHash
+
+    inserted, deleted, player_ids = sync(mock_db, collection, [payment("Ann", 5)])
+
+    assert (inserted, deleted, player_ids) == (0, 1, {2})
+    assert collection.count_documents({}) == 1
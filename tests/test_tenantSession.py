@@ -0,0 +1,23 @@
+""" test_tenantSession.py
+
+Checks that a TenantSession stays bound to its own tenancy.
+
+"""
+
+import time
+
+
+def test_add_team_on_session_leaves_session_tenancy_alone(mock_db):
+    mock_db.add_team("Old Team", "auth0|old", "Ann")
+    session = mock_db.session_for_user("auth0|old")
+    tenancy_id = session.tenancy_id
+    time.sleep(0.002)  # tenancy IDs are millisecond timestamps
+
+    message = session.add_team("New Team", "auth0|new", "Bob")
+
+    assert message == "Team New Team configured. Please add new players"
+    assert session.tenancy_id == tenancy_id
+    assert [setting.get("teamName") for setting in session.get_team_settings()] == ["Old Team"]
+    new_session = mock_db.session_for_user("auth0|new")
+    assert new_session.tenancy_id != tenancy_id
+    assert [setting.get("teamName") for setting in new_session.get_team_settings()] == ["New Team"]